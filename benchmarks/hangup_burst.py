@@ -0,0 +1,205 @@
+"""
+Event-loop lag on live calls while a burst of hung-up calls is post-processed.
+
+Simulates --live calls on one loop, each handling a Twilio media frame every
+20ms (μ-law decode + encode and the JSON/base64 media message), and records
+how late each frame tick runs. After a quiet second, --jobs calls hang up at
+once and their post-call work runs:
+  - inline:  on the live calls' loop, POSTCALL_WORKERS jobs at a time (the
+             POSTCALL_MODE=inline path)
+  - process: in a child process at POSTCALL_NICE, like utils.post_call_worker
+             (POSTCALL_MODE=process); the live loop only waits for it
+
+Each job runs the real post-call code: trim_recording, encode_recording (per
+RECORDING_CODEC) and upload_to_cloudinary with the SDK call replaced by a
+chunked read of the file, then the completion webhook body is encoded by
+WebhookDispatcher (JSON, gzip above 1 KiB) for a --minutes long transcript.
+Mongo writes and the webhook POST itself are left out.
+
+Reported per mode: frame lateness p50/p99/max during the burst, frames more
+than one frame (20ms) late, and how long the burst took (in process mode
+including the child process starting up).
+
+Usage:
+    python -m benchmarks.hangup_burst [--live 20] [--jobs 40] [--minutes 5]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from benchmarks.recording_codec import SAMPLE_RATE, synthetic_call
+from utils.stats import percentile
+from utils.call_audio import create_wav_header
+from utils.post_call_queue import POSTCALL_WORKERS
+from utils.post_call_worker import POSTCALL_NICE
+from benchmarks.ulaw_codec import pcm16_to_ulaw, ulaw_to_pcm16
+
+FRAME_SECS = 0.02
+FRAME_BYTES = int(SAMPLE_RATE * FRAME_SECS)  # 8-bit μ-law, mono
+
+
+async def live_call(index: int, stop: asyncio.Event, lateness: list):
+    """One call's media loop: a frame each way every 20ms, on an absolute schedule."""
+    ulaw = bytes((index + i) % 256 for i in range(FRAME_BYTES))
+    loop = asyncio.get_running_loop()
+    tick = loop.time()
+    while not stop.is_set():
+        tick += FRAME_SECS
+        await asyncio.sleep(max(0.0, tick - loop.time()))
+        lateness.append((time.perf_counter(), (loop.time() - tick) * 1000))
+        pcm = ulaw_to_pcm16(ulaw)
+        payload = base64.b64encode(pcm16_to_ulaw(pcm)).decode()
+        json.dumps({"event": "media", "streamSid": f"MZ{index}", "media": {"payload": payload}})
+
+
+def _read_upload(source, options):
+    """Stand-in for cloudinary.uploader.upload: read the file in 1 MiB chunks, send nothing."""
+    with open(source, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+    return {"secure_url": f"https://example.invalid/{options.get('public_id')}"}
+
+
+async def post_call_job(path: str, transcript: str):
+    from utils.call_audio import upload_recording
+    from utils.recording_codec import encode_recording
+    from utils.recording_trim import trim_recording
+    from utils.webhooks import WebhookDispatcher
+
+    call_sid = os.path.basename(path)[: -len(".wav")]
+    await trim_recording(path)
+    encoded = await encode_recording(path)
+    url = await upload_recording(call_sid, encoded)
+    WebhookDispatcher(url="http://127.0.0.1/", gzip_min_bytes=1024)._encode(
+        [{"call_sid": call_sid, "status": "completed", "transcript": transcript, "recording_url": url}]
+    )
+
+
+async def run_burst(directory: str, transcript: str):
+    """Post-process every recording in `directory`, POSTCALL_WORKERS at a time."""
+    import utils.cloudinary_upload as cloudinary_upload
+
+    cloudinary_upload._configure = lambda: None
+    cloudinary_upload._upload = _read_upload
+
+    semaphore = asyncio.Semaphore(POSTCALL_WORKERS)
+
+    async def job(path):
+        async with semaphore:
+            await post_call_job(path, transcript)
+
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".wav"))
+    await asyncio.gather(*(job(path) for path in paths))
+
+    from utils.cloudinary_upload import shutdown_uploader
+    from utils.recording_codec import shutdown_encoder
+
+    shutdown_encoder()
+    shutdown_uploader()
+
+
+def fake_transcript(minutes: float) -> str:
+    """About six 25-word turns per minute."""
+    return "\n".join(f"{'user' if i % 2 else 'assistant'}: " + "word " * 25 for i in range(int(minutes * 6)))
+
+
+def make_fixtures(directory: str, jobs: int, minutes: float):
+    audio = synthetic_call(minutes)
+    first = os.path.join(directory, "CAburst0000.wav")
+    with open(first, "wb") as f:
+        f.write(create_wav_header(len(audio), SAMPLE_RATE, 2))
+        f.write(audio)
+    for n in range(1, jobs):
+        shutil.copyfile(first, os.path.join(directory, f"CAburst{n:04d}.wav"))
+
+
+async def measure(mode: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        make_fixtures(tmp, args.jobs, args.minutes)
+
+        stop = asyncio.Event()
+        lateness = []
+        calls = [asyncio.create_task(live_call(i, stop, lateness)) for i in range(args.live)]
+        await asyncio.sleep(1.0)
+
+        burst_start = time.perf_counter()
+        if mode == "inline":
+            await run_burst(tmp, fake_transcript(args.minutes))
+        else:
+            child = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "benchmarks.hangup_burst",
+                "--child",
+                tmp,
+                "--minutes",
+                str(args.minutes),
+            )
+            await child.wait()
+        burst_end = time.perf_counter()
+
+        stop.set()
+        await asyncio.gather(*calls)
+
+    during = [late for at, late in lateness if burst_start <= at <= burst_end]
+    return {
+        "mode": mode,
+        "p50_ms": percentile(during, 50),
+        "p99_ms": percentile(during, 99),
+        "max_ms": max(during, default=0.0),
+        "late_frames": sum(1 for late in during if late > FRAME_SECS * 1000),
+        "frames": len(during),
+        "burst_secs": burst_end - burst_start,
+    }
+
+
+async def main(args):
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    codec = os.getenv("RECORDING_CODEC", "wav")
+    print(
+        f"{args.live} live calls, {args.jobs} hangups x {args.minutes:g} min, "
+        f"{POSTCALL_WORKERS} post-call workers, codec {codec}, nice {POSTCALL_NICE}"
+    )
+    print(f"{'mode':<9}{'p50 ms':>8}{'p99 ms':>8}{'max ms':>8}{'>20ms frames':>14}{'burst s':>9}")
+    for mode in args.modes.split(","):
+        r = await measure(mode, args)
+        late = f"{r['late_frames']}/{r['frames']}"
+        print(
+            f"{r['mode']:<9}{r['p50_ms']:>8.1f}{r['p99_ms']:>8.1f}{r['max_ms']:>8.1f}"
+            f"{late:>14}{r['burst_secs']:>9.1f}"
+        )
+
+
+def child_main(args):
+    """The process mode side: post-process the burst at the worker process's priority."""
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    if POSTCALL_NICE > 0:
+        os.nice(POSTCALL_NICE)
+    asyncio.run(run_burst(args.child, fake_transcript(args.minutes)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live-call loop lag during a burst of post-call work")
+    parser.add_argument("--live", type=int, default=20, help="Live calls on the loop")
+    parser.add_argument("--jobs", type=int, default=40, help="Calls hanging up at once")
+    parser.add_argument("--minutes", type=float, default=5.0, help="Length of each hung-up call")
+    parser.add_argument("--modes", default="inline,process", help="Comma-separated modes")
+    parser.add_argument("--child", metavar="DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args)
+    else:
+        asyncio.run(main(args))
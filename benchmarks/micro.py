@@ -0,0 +1,444 @@
+"""
+Micro-benchmarks for the per-call helper paths, with stored baselines.
+
+Covers:
+  - call_recorder_write: 1s stereo 8kHz chunks through CallRecorder (incl. finalize)
+  - trim_silence:        silence trim + gap compression of a 60s stereo recording
+  - clinic_exact/fuzzy/miss/city:  get_near_by_clinic_data lookups
+  - create_dynamic_prompt
+  - metrics_on_push_frame:  MetricsCollector.on_push_frame over a call-like frame mix
+  - generate_twiml
+  - latest_calls:        /api/latest-calls serialization of 5 full Call records
+
+Mongo is replaced by in-memory document stand-ins (built with model_construct,
+so beanie never needs a database) and recordings go to a temporary directory,
+so the suite runs offline and measures only our code. Log output goes to a
+null sink (still formatted, as in production).
+
+Baselines are machine-specific: save one on the machine you compare on.
+
+Usage:
+    python -m benchmarks.micro                      # run, compare with baseline if present
+    python -m benchmarks.micro --save-baseline      # run and store as the new baseline
+    python -m benchmarks.micro -k clinic --threshold 0.1
+
+Exits with status 1 when any benchmark is slower than baseline by more than
+--threshold (default 20%) on its median.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from loguru import logger
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+
+_benchmarks = {}
+
+
+def benchmark(name: str, ops: int = 1):
+    """Register an async benchmark; `ops` is how many operations one call performs."""
+
+    def decorator(fn):
+        _benchmarks[name] = (fn, ops)
+        return fn
+
+    return decorator
+
+
+class _InMemoryQuery:
+    """Enough of a beanie FindMany for the helpers under test."""
+
+    def __init__(self, documents: list, query: dict = None):
+        query = query or {}
+        self._documents = [
+            doc for doc in documents if all(getattr(doc, key, None) == value for key, value in query.items())
+        ]
+
+    def sort(self, keys):
+        for key, direction in reversed(keys):
+            self._documents.sort(key=lambda doc: getattr(doc, key), reverse=direction < 0)
+        return self
+
+    def limit(self, n: int):
+        self._documents = self._documents[:n]
+        return self
+
+    async def to_list(self):
+        return list(self._documents)
+
+
+@contextmanager
+def in_memory_documents(collections: dict):
+    """Serve find/find_all/find_many/distinct for the given Document classes from lists."""
+    patched = []
+    for document_class, documents in collections.items():
+        originals = {name: document_class.__dict__.get(name) for name in ("find", "find_all", "find_many", "distinct")}
+        patched.append((document_class, originals))
+
+        def find(cls, query=None, *args, _documents=documents, **kwargs):
+            return _InMemoryQuery(_documents, query if isinstance(query, dict) else None)
+
+        async def distinct(cls, key, *args, _documents=documents, **kwargs):
+            return list(dict.fromkeys(getattr(doc, key) for doc in _documents))
+
+        document_class.find = classmethod(find)
+        document_class.find_all = classmethod(find)
+        document_class.find_many = classmethod(find)
+        document_class.distinct = classmethod(distinct)
+    try:
+        yield
+    finally:
+        for document_class, originals in patched:
+            for name, original in originals.items():
+                if original is None:
+                    delattr(document_class, name)
+                else:
+                    setattr(document_class, name, original)
+
+
+def pincode_rows(count: int = 2000) -> list:
+    from model.model import PincodeData
+
+    rng = random.Random(7)
+    cities = [f"{prefix}{suffix}" for prefix in ("Mumb", "Pun", "Delh", "Bangal", "Hyderab", "Chenn", "Kolk", "Ahmedab", "Jaip", "Lukn") for suffix in ("ai", "e", "i", "ore", "ad", "a", "pur", "abad", "garh", "nagar")]
+    return [
+        PincodeData.model_construct(
+            pincode=str(400000 + rng.randrange(5000)),
+            city=rng.choice(cities),
+            home_scan=rng.choice(["Yes", "No"]),
+            clinic_1=f"makeO Clinic {n}, Main Road",
+            clinic_2=f"makeO Clinic {n + 1}, Station Road" if n % 3 else None,
+        )
+        for n in range(count)
+    ]
+
+
+def _recording(secs: int = 60):
+    """Stereo 8kHz call: 4s turns alternating between channels, 3s line-noise gaps, 10s trailing pause."""
+    import numpy as np
+
+    rng = np.random.default_rng(5)
+    samples = (rng.standard_normal((secs * 8000, 2)) * 3).astype(np.int16)
+    for n, start in enumerate(range(2 * 8000, (secs - 10) * 8000, 7 * 8000)):
+        samples[start : start + 4 * 8000, n % 2] = (rng.standard_normal(4 * 8000) * 3000).astype(np.int16)
+    return samples
+
+
+def _call_records(count: int = 5) -> list:
+    from model.model import Call, CostData, MetricsData, TurnLatencyData
+
+    with open("transcripts.txt", encoding="utf-8", errors="replace") as f:
+        transcript = f.read()[:6000]
+
+    now = datetime.utcnow()
+    calls = []
+    for n in range(count):
+        turns = [600.0 + 10 * t for t in range(20)]
+        calls.append(
+            Call.model_construct(
+                call_sid=f"CA{n:032d}",
+                phone_number="+919999999999",
+                name="Bikash",
+                recording_url="https://res.cloudinary.com/demo/video/upload/recordings/CA.wav",
+                stt_provider="deepgram",
+                tts_provider="sarvam_ai",
+                llm_provider="openai/gpt-4o-mini",
+                call_cost=0.04,
+                call_duration=180,
+                transcript=transcript,
+                metrics=MetricsData(
+                    total_latency_ms=900.0,
+                    tts_ttfb_ms=250.0,
+                    stt_ttfb_ms=150.0,
+                    llm_ttfb_ms=500.0,
+                    total_prompt_tokens=40000,
+                    total_completion_tokens=900,
+                    total_tts_characters=2500,
+                    total_sst_duration_ms=1200.0,
+                    turn_latency=TurnLatencyData(
+                        turns=len(turns),
+                        voice_to_voice_ms=turns,
+                        transcript_ms=[150.0] * len(turns),
+                        llm_first_token_ms=[450.0] * len(turns),
+                        tts_first_audio_ms=[550.0] * len(turns),
+                        p50_ms=700.0,
+                        p95_ms=780.0,
+                        max_ms=790.0,
+                    ),
+                ),
+                cost=CostData(llm_cost=0.02, tts_cost=0.01, stt_cost=0.01, total_cost=0.04),
+                created_at=now - timedelta(minutes=n),
+                updated_at=now - timedelta(minutes=n),
+            )
+        )
+    return calls
+
+
+def _frame_mix(count: int = 3000) -> list:
+    """One minute-ish of pushes as an observer sees them: mostly audio, some text and metrics."""
+    from pipecat.frames.frames import (
+        InputAudioRawFrame,
+        LLMTextFrame,
+        MetricsFrame,
+        TranscriptionFrame,
+        TTSAudioRawFrame,
+    )
+    from pipecat.metrics.metrics import (
+        LLMTokenUsage,
+        LLMUsageMetricsData,
+        ProcessingMetricsData,
+        TTFBMetricsData,
+        TTSUsageMetricsData,
+    )
+    from pipecat.observers.base_observer import FramePushed
+    from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+    source, destination = FrameProcessor(), FrameProcessor()
+    metrics = MetricsFrame(
+        data=[
+            TTFBMetricsData(processor="OpenAILLMService#0", value=0.45),
+            TTFBMetricsData(processor="SarvamTTSService#0", value=0.25),
+            ProcessingMetricsData(processor="DeepgramSTTService#0", value=0.15),
+            LLMUsageMetricsData(
+                processor="OpenAILLMService#0",
+                value=LLMTokenUsage(prompt_tokens=2000, completion_tokens=40, total_tokens=2040),
+            ),
+            TTSUsageMetricsData(processor="SarvamTTSService#0", value=120),
+        ]
+    )
+    audio_in = InputAudioRawFrame(audio=b"\x00" * 320, sample_rate=8000, num_channels=1)
+    audio_out = TTSAudioRawFrame(audio=b"\x00" * 320, sample_rate=8000, num_channels=1)
+    text = LLMTextFrame("hello ")
+    transcription = TranscriptionFrame("हां की थी.", "user", "2025-01-01T00:00:00")
+
+    rng = random.Random(3)
+    frames = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            frame = audio_in
+        elif roll < 0.9:
+            frame = audio_out
+        elif roll < 0.97:
+            frame = text
+        elif roll < 0.99:
+            frame = transcription
+        else:
+            frame = metrics
+        frames.append(FramePushed(source, destination, frame, FrameDirection.DOWNSTREAM, 0))
+    return frames
+
+
+@benchmark("call_recorder_write", ops=50)
+async def bench_call_recorder_write(fixtures):
+    from utils.call_audio import CallRecorder
+
+    chunk = fixtures["audio_chunk"]
+    recorder = CallRecorder(f"bench_{next(fixtures['counter'])}")
+    for _ in range(50):
+        await recorder.write(chunk, 8000, 2)
+    await recorder.finalize()
+
+
+@benchmark("trim_silence")
+async def bench_trim_silence(fixtures):
+    from utils.recording_trim import trim_silence
+
+    trim_silence(fixtures["recording"], 8000, max_gap_secs=1.0)
+
+
+@benchmark("clinic_exact")
+async def bench_clinic_exact(fixtures):
+    from utils.tools import get_near_by_clinic_data
+
+    row = fixtures["pincodes"][0]
+    await get_near_by_clinic_data(pincode=row.pincode, city=row.city)
+
+
+@benchmark("clinic_fuzzy")
+async def bench_clinic_fuzzy(fixtures):
+    from utils.tools import get_near_by_clinic_data
+
+    row = fixtures["pincodes"][1]
+    await get_near_by_clinic_data(pincode=row.pincode, city=row.city[:-1] + "x")
+
+
+@benchmark("clinic_miss")
+async def bench_clinic_miss(fixtures):
+    from utils.tools import get_near_by_clinic_data
+
+    await get_near_by_clinic_data(pincode="999999", city="Atlantis")
+
+
+@benchmark("clinic_city")
+async def bench_clinic_city(fixtures):
+    from utils.tools import get_near_by_clinic_data
+
+    await get_near_by_clinic_data(city=fixtures["pincodes"][2].city)
+
+
+@benchmark("create_dynamic_prompt")
+async def bench_create_dynamic_prompt(fixtures):
+    from utils.prompt import create_dynamic_prompt
+
+    await create_dynamic_prompt("Bikash", multimodel=False)
+
+
+@benchmark("metrics_on_push_frame", ops=3000)
+async def bench_metrics_on_push_frame(fixtures):
+    from bots.standard.metric_collector import MetricsCollector
+
+    collector = MetricsCollector()
+    for data in fixtures["frames"]:
+        await collector.on_push_frame(data)
+
+
+@benchmark("generate_twiml")
+async def bench_generate_twiml(fixtures):
+    from utils.twilio import generate_twiml
+
+    generate_twiml(
+        "bot.example.com",
+        {"call_id": "CA0123", "name": "Bikash", "stt_provider": "deepgram", "tts_provider": "sarvam_ai"},
+        multimodel=False,
+    )
+
+
+@benchmark("latest_calls")
+async def bench_latest_calls(fixtures):
+    await fixtures["get_latest_calls"]()
+
+
+async def _measure(fn, fixtures, rounds: int, min_time: float) -> list:
+    """Per-call seconds for each round; calls per round are calibrated to ~min_time."""
+    await fn(fixtures)  # warm-up
+
+    start = time.perf_counter()
+    await fn(fixtures)
+    once = max(time.perf_counter() - start, 1e-7)
+    number = max(1, int(min_time / once))
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            await fn(fixtures)
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+async def run(selected: list, rounds: int, min_time: float) -> dict:
+    # main adds its own file sink on import; replace all sinks afterwards
+    from main import get_latest_calls
+    from model.model import Call, PincodeData, organization
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+
+    with open("p.txt", encoding="utf-8") as f:
+        prompt = f.read()
+
+    from itertools import count
+
+    fixtures = {
+        "audio_chunk": bytes(8000 * 2 * 2),  # 1s of 16-bit stereo at 8kHz
+        "recording": _recording(),
+        "counter": count(),
+        "pincodes": pincode_rows(),
+        "frames": _frame_mix(),
+        "get_latest_calls": get_latest_calls,
+    }
+    collections = {
+        PincodeData: fixtures["pincodes"],
+        organization: [organization.model_construct(prompt=prompt) for _ in range(2)],
+        Call: _call_records(),
+    }
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, in_memory_documents(collections):
+        # Relative paths (p.txt, transcripts.txt) were read above; recordings go to tmp
+        os.chdir(tmp)
+        try:
+            for name in selected:
+                fn, ops = _benchmarks[name]
+                timings = [t / ops for t in await _measure(fn, fixtures, rounds, min_time)]
+                results[name] = {
+                    "median_us": round(statistics.median(timings) * 1e6, 3),
+                    "min_us": round(min(timings) * 1e6, 3),
+                    "stdev_us": round(statistics.pstdev(timings) * 1e6, 3),
+                    "rounds": rounds,
+                }
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print a comparison table and return the names that regressed."""
+    regressions = []
+    print(f"{'benchmark':<24}{'median':>14}{'baseline':>14}{'change':>10}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        line = f"{name:<24}{result['median_us']:>12.1f}us"
+        if base:
+            change = result["median_us"] / base["median_us"] - 1
+            flag = "  REGRESSION" if change > threshold else ""
+            if flag:
+                regressions.append(name)
+            line += f"{base['median_us']:>12.1f}us{change:>+9.1%}{flag}"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    selected = [name for name in _benchmarks if args.pattern in name]
+    results = asyncio.run(run(selected, args.rounds, args.min_time))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "saved_at": datetime.utcnow().isoformat(),
+                    "results": {**baseline, **results},
+                },
+                f,
+                indent=2,
+            )
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
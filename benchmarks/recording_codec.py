@@ -0,0 +1,85 @@
+"""
+Size and CPU cost of each RECORDING_CODEC for call recordings.
+
+Encodes a stereo 8kHz 16-bit WAV (a --wav fixture, or a synthetic call with
+speech-like bursts on alternating tracks and silence between turns) with every
+codec and reports, per minute of call audio:
+  - output size and reduction vs WAV
+  - encode CPU seconds (measured inside the encoder, as the process pool runs it)
+
+Usage:
+    python -m benchmarks.recording_codec [--wav recordings/server_CA..wav] [--minutes 3]
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from utils.call_audio import create_wav_header
+from utils.recording_codec import CODECS, encode_file
+
+SAMPLE_RATE = 8000
+
+
+def synthetic_call(minutes: float) -> bytes:
+    """Alternating 3-6s turns of voiced noise per track with 0.5-2s gaps, interleaved stereo."""
+    rng = np.random.default_rng(11)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    tracks = np.zeros((total, 2), dtype=np.float32)
+
+    position, speaker = 0, 0
+    while position < total:
+        length = int(rng.uniform(3, 6) * SAMPLE_RATE)
+        t = np.arange(min(length, total - position)) / SAMPLE_RATE
+        pitch = rng.uniform(110, 220)
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)  # ~4 syllables/s
+        tracks[position : position + len(t), speaker] = (voiced + 0.3 * rng.standard_normal(len(t))) * envelope
+        position += len(t) + int(rng.uniform(0.5, 2) * SAMPLE_RATE)
+        speaker = 1 - speaker
+
+    tracks += 0.01 * rng.standard_normal(tracks.shape)  # line noise
+    pcm = np.clip(tracks / np.abs(tracks).max() * 8000, -32768, 32767).astype("<i2")
+    return pcm.tobytes()
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.wav:
+            source = args.wav
+        else:
+            audio = synthetic_call(args.minutes)
+            source = os.path.join(tmp, "call.wav")
+            with open(source, "wb") as f:
+                f.write(create_wav_header(len(audio), SAMPLE_RATE, 2))
+                f.write(audio)
+
+        wav_size = os.path.getsize(source)
+        minutes = sf.info(source).duration / 60
+
+        print(f"{'codec':<8}{'KB/min':>10}{'reduction':>11}{'CPU ms/min':>12}")
+        print(f"{'wav':<8}{wav_size / 1024 / minutes:>10.0f}{'-':>11}{0.0:>12.1f}")
+        for codec in CODECS:
+            work = os.path.join(tmp, f"{codec}.wav")
+            with open(source, "rb") as src, open(work, "wb") as dst:
+                dst.write(src.read())
+            try:
+                results = [encode_file(work, codec) for _ in range(args.repeat)]
+            except Exception as e:
+                print(f"{codec:<8}  unavailable: {e}")
+                continue
+
+            cpu_ms = min(r["cpu_secs"] for r in results) * 1000 / minutes
+            size = results[0]["dst_bytes"]
+            print(f"{codec:<8}{size / 1024 / minutes:>10.0f}{1 - size / wav_size:>11.1%}{cpu_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recording codec size/CPU benchmark")
+    parser.add_argument("--wav", help="Recorded call to encode instead of the synthetic one")
+    parser.add_argument("--minutes", type=float, default=3.0, help="Length of the synthetic call")
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per codec; the fastest is reported")
+    main(parser.parse_args())
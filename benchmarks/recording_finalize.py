@@ -0,0 +1,184 @@
+"""
+Time from call disconnect to the post-call handoff, fixed sleeps vs the recorder's completion signal.
+
+Each call streams --secs of stereo 8kHz audio through an AudioBufferProcessor
+into a CallRecorder, with the last RECORDING_BUFFER_SECS still buffered when
+the call ends. The disconnect is then timed until the post-call job would be
+queued, for:
+  - legacy: stop_recording(), asyncio.sleep(0.5), finalize(), then polling
+    recordings/server_<sid>_*.wav and picking the newest file (the old flow)
+  - event:  utils.call_audio.stop_recording(), which returns the finished
+    recording once its last byte is written, handed straight to
+    finalize_audio_recording()
+
+Reported per mode: handoff latency p50/max, the time spent in asyncio.sleep
+calls with a non-zero delay, and whether every handed-off file had exactly
+the bytes written to it. --handler-delay-ms slows the on_audio_data handler
+(e.g. a loaded event loop) to show the fixed sleep is also a race.
+
+The post-call queue is replaced by a stub that records the handoff; nothing
+touches Mongo or Cloudinary. Files are written under a temporary directory.
+
+With --check only the event mode runs, and the exit status is 1 unless no
+call slept and every handed-off file is complete.
+
+Usage:
+    python -m benchmarks.recording_finalize [--calls 20] [--secs 30] [--handler-delay-ms 0]
+    python -m benchmarks.recording_finalize --check
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from pipecat.processors.audio.audio_buffer_processor import AudioBufferProcessor
+
+import utils.call_audio as call_audio
+from utils.stats import percentile
+from utils.call_audio import (
+    CallRecorder,
+    finalize_audio_recording,
+    pipecat_internals_tested,
+    recording_buffer_size,
+    stop_recording,
+)
+
+SAMPLE_RATE = 8000
+
+_real_sleep = asyncio.sleep
+_slept = [0.0]
+
+
+async def _counting_sleep(delay, *args, **kwargs):
+    """asyncio.sleep that adds up the non-zero delays requested (zero is just a yield)."""
+    if delay > 0:
+        _slept[0] += delay
+    return await _real_sleep(delay, *args, **kwargs)
+
+
+def buffer_tail(audiobuffer, sample_rate: int, tail: bytes):
+    """Leave `tail` in both of the processor's buffers, as if the call's last frames just arrived.
+
+    The only place AudioBufferProcessor internals are touched: driving real
+    frames would need a running pipeline.
+    """
+    for name in ("_sample_rate", "_user_audio_buffer", "_bot_audio_buffer"):
+        if not hasattr(audiobuffer, name):
+            raise SystemExit(f"AudioBufferProcessor has no {name}: update buffer_tail() for this pipecat release")
+    audiobuffer._sample_rate = sample_rate
+    audiobuffer._user_audio_buffer.extend(tail)
+    audiobuffer._bot_audio_buffer.extend(tail)
+
+
+async def legacy_disconnect(audiobuffer, recorder, call_sid):
+    """The disconnect sequence before the recorder signalled completion."""
+    await audiobuffer.stop_recording()
+    await asyncio.sleep(0.5)
+    await recorder.finalize()
+
+    recording_files = []
+    for _ in range(10):
+        recording_files = glob.glob(f"recordings/server_{call_sid}_*.wav")
+        if recording_files:
+            break
+        await asyncio.sleep(0.1)
+    latest_file = max(recording_files, key=os.path.getctime) if recording_files else None
+    await call_audio._queue_post_call(call_sid, "", 0.0, recording_path=latest_file)
+
+
+async def event_disconnect(audiobuffer, recorder, call_sid):
+    recording = await stop_recording(audiobuffer, recorder)
+    await finalize_audio_recording(call_sid, f"server_{call_sid}", "", 0.0, recording=recording)
+
+
+async def run_call(mode: str, index: int, args, handoffs: dict):
+    call_sid = f"CA{mode}{index:04d}"
+    buffer_size = recording_buffer_size(SAMPLE_RATE)
+    audiobuffer = AudioBufferProcessor(
+        sample_rate=None, num_channels=2, buffer_size=buffer_size, enable_turn_audio=False
+    )
+    recorder = CallRecorder(f"server_{call_sid}")
+
+    @audiobuffer.event_handler("on_audio_data")
+    async def on_audio_data(buffer, audio, sample_rate, num_channels):
+        if args.handler_delay_ms:
+            await _real_sleep(args.handler_delay_ms / 1000)
+        await recorder.write(audio, sample_rate, num_channels)
+
+    rng = np.random.default_rng(index)
+    track = (rng.standard_normal(int(args.secs * SAMPLE_RATE)) * 2000).astype("<i2").tobytes()
+    # Everything but the last buffer goes through the recorder during the "call"
+    written = len(track) - buffer_size
+    await recorder.write(
+        np.column_stack([np.frombuffer(track[:written], "<i2")] * 2).tobytes(), SAMPLE_RATE, 2
+    )
+    await audiobuffer.start_recording()
+    buffer_tail(audiobuffer, SAMPLE_RATE, track[written:])
+
+    _slept[0] = 0.0
+    start = time.perf_counter()
+    await (legacy_disconnect if mode == "legacy" else event_disconnect)(audiobuffer, recorder, call_sid)
+    path = handoffs.pop(call_sid)
+    handoff_ms = (time.perf_counter() - start) * 1000
+
+    expected = call_audio.WAV_HEADER_SIZE + len(track) * 2
+    complete = bool(path) and os.path.getsize(path) == expected
+    return handoff_ms, _slept[0] * 1000, complete
+
+
+async def main(args) -> bool:
+    """Print the table; False if --check failed."""
+    handoffs = {}
+
+    async def queue_stub(call_sid, transcript, call_cost, recording_url=None, recording_path=None):
+        handoffs[call_sid] = recording_path
+
+    call_audio._queue_post_call = queue_stub
+    asyncio.sleep = _counting_sleep
+    if not pipecat_internals_tested():
+        print("warning: this pipecat-ai release is not one stop_recording() was verified with")
+    ok = True
+
+    print(f"{args.calls} calls x {args.secs:g}s stereo {SAMPLE_RATE}Hz, handler delay {args.handler_delay_ms}ms")
+    print(f"{'mode':<8}{'p50 ms':>9}{'max ms':>9}{'slept ms/call':>15}{'complete':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            for mode in args.modes.split(","):
+                results = [await run_call(mode, i, args, handoffs) for i in range(args.calls)]
+                latency = [r[0] for r in results]
+                slept = sum(r[1] for r in results) / len(results)
+                complete = sum(r[2] for r in results)
+                print(
+                    f"{mode:<8}{percentile(latency, 50):>9.1f}{max(latency):>9.1f}"
+                    f"{slept:>15.1f}{f'{complete}/{len(results)}':>10}"
+                )
+                if mode == "event" and (slept > 0 or complete < len(results)):
+                    ok = False
+        finally:
+            os.chdir(cwd)
+            asyncio.sleep = _real_sleep
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Disconnect-to-post-call latency of recording finalization")
+    parser.add_argument("--calls", type=int, default=20, help="Calls per mode")
+    parser.add_argument("--secs", type=float, default=30.0, help="Call length")
+    parser.add_argument("--handler-delay-ms", type=float, default=0.0, help="Extra latency of on_audio_data")
+    parser.add_argument("--modes", default="legacy,event", help="Comma-separated modes")
+    parser.add_argument("--check", action="store_true", help="Event mode only; exit 1 on any sleep or incomplete file")
+    args = parser.parse_args()
+    if args.check:
+        args.modes = "event"
+
+    ok = asyncio.run(main(args))
+    if args.check:
+        print("OK: no fixed sleeps, every recording complete" if ok else "FAIL: event mode slept or lost audio")
+        sys.exit(0 if ok else 1)
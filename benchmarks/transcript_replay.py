@@ -0,0 +1,281 @@
+"""
+Offline replay of recorded conversations through the text side of the cascade.
+
+transcripts.txt is split into conversations (see utils.fake_services) and the
+caller's turns of each are fed, one response at a time, through the same
+context aggregator -> LLM (with the get_nearby_clinics / end_call tools) that
+run_bot_2 builds. No audio, STT or TTS is involved.
+
+Per conversation it reports prompt/completion tokens, tool calls, LLM TTFB
+(p50 / max over every LLM response) and LLM cost, plus totals, tagged with a
+hash of the system prompt so runs of different prompt versions can be compared.
+
+Usage:
+    python -m benchmarks.transcript_replay --llm-provider fake/instant
+    python -m benchmarks.transcript_replay --llm-provider openai/gpt-4o-mini-2024-07-18 \\
+        --limit 20 --concurrency 5 --prompt-file p.txt --json replay.json
+
+The prompt comes from --prompt-file (default p.txt) or, with --db, from the
+organization collection exactly as run_bot_2 loads it; --db also serves the
+clinic lookups from Mongo instead of synthetic in-memory rows.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+
+from loguru import logger
+from pipecat.adapters.schemas.tools_schema import ToolsSchema
+from pipecat.frames.frames import (
+    EndFrame,
+    FunctionCallResultFrame,
+    FunctionCallsStartedFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMMessagesAppendFrame,
+    LLMRunFrame,
+    MetricsFrame,
+)
+from pipecat.metrics.metrics import LLMUsageMetricsData, TTFBMetricsData
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameDirection
+
+from bots.standard.metric_collector import CostCollector
+from utils.stats import percentile
+from utils.fake_services import FakeLLMService, get_latency_profile, load_conversations
+from utils.tool_schema import _handle_end_call, _handle_get_nearby_clinics, fs_end_call, fs_get_nearby_clinics
+
+
+class ReplayObserver(BaseObserver):
+    """Collects LLM usage, TTFB and tool calls, and tells when a turn's response is complete.
+
+    A turn is complete at an LLMFullResponseEndFrame with no tool calls
+    outstanding and no follow-up LLM run owed for tool results.
+    """
+
+    def __init__(self, llm):
+        super().__init__()
+        self._llm = llm
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = {}
+        self.ttfb_ms = []
+        self.responses = 0
+        self._pending_calls = 0
+        self._awaiting_followup = False
+        self.turn_done = asyncio.Event()
+
+    async def on_push_frame(self, data: FramePushed):
+        if data.source is not self._llm or data.direction != FrameDirection.DOWNSTREAM:
+            return
+
+        frame = data.frame
+        if isinstance(frame, MetricsFrame):
+            for d in frame.data:
+                if isinstance(d, TTFBMetricsData) and d.value:
+                    self.ttfb_ms.append(d.value * 1000)
+                elif isinstance(d, LLMUsageMetricsData):
+                    self.prompt_tokens += d.value.prompt_tokens
+                    self.completion_tokens += d.value.completion_tokens
+        elif isinstance(frame, FunctionCallsStartedFrame):
+            self._pending_calls += len(frame.function_calls)
+            for call in frame.function_calls:
+                self.tool_calls[call.function_name] = self.tool_calls.get(call.function_name, 0) + 1
+        elif isinstance(frame, FunctionCallResultFrame):
+            self._pending_calls = max(0, self._pending_calls - 1)
+            if self._pending_calls == 0:
+                self._awaiting_followup = True
+        elif isinstance(frame, LLMFullResponseStartFrame):
+            self._awaiting_followup = False
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.responses += 1
+            if self._pending_calls == 0 and not self._awaiting_followup:
+                self.turn_done.set()
+
+
+def _create_llm(provider: str, conversation: list):
+    if provider.startswith("fake"):
+        # Replay this conversation's own assistant lines
+        profile = provider.split("/", 1)[1] if "/" in provider else None
+        return FakeLLMService(profile=get_latency_profile("llm", profile), conversation=conversation)
+
+    from utils.call_config import get_llm_service_config
+
+    return get_llm_service_config(provider)
+
+
+async def replay_conversation(index: int, conversation: list, prompt: str, args) -> dict:
+    llm = _create_llm(args.llm_provider, conversation)
+    llm.register_function("get_nearby_clinics", _handle_get_nearby_clinics)
+    llm.register_function("end_call", _handle_end_call)
+
+    # Same opening context as run_bot_2
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": "say: Hello,"},
+    ]
+    context = OpenAILLMContext(messages, tools=ToolsSchema(standard_tools=[fs_get_nearby_clinics, fs_end_call]))
+    context_aggregator = llm.create_context_aggregator(context)
+
+    observer = ReplayObserver(llm)
+    task = PipelineTask(
+        Pipeline([context_aggregator.user(), llm, context_aggregator.assistant()]),
+        params=PipelineParams(enable_metrics=True, enable_usage_metrics=True),
+        observers=[observer],
+        idle_timeout_secs=None,
+    )
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+
+    user_turns = [m["content"] for m in conversation if m["role"] == "user"]
+    replayed = 0
+    error = None
+    start = time.perf_counter()
+
+    async def wait_for_response():
+        done = asyncio.create_task(observer.turn_done.wait())
+        await asyncio.wait([done, runner], timeout=args.turn_timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done.done():
+            done.cancel()
+            if not runner.done():
+                raise TimeoutError(f"no response within {args.turn_timeout}s")
+        observer.turn_done.clear()
+
+    try:
+        await task.queue_frame(LLMRunFrame())
+        await wait_for_response()
+        for text in user_turns:
+            if runner.done():
+                break  # end_call ended the conversation
+            await task.queue_frame(LLMMessagesAppendFrame([{"role": "user", "content": text}], run_llm=True))
+            await wait_for_response()
+            replayed += 1
+    except Exception as e:
+        error = str(e)
+    finally:
+        if not runner.done():
+            await task.queue_frame(EndFrame())
+        await runner
+
+    cost = CostCollector()
+    cost.calculate_llm_cost(observer.prompt_tokens, observer.completion_tokens, args.price_as or args.llm_provider)
+
+    return {
+        "conversation": index,
+        "user_turns": len(user_turns),
+        "replayed_turns": replayed,
+        "llm_responses": observer.responses,
+        "prompt_tokens": observer.prompt_tokens,
+        "completion_tokens": observer.completion_tokens,
+        "tool_calls": sum(observer.tool_calls.values()),
+        "tool_calls_by_name": observer.tool_calls,
+        "ttfb_p50_ms": round(percentile(observer.ttfb_ms, 50), 1),
+        "ttfb_max_ms": round(max(observer.ttfb_ms, default=0.0), 1),
+        "llm_cost": round(cost.llm_cost, 6),
+        "wall_secs": round(time.perf_counter() - start, 2),
+        "error": error,
+    }
+
+
+async def load_prompt(args) -> str:
+    if args.db:
+        from utils.prompt import create_dynamic_prompt
+
+        return await create_dynamic_prompt(args.name, multimodel=False)
+
+    with open(args.prompt_file, encoding="utf-8") as f:
+        return f.read().replace("{name}", args.name)
+
+
+async def main(args):
+    from contextlib import nullcontext
+
+    from benchmarks.micro import in_memory_documents, pincode_rows
+    from model.model import PincodeData, close_db_connection, connect_to_db
+
+    if args.db:
+        await connect_to_db()
+
+    prompt = await load_prompt(args)
+    prompt_version = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+    conversations = load_conversations(args.transcripts)[args.offset : args.offset + args.limit]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(index, conversation):
+        async with semaphore:
+            return await replay_conversation(index, conversation, prompt, args)
+
+    stand_ins = nullcontext() if args.db else in_memory_documents({PincodeData: pincode_rows()})
+    with stand_ins:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run(args.offset + i, conversation) for i, conversation in enumerate(conversations))
+        )
+        wall = time.perf_counter() - start
+
+    if args.db:
+        await close_db_connection()
+
+    print(f"provider {args.llm_provider}  prompt {prompt_version} ({len(prompt)} chars)  conversations {len(results)}")
+    print(f"{'conv':>5}{'turns':>7}{'prompt tok':>12}{'compl tok':>11}{'tools':>7}{'ttfb p50':>10}{'ttfb max':>10}{'cost $':>11}")
+    for r in results:
+        print(
+            f"{r['conversation']:>5}{r['replayed_turns']:>7}{r['prompt_tokens']:>12}{r['completion_tokens']:>11}"
+            f"{r['tool_calls']:>7}{r['ttfb_p50_ms']:>10}{r['ttfb_max_ms']:>10}{r['llm_cost']:>11.5f}"
+            + (f"  error: {r['error']}" if r["error"] else "")
+        )
+
+    all_ttfb_p50 = [r["ttfb_p50_ms"] for r in results if r["llm_responses"]]
+    summary = {
+        "llm_provider": args.llm_provider,
+        "prompt_version": prompt_version,
+        "prompt_chars": len(prompt),
+        "conversations": len(results),
+        "failed": sum(1 for r in results if r["error"]),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in results),
+        "completion_tokens": sum(r["completion_tokens"] for r in results),
+        "tool_calls": sum(r["tool_calls"] for r in results),
+        "ttfb_p50_ms": round(percentile(all_ttfb_p50, 50), 1),
+        "llm_cost": round(sum(r["llm_cost"] for r in results), 6),
+        "mean_cost_per_conversation": round(sum(r["llm_cost"] for r in results) / max(1, len(results)), 6),
+        "wall_secs": round(wall, 2),
+    }
+    print(
+        f"total: {summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion tokens, "
+        f"{summary['tool_calls']} tool calls, ttfb p50 {summary['ttfb_p50_ms']}ms, "
+        f"${summary['llm_cost']:.4f} (${summary['mean_cost_per_conversation']:.5f}/conversation), "
+        f"{summary['failed']} failed, {summary['wall_secs']}s"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "conversations": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay transcripts.txt conversations through context aggregator + LLM")
+    parser.add_argument("--llm-provider", default="fake/instant", help='"provider/model" as stored on Call, or "fake/<profile>"')
+    parser.add_argument("--price-as", help="Price tokens as this llm_prices model (e.g. when replaying against fake)")
+    parser.add_argument("--transcripts", default="transcripts.txt", help="transcripts.txt, or a transcripts/ directory or .jsonl file")
+    parser.add_argument("--prompt-file", default="p.txt")
+    parser.add_argument("--db", action="store_true", help="Load the prompt and clinic data from Mongo")
+    parser.add_argument("--name", default="Bikash", help="Customer name substituted into the prompt")
+    parser.add_argument("--limit", type=int, default=50, help="Number of conversations to replay")
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--turn-timeout", type=float, default=60.0, help="Seconds to wait for each LLM response")
+    parser.add_argument("--verbose", action="store_true", help="Show pipecat/bot logs")
+    parser.add_argument("--json", help="Write the summary and per-conversation results to this file")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+    asyncio.run(main(args))
@@ -0,0 +1,353 @@
+"""
+Simulated Twilio Media Streams load generator for /ws and /ws2.
+
+Each simulated call speaks the Twilio Media Streams protocol (connected, start,
+media, mark, stop) against the server, plays a WAV fixture as the caller at
+real-time pace, and measures what a caller would experience:
+
+  - time to first audio: "start" sent -> first non-silent bot audio
+  - turn latency: end of a caller utterance -> first non-silent bot audio
+  - late frames: bot audio arriving more than --late-ms after the previous
+    frame while the bot is speaking (event-loop stalls on the server)
+  - server CPU and RSS, sampled from /api/workers while the step runs
+
+Concurrency is ramped in steps, so the output is the capacity curve of one node.
+
+Usage:
+    python -m benchmarks.twilio_load --url ws://localhost:8000/ws2 \\
+        --steps 1,5,10,20 --call-secs 60 --wav fixtures/caller.wav
+
+Calls are looked up by CallSid on the server. Use --seed-calls to insert the
+Call documents (with the chosen providers) into Mongo before the run.
+
+To size WEB_CONCURRENCY, run the same steps against the server started with
+WEB_CONCURRENCY=1, 2, 4, ... and compare the curves. More workers than cores
+only adds processes competing for the same CPU: late % and turn latency get
+worse, not better. Check the server log for "Child process [...] died" before
+trusting a run: a worker that can't answer uvicorn's health check within 5s
+(slow startup on a starved CPU) is killed and respawned, and the run then
+measures the restarts.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+import uuid
+import wave
+from urllib.parse import urlparse
+
+import aiohttp
+import numpy as np
+import websockets
+
+from utils.stats import percentile
+from benchmarks.ulaw_codec import pcm16_to_ulaw, ulaw_to_pcm16
+
+FRAME_MS = 20
+FRAME_BYTES = 8000 * FRAME_MS // 1000  # 20ms of 8kHz μ-law
+ULAW_SILENCE = b"\xff" * FRAME_BYTES
+# Mean absolute amplitude above which received audio counts as bot speech
+SPEECH_LEVEL = 300
+
+
+def load_fixture(path: str) -> list:
+    """Load a WAV file as 20ms frames of 8kHz mono μ-law."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV fixtures are supported")
+        rate = wav.getframerate()
+        channels = wav.getnchannels()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != 8000:
+        positions = np.arange(0, len(samples), rate / 8000)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+
+    ulaw = pcm16_to_ulaw(samples.astype("<i2").tobytes())
+    return [
+        ulaw[i : i + FRAME_BYTES].ljust(FRAME_BYTES, b"\xff")
+        for i in range(0, len(ulaw), FRAME_BYTES)
+    ]
+
+
+def synthetic_utterance(seconds: float = 1.5) -> list:
+    """A speech-level 300Hz tone, used when no WAV fixture is given."""
+    t = np.arange(int(8000 * seconds)) / 8000
+    samples = (6000 * np.sin(2 * np.pi * 300 * t)).astype("<i2")
+    ulaw = pcm16_to_ulaw(samples.tobytes())
+    return [ulaw[i : i + FRAME_BYTES] for i in range(0, len(ulaw), FRAME_BYTES)]
+
+
+def is_speech(payload: bytes) -> bool:
+    pcm = np.frombuffer(ulaw_to_pcm16(payload), dtype="<i2")
+    return bool(len(pcm)) and float(np.abs(pcm).mean()) > SPEECH_LEVEL
+
+
+class SimulatedCall:
+    """One simulated Twilio call against the media WebSocket."""
+
+    def __init__(self, url: str, call_sid: str, utterances: list, args):
+        self.url = url
+        self.call_sid = call_sid
+        self.stream_sid = "MZ" + uuid.uuid4().hex
+        self.utterances = utterances
+        self.args = args
+
+        self.error = None
+        self.started_at = None
+        self.time_to_first_audio_ms = None
+        self.turn_latencies_ms = []
+        self.frames_received = 0
+        self.late_frames = 0
+        self.late_sends = 0
+
+        self._sequence = 0
+        self._last_speech_at = None
+        self._utterance_end = None
+
+    def _message(self, event: str, **fields) -> str:
+        self._sequence += 1
+        return json.dumps(
+            {
+                "event": event,
+                "sequenceNumber": str(self._sequence),
+                "streamSid": self.stream_sid,
+                **fields,
+            }
+        )
+
+    async def run(self):
+        try:
+            async with websockets.connect(self.url, max_size=None) as ws:
+                await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+                await ws.send(
+                    self._message(
+                        "start",
+                        start={
+                            "streamSid": self.stream_sid,
+                            "accountSid": "AC" + "0" * 32,
+                            "callSid": self.call_sid,
+                            "tracks": ["inbound"],
+                            "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+                            "customParameters": {"name": "Load Test"},
+                        },
+                    )
+                )
+                self.started_at = time.perf_counter()
+
+                receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    await self._speak(ws)
+                    await ws.send(self._message("stop", stop={"callSid": self.call_sid}))
+                finally:
+                    receiver.cancel()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    async def _send_frames(self, ws, frames, chunk_offset: int) -> int:
+        """Send frames at real-time pace, counting sends that fell behind schedule."""
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            due = start + i * FRAME_MS / 1000
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > self.args.late_ms / 1000:
+                self.late_sends += 1
+            chunk = chunk_offset + i
+            await ws.send(
+                self._message(
+                    "media",
+                    media={
+                        "track": "inbound",
+                        "chunk": str(chunk),
+                        "timestamp": str(chunk * FRAME_MS),
+                        "payload": base64.b64encode(frame).decode("ascii"),
+                    },
+                )
+            )
+        return chunk_offset + len(frames)
+
+    async def _speak(self, ws):
+        """Caller side: alternate utterances and silence until the call ends."""
+        pause_frames = [ULAW_SILENCE] * int(self.args.pause_secs * 1000 / FRAME_MS)
+        deadline = self.started_at + self.args.call_secs
+        chunk = 0
+
+        # Let the bot greet first
+        chunk = await self._send_frames(ws, pause_frames, chunk)
+        turn = 0
+        while time.perf_counter() < deadline:
+            utterance = self.utterances[turn % len(self.utterances)]
+            chunk = await self._send_frames(ws, utterance, chunk)
+            self._utterance_end = time.perf_counter()
+            chunk = await self._send_frames(ws, pause_frames, chunk)
+            turn += 1
+
+    async def _receive(self, ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            event = message.get("event")
+
+            if event == "mark":
+                # Twilio echoes marks back once the audio before them has played
+                await ws.send(self._message("mark", mark=message.get("mark", {})))
+            elif event == "media":
+                self._on_media(base64.b64decode(message["media"]["payload"]))
+
+    def _on_media(self, payload: bytes):
+        now = time.perf_counter()
+        self.frames_received += 1
+        if not is_speech(payload):
+            return
+
+        if self.time_to_first_audio_ms is None:
+            self.time_to_first_audio_ms = (now - self.started_at) * 1000
+
+        if self._utterance_end is not None:
+            self.turn_latencies_ms.append((now - self._utterance_end) * 1000)
+            self._utterance_end = None
+
+        # A gap within a burst of speech means the server fell behind real time
+        if self._last_speech_at is not None:
+            gap_ms = (now - self._last_speech_at) * 1000
+            if self.args.late_ms < gap_ms < self.args.burst_gap_ms:
+                self.late_frames += 1
+        self._last_speech_at = now
+
+
+async def sample_server(http_url: str, samples: list, stop: asyncio.Event):
+    """Poll /api/workers for node CPU and RSS while a step runs."""
+    async with aiohttp.ClientSession() as session:
+        while not stop.is_set():
+            try:
+                async with session.get(f"{http_url}/api/workers", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                    if response.status == 200:
+                        workers = (await response.json())["workers"]
+                        samples.append(
+                            {
+                                "cpu_percent": sum(w["cpu_percent"] for w in workers),
+                                "rss_mb": sum(w["rss_mb"] for w in workers),
+                            }
+                        )
+            except Exception:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def seed_calls(call_sids: list, args):
+    """Insert Call documents so the server finds the simulated CallSids."""
+    from model.model import Call, connect_to_db
+
+    await connect_to_db()
+    await Call.insert_many(
+        [
+            Call(
+                call_sid=call_sid,
+                phone_number="+10000000000",
+                name="Load Test",
+                multimodel=not args.url.rstrip("/").endswith("/ws2"),
+                stt_provider=args.stt_provider,
+                tts_provider=args.tts_provider,
+                llm_provider=args.llm_provider,
+            )
+            for call_sid in call_sids
+        ]
+    )
+
+
+def summarize(level: int, calls: list, server_samples: list) -> dict:
+    ok = [c for c in calls if c.error is None]
+    ttfa = [c.time_to_first_audio_ms for c in ok if c.time_to_first_audio_ms is not None]
+    turns = [latency for c in ok for latency in c.turn_latencies_ms]
+    frames = sum(c.frames_received for c in ok)
+    return {
+        "concurrent_calls": level,
+        "ok": len(ok),
+        "failed": len(calls) - len(ok),
+        "errors": sorted({c.error for c in calls if c.error})[:5],
+        "ttfa_p50_ms": round(percentile(ttfa, 50), 1),
+        "ttfa_p95_ms": round(percentile(ttfa, 95), 1),
+        "turn_p50_ms": round(percentile(turns, 50), 1),
+        "turn_p95_ms": round(percentile(turns, 95), 1),
+        "turns": len(turns),
+        "late_frame_pct": round(100 * sum(c.late_frames for c in ok) / frames, 2) if frames else 0.0,
+        "late_sends": sum(c.late_sends for c in ok),
+        "server_cpu_max_pct": max((s["cpu_percent"] for s in server_samples), default=None),
+        "server_rss_max_mb": max((s["rss_mb"] for s in server_samples), default=None),
+    }
+
+
+async def run_step(level: int, utterances: list, args) -> dict:
+    call_sids = [f"CA{uuid.uuid4().hex}" for _ in range(level)]
+    if args.seed_calls:
+        await seed_calls(call_sids, args)
+
+    calls = [SimulatedCall(args.url, call_sid, utterances, args) for call_sid in call_sids]
+
+    parsed = urlparse(args.url)
+    http_url = f"{'https' if parsed.scheme == 'wss' else 'http'}://{parsed.netloc}"
+    server_samples = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_server(http_url, server_samples, stop))
+
+    async def start(i, call):
+        # Spread call setup over the ramp window instead of a thundering herd
+        await asyncio.sleep(args.ramp_secs * i / max(1, level))
+        await call.run()
+
+    await asyncio.gather(*(start(i, call) for i, call in enumerate(calls)))
+    stop.set()
+    await sampler
+    return summarize(level, calls, server_samples)
+
+
+async def main(args):
+    utterances = [load_fixture(path) for path in args.wav] if args.wav else [synthetic_utterance()]
+
+    results = []
+    header = f"{'calls':>6}{'ok':>5}{'fail':>6}{'ttfa p50':>10}{'ttfa p95':>10}{'turn p50':>10}{'turn p95':>10}{'late %':>8}{'cpu %':>8}{'rss MB':>9}"
+    print(header)
+    for level in args.steps:
+        result = await run_step(level, utterances, args)
+        results.append(result)
+        print(
+            f"{level:>6}{result['ok']:>5}{result['failed']:>6}"
+            f"{result['ttfa_p50_ms']:>10}{result['ttfa_p95_ms']:>10}"
+            f"{result['turn_p50_ms']:>10}{result['turn_p95_ms']:>10}"
+            f"{result['late_frame_pct']:>8}"
+            f"{str(result['server_cpu_max_pct']):>8}{str(result['server_rss_max_mb']):>9}"
+        )
+        for error in result["errors"]:
+            print(f"        error: {error}")
+        await asyncio.sleep(args.cooldown_secs)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Twilio Media Streams load generator")
+    parser.add_argument("--url", default="ws://localhost:8000/ws2", help="Media WebSocket URL (/ws or /ws2)")
+    parser.add_argument("--steps", default="1,5,10", type=lambda v: [int(x) for x in v.split(",")], help="Concurrent calls per ramp step")
+    parser.add_argument("--call-secs", type=float, default=60.0, help="Length of each simulated call")
+    parser.add_argument("--ramp-secs", type=float, default=5.0, help="Window over which a step's calls are started")
+    parser.add_argument("--pause-secs", type=float, default=4.0, help="Caller silence after each utterance")
+    parser.add_argument("--cooldown-secs", type=float, default=5.0, help="Pause between steps")
+    parser.add_argument("--late-ms", type=float, default=60.0, help="Inter-frame gap counted as late")
+    parser.add_argument("--burst-gap-ms", type=float, default=500.0, help="Gap that ends a burst of bot speech")
+    parser.add_argument("--wav", action="append", help="Caller WAV fixture (16-bit PCM); repeat for several utterances")
+    parser.add_argument("--seed-calls", action="store_true", help="Insert Call documents into Mongo before each step")
+    parser.add_argument("--stt-provider", default=None)
+    parser.add_argument("--tts-provider", default=None)
+    parser.add_argument("--llm-provider", default=None)
+    parser.add_argument("--json", help="Write per-step results to this file")
+    asyncio.run(main(parser.parse_args()))
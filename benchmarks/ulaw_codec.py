@@ -0,0 +1,144 @@
+"""
+CPU-per-call benchmark for the Twilio media path.
+
+Compares, per minute of call audio (3000 x 20ms frames each way):
+  - stock:      pipecat TwilioFrameSerializer with TTS audio at 8kHz (what both
+                bots request, so nothing is resampled)
+  - stock_24k:  the same serializer with TTS audio at 24kHz, resampled per frame
+
+Also home of the numpy lookup-table μ-law codec the load generators use to
+play Twilio's side of a call (bit-exact with audioop).
+
+Usage:
+    python -m benchmarks.ulaw_codec [--minutes 5]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import time
+
+import numpy as np
+from pipecat.frames.frames import OutputAudioRawFrame, StartFrame
+from pipecat.serializers.twilio import TwilioFrameSerializer
+
+FRAME_MS = 20
+FRAMES_PER_MINUTE = 60_000 // FRAME_MS
+
+# G.711 μ-law constants (same algorithm as audioop.lin2ulaw / ulaw2lin)
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+_ULAW_SEG_END = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+
+
+def _ulaw_decode(uval: int) -> int:
+    """Decode a single μ-law byte to a signed 16-bit sample."""
+    uval = ~uval & 0xFF
+    t = ((uval & 0x0F) << 3) + _ULAW_BIAS
+    t <<= (uval & 0x70) >> 4
+    return (_ULAW_BIAS - t) if uval & 0x80 else (t - _ULAW_BIAS)
+
+
+def _ulaw_encode(sample: int) -> int:
+    """Encode a single signed 16-bit sample to a μ-law byte."""
+    pcm_val = sample >> 2  # 14-bit magnitude
+    if pcm_val < 0:
+        pcm_val = -pcm_val
+        mask = 0x7F
+    else:
+        mask = 0xFF
+    pcm_val = min(pcm_val, _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+
+    for seg, seg_end in enumerate(_ULAW_SEG_END):
+        if pcm_val <= seg_end:
+            return ((seg << 4) | ((pcm_val >> (seg + 1)) & 0x0F)) ^ mask
+    return 0x7F ^ mask
+
+
+# Lookup tables: 256 entries for decode, one entry per 16-bit sample for encode.
+_ULAW_TO_PCM = np.array([_ulaw_decode(u) for u in range(256)], dtype="<i2")
+_PCM_TO_ULAW = np.array(
+    [_ulaw_encode(i - 0x10000 if i & 0x8000 else i) for i in range(0x10000)],
+    dtype=np.uint8,
+)
+
+
+def ulaw_to_pcm16(ulaw_bytes: bytes) -> bytes:
+    """Decode μ-law bytes to 16-bit little-endian PCM with a vectorized table lookup."""
+    return _ULAW_TO_PCM[np.frombuffer(ulaw_bytes, dtype=np.uint8)].tobytes()
+
+
+def pcm16_to_ulaw(pcm_bytes: bytes) -> bytes:
+    """Encode 16-bit little-endian PCM to μ-law bytes with a vectorized table lookup."""
+    if len(pcm_bytes) & 1:
+        pcm_bytes = pcm_bytes[:-1]
+    return _PCM_TO_ULAW[np.frombuffer(pcm_bytes, dtype="<u2")].tobytes()
+
+
+def _tone(sample_rate: int, frames: int) -> list:
+    """Build 20ms PCM16 frames of a 440Hz tone at the given rate."""
+    samples_per_frame = sample_rate * FRAME_MS // 1000
+    chunks = []
+    for n in range(frames):
+        offset = n * samples_per_frame
+        chunk = bytearray()
+        for i in range(samples_per_frame):
+            value = int(8000 * math.sin(2 * math.pi * 440 * (offset + i) / sample_rate))
+            chunk += value.to_bytes(2, "little", signed=True)
+        chunks.append(bytes(chunk))
+    return chunks
+
+
+def _inbound_messages(frames: int) -> list:
+    """Build Twilio 'media' events carrying 20ms of 8kHz μ-law each."""
+    payload = base64.b64encode(bytes(range(160))).decode("ascii")
+    message = json.dumps(
+        {"event": "media", "streamSid": "MZbench", "media": {"payload": payload}}
+    )
+    return [message] * frames
+
+
+async def _run(serializer, out_frames, in_messages) -> float:
+    await serializer.setup(StartFrame(audio_in_sample_rate=8000, audio_out_sample_rate=8000))
+
+    start = time.process_time()
+    for frame in out_frames:
+        await serializer.serialize(frame)
+    for message in in_messages:
+        await serializer.deserialize(message)
+    return time.process_time() - start
+
+
+async def main(minutes: int):
+    frames = FRAMES_PER_MINUTE * minutes
+    in_messages = _inbound_messages(frames)
+
+    pcm_8k = _tone(8000, 50)
+    pcm_24k = _tone(24000, 50)
+    out_8k = [OutputAudioRawFrame(pcm_8k[i % 50], 8000, 1) for i in range(frames)]
+    out_24k = [OutputAudioRawFrame(pcm_24k[i % 50], 24000, 1) for i in range(frames)]
+
+    # No Twilio credentials here, so hanging up through the REST API is off
+    params = TwilioFrameSerializer.InputParams(auto_hang_up=False)
+    cases = [
+        ("stock", TwilioFrameSerializer(stream_sid="MZbench", params=params), out_8k),
+        ("stock_24k", TwilioFrameSerializer(stream_sid="MZbench", params=params), out_24k),
+    ]
+
+    print(f"{'path':<12}{'cpu ms / call-minute':>22}")
+    results = {}
+    for name, serializer, out_frames in cases:
+        cpu = await _run(serializer, out_frames, in_messages)
+        results[name] = cpu * 1000 / minutes
+        print(f"{name:<12}{results[name]:>22.1f}")
+
+    print(f"\n8kHz TTS vs 24kHz TTS: {results['stock_24k'] / results['stock']:.2f}x less CPU")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--minutes", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.minutes))
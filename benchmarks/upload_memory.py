@@ -0,0 +1,197 @@
+"""
+Peak server memory for uploading one long recording, base64 JSON vs streaming.
+
+For each mode a fresh server process (main.app under uvicorn) is started and
+sent one --minutes long stereo 8kHz 16-bit recording:
+  - base64: POST /upload-recording with the audio base64-encoded in JSON
+  - stream: POST /upload-recording/{call_id} with the raw WAV as the body
+
+The client streams both bodies from disk, so only the server's memory is
+measured. Reported per mode: idle RSS, peak RSS (VmHWM) and peak minus idle.
+
+Mongo and Cloudinary are replaced in the server process: Call.find_one returns
+a stand-in and upload_recording reads the file (or bytes) it is handed in 1 MiB
+chunks without sending anything, like the SDK's streaming upload would.
+
+Usage:
+    python -m benchmarks.upload_memory [--minutes 30] [--modes base64,stream]
+
+Linux only (reads /proc/<pid>/status).
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from utils.call_audio import create_wav_header
+
+SAMPLE_RATE = 8000
+CHANNELS = 2
+CHUNK = 3 * 256 * 1024  # multiple of 3, so base64 chunks concatenate cleanly
+
+
+def _memory_mb() -> dict:
+    status = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                status[key] = int(value.split()[0]) / 1024
+    return {"rss_mb": status["VmRSS"], "peak_mb": status["VmHWM"]}
+
+
+def serve(port: int):
+    """Run main.app with Mongo and Cloudinary stand-ins (child process)."""
+    import uvicorn
+    from loguru import logger
+
+    import main
+    import utils.call_audio
+    from model.model import Call
+
+    logger.remove()
+
+    class _Call:
+        async def save(self):
+            pass
+
+    async def _find_one(*args, **kwargs):
+        return _Call()
+
+    async def _upload_recording(call_sid, filename=None, audio_data=None, format="wav"):
+        if filename:
+            with open(filename, "rb") as f:
+                while f.read(1024 * 1024):
+                    pass
+        else:
+            for start in range(0, len(audio_data), 1024 * 1024):
+                audio_data[start : start + 1024 * 1024]
+        return f"https://example.invalid/recordings/{call_sid}"
+
+    Call.find_one = classmethod(lambda cls, *args, **kwargs: _find_one())
+    utils.call_audio.upload_recording = _upload_recording
+
+    app = main.app
+    app.router.on_startup.clear()
+    app.router.on_shutdown.clear()
+    app.add_api_route("/_bench/memory", _memory_mb)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def write_recording(path: str, minutes: float):
+    """A WAV of noise, written in chunks (content does not matter for memory)."""
+    data_bytes = int(minutes * 60 * SAMPLE_RATE) * CHANNELS * 2
+    with open(path, "wb") as f:
+        f.write(create_wav_header(data_bytes, SAMPLE_RATE, CHANNELS))
+        remaining = data_bytes
+        while remaining:
+            n = min(CHUNK, remaining)
+            f.write(os.urandom(n))
+            remaining -= n
+
+
+async def _file_chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK):
+            yield chunk
+
+
+async def _base64_json_body(path: str):
+    yield b'{"call_id": "CAbench", "filename": "bench.wav", "format": "wav", "timestamp": "now", "audio_data": "'
+    async for chunk in _file_chunks(path):
+        yield base64.b64encode(chunk)
+    yield b'"}'
+
+
+async def run_mode(mode: str, recording: str, port: int) -> dict:
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.upload_memory", "--serve", str(port)])
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
+            for _ in range(200):
+                try:
+                    async with session.get(f"{base_url}/_bench/memory") as response:
+                        idle = await response.json()
+                    break
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("server did not start")
+
+            start = time.perf_counter()
+            if mode == "base64":
+                request = session.post(
+                    f"{base_url}/upload-recording",
+                    data=_base64_json_body(recording),
+                    headers={"Content-Type": "application/json"},
+                )
+            else:
+                request = session.post(
+                    f"{base_url}/upload-recording/CAbench?format=wav",
+                    data=_file_chunks(recording),
+                    headers={"Content-Type": "audio/wav"},
+                )
+            async with request as response:
+                body = await response.text()
+                if response.status != 200:
+                    raise RuntimeError(f"{mode}: HTTP {response.status} {body[:200]}")
+            elapsed = time.perf_counter() - start
+
+            async with session.get(f"{base_url}/_bench/memory") as response:
+                after = await response.json()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "mode": mode,
+        "idle_mb": idle["rss_mb"],
+        "peak_mb": after["peak_mb"],
+        "growth_mb": after["peak_mb"] - idle["rss_mb"],
+        "secs": elapsed,
+    }
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        recording = os.path.join(tmp, "recording.wav")
+        write_recording(recording, args.minutes)
+        size_mb = os.path.getsize(recording) / 1024 / 1024
+
+        print(f"recording: {args.minutes:g} min stereo {SAMPLE_RATE}Hz, {size_mb:.1f} MB")
+        print(f"{'mode':<8}{'idle MB':>10}{'peak MB':>10}{'growth MB':>11}{'x audio':>9}{'secs':>7}")
+        results = []
+        for mode in args.modes.split(","):
+            r = await run_mode(mode, recording, args.port)
+            results.append(r)
+            print(
+                f"{r['mode']:<8}{r['idle_mb']:>10.1f}{r['peak_mb']:>10.1f}{r['growth_mb']:>11.1f}"
+                f"{r['growth_mb'] / size_mb:>9.2f}{r['secs']:>7.2f}"
+            )
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"recording_mb": size_mb, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak server RSS for base64 vs streaming recording upload")
+    parser.add_argument("--minutes", type=float, default=30.0, help="Recording length")
+    parser.add_argument("--modes", default="base64,stream")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+    else:
+        asyncio.run(main(args))
@@ -1,3 +1,5 @@
+from array import array
+
 from pipecat.metrics.metrics import (
     LLMUsageMetricsData,
     TTFBMetricsData,
@@ -7,10 +9,19 @@ from pipecat.metrics.metrics import (
 )
 from pipecat.frames.frames import MetricsFrame
 from pipecat.frames.frames import TranscriptionFrame, TTSAudioRawFrame, LLMTextFrame
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    VADUserStartedSpeakingFrame,
+    VADUserStoppedSpeakingFrame,
+)
 from pipecat.metrics import metrics
 from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.processors.frame_processor import FrameDirection
 from loguru import logger
 
+from utils.stats import percentile
+from utils.telemetry import observe_ttfb
+
 
 class MetricsCollector(BaseObserver):
     """Enhanced metrics collector following RTVI pattern for structured metrics handling."""
@@ -29,10 +40,16 @@ class MetricsCollector(BaseObserver):
         self.total_prompt_tokens = 0
         self.total_completion_tokens = 0
         self.total_tts_characters = 0
+        # First TTFB of each service, as reported before per-turn TTFB was kept
         self.llm_ttfb = 0.0
         self.tts_ttfb = 0.0
         self.stt_ttfb = 0.0
 
+        # Every TTFB sample per service, in milliseconds (float32, 4 bytes each)
+        self.ttfb_samples = {"llm": array("f"), "tts": array("f"), "stt": array("f")}
+        # Observers see a MetricsFrame once per pipeline hop; count each frame once
+        self._seen_metrics_frames = set()
+
         # Add STT duration tracking
         self.total_stt_duration = 0.0
 
@@ -45,6 +62,10 @@ class MetricsCollector(BaseObserver):
 
     async def _handle_metrics(self, frame: MetricsFrame):
         """Handle metrics frames and convert to structured metrics following RTVI pattern."""
+        if frame.id in self._seen_metrics_frames:
+            return
+        self._seen_metrics_frames.add(frame.id)
+
         metrics = {}
 
         # Process frame data - handle both single items and lists
@@ -60,13 +81,20 @@ class MetricsCollector(BaseObserver):
                 ttfb_ms = d.value * 1000 if d.value is not None else 0.0
 
                 if "ttsservice" in d.processor.lower():
-                    self.tts_ttfb = ttfb_ms
-
+                    service = "tts"
                 elif "sttservice" in d.processor.lower():
-                    self.stt_ttfb = ttfb_ms
-
+                    service = "stt"
                 elif "llmservice" in d.processor.lower():
-                    self.llm_ttfb = ttfb_ms
+                    service = "llm"
+                else:
+                    continue
+
+                samples = self.ttfb_samples[service]
+                if not samples:
+                    setattr(self, f"{service}_ttfb", ttfb_ms)
+                samples.append(ttfb_ms)
+                if d.value is not None:
+                    observe_ttfb(service, d.processor, d.value)
 
             elif isinstance(d, LLMUsageMetricsData):
 
@@ -123,6 +151,21 @@ class MetricsCollector(BaseObserver):
 
         return latencies
 
+    def get_ttfb_stats(self):
+        """Per service: sample count, p50/p90/p99/max and every sample, in milliseconds."""
+        stats = {}
+        for service, samples in self.ttfb_samples.items():
+            values = [round(value, 2) for value in samples]
+            stats[service] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50), 2) if values else None,
+                "p90_ms": round(percentile(values, 90), 2) if values else None,
+                "p99_ms": round(percentile(values, 99), 2) if values else None,
+                "max_ms": max(values) if values else None,
+                "samples_ms": values,
+            }
+        return stats
+
     def get_token_usage(self):
         """Get detailed token usage metrics."""
         return {
@@ -139,6 +182,12 @@ class MetricsCollector(BaseObserver):
         logger.info(f"📊 Current structured metrics data TTS TTFB: {self.tts_ttfb:.2f}ms")
         logger.info(f"📊 Current structured metrics data LLM TTFB: {self.llm_ttfb:.2f}ms")
         logger.info(f"📊 Current structured metrics data STT TTFB: {self.stt_ttfb:.2f}ms")
+        for service, stats in self.get_ttfb_stats().items():
+            if stats["count"]:
+                logger.info(
+                    f"📊 {service.upper()} TTFB over {stats['count']} samples: p50={stats['p50_ms']:.0f}ms, "
+                    f"p90={stats['p90_ms']:.0f}ms, p99={stats['p99_ms']:.0f}ms, max={stats['max_ms']:.0f}ms"
+                )
         logger.info(f"📊 STT Total Duration: {self.total_stt_duration:.2f}ms")
         logger.info(
             f"📊 Current structured metrics data Total Latency: {self.get_latency()['total_latency']:.2f}ms"
@@ -160,6 +209,7 @@ class MetricsCollector(BaseObserver):
             "stt_ttfb": self.stt_ttfb,
             "stt_total_duration": self.total_stt_duration,
             "total_latency": self.get_latency()["total_latency"],
+            "ttfb": self.get_ttfb_stats(),
             "tokens": {
                 "prompt_tokens": self.total_prompt_tokens,
                 "completion_tokens": self.total_completion_tokens,
@@ -169,6 +219,113 @@ class MetricsCollector(BaseObserver):
         }
 
 
+class TurnLatencyObserver(BaseObserver):
+    """Per-turn voice-to-voice latency observer.
+
+    For every user turn it timestamps, on the pipeline clock, the moment VAD
+    decides the user stopped speaking, the final transcript, the first LLM
+    token, the first TTS audio and the first audio frame written to the
+    transport (BotStartedSpeakingFrame). All stage times are stored as offsets
+    from the user-stopped-speaking moment, in milliseconds.
+    """
+
+    def __init__(self, vad_stop_secs: float = 0.0):
+        super().__init__()
+        # VAD only reports "stopped" after stop_secs of silence; add it back so
+        # voice-to-voice reflects the gap the caller actually hears.
+        self._vad_stop_ms = vad_stop_secs * 1000
+
+        self._turn = None
+        self._turn_frame_id = None
+        self._last_transcript_id = None
+        self._last_transcript_ts = None
+
+        # Per-turn arrays (one entry per completed turn)
+        self.voice_to_voice_ms = []
+        self.transcript_ms = []
+        self.llm_first_token_ms = []
+        self.tts_first_audio_ms = []
+
+    async def on_push_frame(self, data: FramePushed):
+        """Track turn stage timestamps from downstream frames."""
+        if data.direction != FrameDirection.DOWNSTREAM:
+            return
+
+        frame = data.frame
+        timestamp = data.timestamp
+
+        if isinstance(frame, VADUserStoppedSpeakingFrame):
+            self._start_turn(frame.id, timestamp)
+        elif isinstance(frame, VADUserStartedSpeakingFrame):
+            # User kept talking before the bot answered; the turn is not over yet.
+            self._turn = None
+        elif isinstance(frame, TranscriptionFrame):
+            if frame.id != self._last_transcript_id:
+                self._last_transcript_id = frame.id
+                self._last_transcript_ts = timestamp
+            self._mark("transcript", timestamp)
+        elif isinstance(frame, LLMTextFrame):
+            self._mark("llm", timestamp)
+        elif isinstance(frame, TTSAudioRawFrame):
+            self._mark("tts", timestamp)
+        elif isinstance(frame, BotStartedSpeakingFrame):
+            self._finish_turn(timestamp)
+
+    def _start_turn(self, frame_id: int, timestamp: int):
+        # The same VAD frame is observed once per hop; only the first one counts.
+        if frame_id == self._turn_frame_id:
+            return
+        self._turn_frame_id = frame_id
+        self._turn = {"user_stopped": timestamp}
+
+    def _mark(self, stage: str, timestamp: int):
+        # Observers see the same frame once per hop; keep the first sighting only.
+        if self._turn is not None and stage not in self._turn:
+            self._turn[stage] = timestamp
+
+    def _finish_turn(self, timestamp: int):
+        turn = self._turn
+        if turn is None:
+            return
+        self._turn = None
+
+        start = turn["user_stopped"]
+
+        def offset_ms(ts):
+            if ts is None:
+                return None
+            return max(0.0, (ts - start) / 1_000_000 + self._vad_stop_ms)
+
+        # Streaming STT often finalizes before VAD fires; fall back to the last
+        # transcript seen before the user stopped.
+        transcript_ts = turn.get("transcript", self._last_transcript_ts)
+
+        voice_to_voice = offset_ms(timestamp)
+        self.voice_to_voice_ms.append(round(voice_to_voice, 2))
+        self.transcript_ms.append(_round_or_none(offset_ms(transcript_ts)))
+        self.llm_first_token_ms.append(_round_or_none(offset_ms(turn.get("llm"))))
+        self.tts_first_audio_ms.append(_round_or_none(offset_ms(turn.get("tts"))))
+
+        logger.debug(f"⏱️ Turn {len(self.voice_to_voice_ms)} voice-to-voice: {voice_to_voice:.0f}ms")
+
+    def get_summary(self):
+        """Per-turn arrays plus p50/p95/max of the voice-to-voice latency."""
+        return {
+            "turns": len(self.voice_to_voice_ms),
+            "voice_to_voice_ms": list(self.voice_to_voice_ms),
+            "transcript_ms": list(self.transcript_ms),
+            "llm_first_token_ms": list(self.llm_first_token_ms),
+            "tts_first_audio_ms": list(self.tts_first_audio_ms),
+            "p50_ms": round(percentile(self.voice_to_voice_ms, 50), 2),
+            "p95_ms": round(percentile(self.voice_to_voice_ms, 95), 2),
+            "max_ms": max(self.voice_to_voice_ms, default=0.0),
+        }
+
+
+def _round_or_none(value):
+    return round(value, 2) if value is not None else None
+
+
 class CostCollector:
     """Cost collector to handle cost tracking."""
 
@@ -1,3 +1,4 @@
+import hmac
 import os
 from datetime import datetime
 
@@ -6,13 +7,13 @@ import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
-from utils.twilio import generate_twiml, make_twilio_call
+from utils.twilio import generate_busy_twiml, generate_twiml, make_twilio_call
 from loguru import logger
 
-from model.model import Call, CallStatus, STTProvider, TTSProvider
+from model.model import Call, CallStatus, STTProvider, TTSProvider, get_call_transcript
 
 load_dotenv(override=True)
 
@@ -47,6 +48,10 @@ class CallDetailsUpdate(BaseModel):
     transcript: str
 
 
+class DrainRequest(BaseModel):
+    exit_when_done: bool = False  # Shut the worker down once drained
+
+
 class UploadRecordingRequest(BaseModel):
     call_id: str
     audio_data: str  # base64 encoded audio file
@@ -83,6 +88,39 @@ async def startup_db_client():
     await initialize_heavy_components()
     logger.info("✅ Bot components ready - initialization time optimized!")
 
+    # Publish this worker's load so every worker can report the whole node
+    from utils.workers import start_heartbeat
+    from utils.admission import lag_monitor
+
+    from utils.drain import install_signal_handler
+
+    start_heartbeat()
+    lag_monitor.start()
+    install_signal_handler()
+
+    # /metrics on any worker reports every process of the node
+    from utils.telemetry import serve_metrics_socket
+
+    await serve_metrics_socket()
+
+    # Batched JSONL transcript log (transcripts/), flushed on drain
+    from utils.drain import register_flush_hook
+    from utils.transcript_sink import transcript_sink
+
+    transcript_sink.start()
+    register_flush_hook("transcripts", transcript_sink.flush)
+
+    # Completion webhooks share one connection pool; queued ones are sent on drain
+    from utils.webhooks import webhook_dispatcher
+
+    register_flush_hook("webhooks", webhook_dispatcher.flush)
+
+    # Durable post-call jobs (uploads, DB updates, webhooks), incl. ones left by a crash;
+    # by default processed in a separate worker process (POSTCALL_MODE)
+    from utils.post_call_queue import start_post_call_workers
+
+    await start_post_call_workers()
+
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -91,6 +129,40 @@ async def shutdown_db_client():
     This ensures proper cleanup of resources.
     """
     from model.model import close_db_connection
+    from utils.workers import stop_heartbeat
+    from utils.admission import lag_monitor
+
+    from utils.drain import flush_pending_work
+
+    # Don't lose post-call uploads/webhooks still in flight
+    await flush_pending_work()
+
+    from utils.post_call_queue import stop_post_call_workers
+
+    await stop_post_call_workers()
+
+    from utils.webhooks import webhook_dispatcher
+
+    await webhook_dispatcher.stop()
+
+    await lag_monitor.stop()
+    await stop_heartbeat()
+
+    from utils.telemetry import retire_metrics_socket
+
+    await retire_metrics_socket()
+
+    from utils.transcript_sink import transcript_sink
+
+    await transcript_sink.stop()
+
+    from utils.recording_codec import shutdown_encoder
+
+    shutdown_encoder()
+
+    from utils.cloudinary_upload import shutdown_uploader
+
+    shutdown_uploader()
 
     logger.info("🔴 Shutting down MongoDB connection")
     await close_db_connection()
@@ -169,7 +241,9 @@ async def get_call_details(call_sid: str):
             "llm_provider": call_record.llm_provider,
             "call_cost": call_record.call_cost,
             "call_duration": call_record.call_duration,
-            "transcript": call_record.transcript,
+            # Live or not yet post-processed calls: project the turns stored so far
+            "transcript": call_record.transcript
+            or await get_call_transcript(call_sid),
             "metrics": (
                 call_record.metrics.model_dump() if call_record.metrics else None
             ),
@@ -186,6 +260,95 @@ async def get_call_details(call_sid: str):
         raise HTTPException(status_code=500, detail="Failed to get call details")
 
 
+@app.get("/api/calls/search")
+async def search_calls_api(
+    q: str,
+    status: str = None,
+    stt_provider: str = None,
+    tts_provider: str = None,
+    llm_provider: str = None,
+    from_date: datetime = None,
+    to_date: datetime = None,
+    page: int = 1,
+    page_size: int = 20,
+    sort: str = "relevance",
+    before: str = None,
+):
+    """Full-text transcript search: terms, "phrases" and -exclusions, with filters and highlighted snippets"""
+    from utils.call_search import search_calls
+
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q is required")
+    if sort not in ("recent", "relevance"):
+        raise HTTPException(status_code=400, detail="sort must be 'recent' or 'relevance'")
+
+    try:
+        return await search_calls(
+            q,
+            status=status,
+            stt_provider=stt_provider,
+            tts_provider=tts_provider,
+            llm_provider=llm_provider,
+            from_date=from_date,
+            to_date=to_date,
+            page=page,
+            page_size=page_size,
+            sort=sort,
+            before=before,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if getattr(e, "code", None) == 27:  # IndexNotFound
+            logger.error("❌ transcript_text index missing; run `python -m model.call_indexes`")
+        logger.error(f"Error searching calls: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search calls")
+
+
+@app.get("/api/calls/{call_sid}/events")
+async def get_call_events(call_sid: str, request: Request):
+    """Server-sent events for a call: a snapshot, then status changes, transcript turns and metrics"""
+    from fastapi.responses import StreamingResponse
+
+    from utils.call_events import stream_call_events
+
+    last_event_id = request.headers.get("last-event-id", "")
+    snapshot = await get_call_details(call_sid)
+    return StreamingResponse(
+        stream_call_events(
+            call_sid,
+            request,
+            snapshot,
+            int(last_event_id) if last_event_id.isdigit() else None,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/calls/{call_sid}/turns")
+async def get_call_turns(call_sid: str, after: int = -1):
+    """API endpoint to get a call's transcript turns (those after turn `after`), live or finished"""
+    from model.model import CallTurn
+
+    try:
+        turns = (
+            await CallTurn.find({"call_sid": call_sid, "turn": {"$gt": after}})
+            .sort([("turn", 1)])
+            .to_list()
+        )
+        return {
+            "call_sid": call_sid,
+            "turns": [
+                turn.model_dump(include={"turn", "role", "content", "timestamp", "latency_ms"})
+                for turn in turns
+            ],
+        }
+    except Exception as e:
+        logger.error(f"Error getting call turns: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get call turns")
+
+
 @app.get("/api/latest-calls")
 async def get_latest_calls():
     """API endpoint to get 5 latest calls"""
@@ -234,6 +397,119 @@ async def get_latest_calls():
         raise HTTPException(status_code=500, detail="Failed to fetch latest calls")
 
 
+@app.get("/api/post-call/queue")
+async def get_post_call_queue():
+    """API endpoint to get post-call job queue depth and latency"""
+    from utils.post_call_queue import get_queue_stats
+
+    try:
+        return await get_queue_stats()
+    except Exception as e:
+        logger.error(f"Error getting post-call queue stats: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get post-call queue stats")
+
+
+@app.get("/api/uploads")
+async def get_uploads():
+    """API endpoint to get recording upload throughput and latency for this worker"""
+    from utils.cloudinary_upload import get_upload_stats
+
+    return get_upload_stats()
+
+
+@app.get("/api/webhooks")
+async def get_webhooks():
+    """API endpoint to get completion webhook delivery latency and failure rate for this worker"""
+    from model.model import WebhookDeadLetter
+    from utils.webhooks import webhook_dispatcher
+
+    try:
+        dead_letters = await WebhookDeadLetter.find({"replayed_at": None}).count()
+    except Exception as e:
+        logger.error(f"Error counting webhook dead letters: {e}")
+        dead_letters = None
+    return {**webhook_dispatcher.get_stats(), "dead_letters": dead_letters}
+
+
+@app.get("/api/workers")
+async def get_workers():
+    """API endpoint to get per-worker load for this deployment"""
+    from utils.workers import WORKER_ID, get_cluster_load
+
+    try:
+        workers = await get_cluster_load()
+        return {
+            "served_by": WORKER_ID,
+            "total_live_calls": sum(worker["live_calls"] for worker in workers),
+            "workers": workers,
+        }
+    except Exception as e:
+        logger.error(f"Error getting worker load: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get worker load")
+
+
+@app.get("/api/capacity")
+async def get_capacity_api():
+    """Capacity score for an external load balancer or autoscaler (503 when saturated)"""
+    from utils.admission import get_capacity
+
+    capacity = get_capacity()
+    return JSONResponse(
+        content=capacity, status_code=200 if capacity["accepting"] else 503
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for the node: every uvicorn worker and post-call worker process"""
+    from utils.telemetry import CONTENT_TYPE, exposition
+
+    return PlainTextResponse(await exposition(), media_type=CONTENT_TYPE)
+
+
+# /admin/* requires the X-Admin-Token header to match ADMIN_TOKEN; without
+# ADMIN_TOKEN the admin API is disabled. With WEB_CONCURRENCY > 1 a request
+# reaches only the one uvicorn worker that accepted it, so POST /admin/drain
+# drains that worker alone: send SIGUSR1 to every worker to drain the node.
+def _check_admin_token(request: Request):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled: ADMIN_TOKEN is not set")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", "").encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/drain")
+async def start_drain_api(request: Request, drain_request: DrainRequest):
+    """Stop accepting new calls on this worker and drain live calls and post-call work"""
+    from utils.drain import start_drain
+
+    _check_admin_token(request)
+    return start_drain(exit_when_done=drain_request.exit_when_done)
+
+
+@app.get("/admin/drain")
+async def get_drain_status_api(request: Request):
+    """Drain progress of the worker serving this request"""
+    from utils.drain import get_drain_status
+
+    _check_admin_token(request)
+    return get_drain_status()
+
+
+@app.post("/admin/webhooks/replay")
+async def replay_webhooks_api(request: Request, limit: int = 100):
+    """Redeliver dead-lettered completion webhooks, oldest first"""
+    from utils.webhooks import replay_dead_letters
+
+    _check_admin_token(request)
+    try:
+        return await replay_dead_letters(limit=max(1, min(limit, 1000)))
+    except Exception as e:
+        logger.error(f"Error replaying webhook dead letters: {e}")
+        raise HTTPException(status_code=500, detail="Failed to replay webhook dead letters")
+
+
 @app.get("/get-nearby-clinic")
 async def get_nearby_clinic(pincode: str = None, city: str = None):
     """Get nearby clinic information based on pincode and/or city."""
@@ -325,7 +601,11 @@ async def get_dynamic_prompt(call_sid: str):
 
 @app.post("/upload-recording")
 async def upload_recording_endpoint(request: UploadRecordingRequest):
-    """Upload recording to Cloudinary and save URL to database using existing upload_recording function."""
+    """Upload recording to Cloudinary and save URL to database using existing upload_recording function.
+
+    Deprecated: the base64 JSON body holds the recording in memory about three
+    times over. Use POST /upload-recording/{call_id} with the raw audio as body.
+    """
     try:
         # Validate required fields
         if not request.call_id:
@@ -394,6 +674,85 @@ async def upload_recording_endpoint(request: UploadRecordingRequest):
         )
 
 
+@app.post("/upload-recording/{call_id}")
+async def upload_recording_stream_endpoint(
+    call_id: str, request: Request, format: str = "wav", filename: str = None
+):
+    """Upload a recording sent as the raw request body and save its URL to the database.
+
+    The body is streamed to a temporary file in chunks and uploaded from there,
+    so memory use stays flat regardless of recording length.
+    """
+    from utils.call_audio import (
+        MAX_RECORDING_UPLOAD_BYTES,
+        UPLOAD_RECORDING_FORMATS,
+        RecordingTooLarge,
+        spool_upload_stream,
+        upload_recording,
+    )
+
+    path = None
+    try:
+        # format ends up in the spool file's name, so only known extensions
+        if format not in UPLOAD_RECORDING_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported format; expected one of {sorted(UPLOAD_RECORDING_FORMATS)}",
+            )
+
+        content_length = request.headers.get("content-length")
+        if content_length and not content_length.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if content_length and int(content_length) > MAX_RECORDING_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Recording is too large")
+
+        # Find the call before reading the body
+        call = await Call.find_one({"call_sid": call_id})
+        if not call:
+            raise HTTPException(status_code=404, detail="Call not found")
+
+        try:
+            path = await spool_upload_stream(request.stream(), suffix=f".{format}")
+        except RecordingTooLarge:
+            raise HTTPException(status_code=413, detail="Recording is too large")
+
+        if os.path.getsize(path) == 0:
+            raise HTTPException(status_code=400, detail="Request body is empty")
+
+        try:
+            cloudinary_url = await upload_recording(call_sid=call_id, filename=path, format=format)
+        except Exception as e:
+            logger.error(f"Failed to upload to Cloudinary: {e}")
+            raise HTTPException(
+                status_code=500, detail=f"Failed to upload to Cloudinary: {str(e)}"
+            )
+
+        call.recording_url = cloudinary_url
+        call.updated_at = datetime.utcnow()
+        await call.save()
+
+        logger.info(f"Successfully updated call {call_id} with recording URL")
+
+        return {
+            "message": "Recording uploaded successfully",
+            "call_id": call_id,
+            "recording_url": cloudinary_url,
+            "filename": filename,
+            "format": format,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading recording: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to upload recording: {str(e)}"
+        )
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
 @app.post("/update-call-details")
 async def update_call_details(call_details: CallDetailsUpdate):
     """Update call details with metrics, cost data, and transcript."""
@@ -459,6 +818,20 @@ async def update_call_details(call_details: CallDetailsUpdate):
 async def initiate_outbound_call(request: Request) -> JSONResponse:
     """Handle outbound call request and initiate call via Twilio."""
     print("Received outbound call request")
+    from utils.admission import (
+        ADMISSION_RETRY_AFTER_SECS,
+        accepting_calls,
+        log_rejection,
+    )
+
+    # Back off dialers (including campaign runs) while this node is saturated
+    if not accepting_calls():
+        log_rejection("/outbound")
+        return JSONResponse(
+            {"status": "busy", "detail": "Server at capacity, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECS)},
+        )
 
     try:
         data = await request.json()
@@ -570,10 +943,15 @@ async def initiate_outbound_call(request: Request) -> JSONResponse:
 async def start_call(request: Request):
     """Handle Twilio webhook and return TwiML with WebSocket streaming."""
     print("POST TwiML")
+    from utils.admission import accepting_calls, log_rejection
 
     # Parse form data from Twilio webhook
     form_data = await request.form()
 
+    if not accepting_calls():
+        log_rejection("/inbound")
+        return HTMLResponse(content=generate_busy_twiml(), media_type="application/xml")
+
     # Extract call information
     call_sid = form_data.get("CallSid", "")
     from_number = form_data.get("From", "")
@@ -677,11 +1055,14 @@ async def websocket_endpoint(websocket: WebSocket):
         from utils.bot import bot
         from pipecat.runner.types import WebSocketRunnerArguments
 
+        from utils.workers import track_call
+
         # Create runner arguments and run the bot
         runner_args = WebSocketRunnerArguments(websocket=websocket)
         runner_args.handle_sigint = False
 
-        await bot(runner_args)
+        async with track_call("/ws"):
+            await bot(runner_args)
 
     except Exception as e:
         print(f"Error in WebSocket endpoint: {e}")
@@ -699,11 +1080,14 @@ async def websocket_endpoint_2(websocket: WebSocket):
         from utils.bot_2 import bot_2
         from pipecat.runner.types import WebSocketRunnerArguments
 
+        from utils.workers import track_call
+
         # Create runner arguments and run the bot_2
         runner_args = WebSocketRunnerArguments(websocket=websocket)
         runner_args.handle_sigint = False
 
-        await bot_2(runner_args)
+        async with track_call("/ws2"):
+            await bot_2(runner_args)
 
     except Exception as e:
         print(f"Error in WebSocket endpoint 2: {e}")
@@ -759,6 +1143,14 @@ async def twilio_status_callback(request: Request):
 
                     await call.save()
                     print(f"Updated call {call_sid} status to {call.status}")
+
+                    from utils.call_events import publish
+
+                    publish(
+                        call_sid,
+                        "status",
+                        {"status": call.status, "call_duration": call.call_duration},
+                    )
             except Exception as e:
                 print(f"Error updating call status in database: {e}")
 
@@ -774,6 +1166,11 @@ async def twilio_status_callback(request: Request):
 if __name__ == "__main__":
     # Run the server
     port = int(os.getenv("PORT", "8000"))
-
-    print(f"Starting Twilio outbound chatbot server on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Number of worker processes sharing the port; each call stays on one worker
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    print(f"Starting Twilio outbound chatbot server on port {port} ({workers} worker(s))")
+    if workers > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,29 @@
+"""
+Build the Call collection's indexes (model.model.CALL_INDEXES).
+
+Run once per database, and again whenever CALL_INDEXES changes; indexes that
+already exist are left as they are. Mongo builds them without blocking reads
+and writes for the whole build, so this is safe against a live database.
+
+Usage:
+    python -m model.call_indexes
+"""
+
+import asyncio
+
+from loguru import logger
+
+from model.model import CALL_INDEXES, Call, close_db_connection, connect_to_db
+
+
+async def main():
+    await connect_to_db()
+    try:
+        names = await Call.get_pymongo_collection().create_indexes(CALL_INDEXES)
+        logger.info(f"✅ Call indexes in place: {', '.join(names)}")
+    finally:
+        await close_db_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,6 +5,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 from enum import Enum
 from beanie import Document, Link, init_beanie
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 
@@ -43,6 +44,7 @@ class STTProvider(str, Enum):
     GOOGLE = "google"
     SONIOX = "soniox"
     GROQ = "groq"
+    FAKE = "fake"  # Local stand-in for offline benchmarks
 
     @classmethod
     def from_string(
@@ -90,6 +92,8 @@ class TTSProvider(str, Enum):
 
     SARVAM_AI = "sarvam_ai"
 
+    FAKE = "fake"  # Local stand-in for offline benchmarks
+
     @classmethod
     def from_string(
         cls, value: str, default: "TTSProvider" = None
@@ -143,15 +147,41 @@ class PincodeData(Document):
     clinic_2: Optional[str] = None
     city: str
 
+class TurnLatencyData(BaseModel):
+    turns: int = 0  # Number of completed user -> bot turns
+    # Per-turn offsets from the moment the user stopped speaking, in milliseconds
+    voice_to_voice_ms: List[float] = Field(default_factory=list)  # First audio written to the transport
+    transcript_ms: List[Optional[float]] = Field(default_factory=list)  # Final transcript
+    llm_first_token_ms: List[Optional[float]] = Field(default_factory=list)  # First LLM token
+    tts_first_audio_ms: List[Optional[float]] = Field(default_factory=list)  # First TTS audio
+    p50_ms: Optional[float] = None  # Voice-to-voice p50
+    p95_ms: Optional[float] = None  # Voice-to-voice p95
+    max_ms: Optional[float] = None  # Voice-to-voice max
+
+
+class LatencyStats(BaseModel):
+    count: int = 0  # Number of samples
+    p50_ms: Optional[float] = None
+    p90_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+    samples_ms: List[float] = Field(default_factory=list)  # Every sample, in the order reported
+
+
 class MetricsData(BaseModel):
     total_latency_ms: Optional[float] = None  # Total latency in milliseconds
-    tts_ttfb_ms: Optional[float] = None  # TTS Time to First Byte in milliseconds
-    stt_ttfb_ms: Optional[float] = None  # STT Time to First Byte in milliseconds
-    llm_ttfb_ms: Optional[float] = None  # LLM Time to First Byte in milliseconds
+    tts_ttfb_ms: Optional[float] = None  # TTS Time to First Byte of the first turn in milliseconds
+    stt_ttfb_ms: Optional[float] = None  # STT Time to First Byte of the first turn in milliseconds
+    llm_ttfb_ms: Optional[float] = None  # LLM Time to First Byte of the first turn in milliseconds
     total_prompt_tokens: Optional[int] = None  # Total prompt tokens used
     total_completion_tokens: Optional[int] = None  # Total completion tokens used
     total_tts_characters: Optional[int] = None  # Total TTS characters processed
     total_sst_duration_ms: Optional[float] = None  # Total STT duration in milliseconds
+    turn_latency: Optional[TurnLatencyData] = None  # Per-turn voice-to-voice latency
+    # TTFB of every turn per service (absent on calls recorded before these were kept)
+    tts_ttfb_stats: Optional[LatencyStats] = None
+    stt_ttfb_stats: Optional[LatencyStats] = None
+    llm_ttfb_stats: Optional[LatencyStats] = None
 
 
 class CostData(BaseModel):
@@ -180,6 +210,105 @@ class Call(Document):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+# Indexes of the Call collection. Not in Call.Settings, where init_beanie would
+# build any missing one on every worker's startup and hold the startup for the
+# whole build; create them once per database with `python -m model.call_indexes`.
+CALL_INDEXES = [
+    IndexModel([("call_sid", ASCENDING)]),
+    IndexModel([("created_at", DESCENDING)]),
+    # /api/calls/search. Transcripts are Hindi/English mixed, so no
+    # stemming or stop words: "EMI" and pincodes match as typed.
+    IndexModel([("transcript", TEXT)], name="transcript_text", default_language="none"),
+]
+
+
+class WorkerStatus(Document):
+    worker_id: str  # "<host>-<pid>" of the uvicorn worker process
+    host: str
+    pid: int
+    live_calls: int = 0  # Media WebSockets currently served by this worker
+    draining: bool = False  # Worker stopped taking new calls
+    cpu_percent: float = 0.0  # CPU since the previous heartbeat, % of one core
+    cpu_seconds: float = 0.0  # Total CPU time used by the worker
+    rss_mb: float = 0.0  # Resident memory in MB
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)  # Last heartbeat
+
+
+class PostCallJob(Document):
+    call_sid: str
+    stage: str = "upload"  # upload -> db_update -> webhook -> done
+    status: str = "pending"  # pending | running | done | failed
+    attempts: int = 0  # Failed attempts at the current stage
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    lease_until: Optional[datetime] = None  # A running job past its lease is reclaimed
+    worker_id: Optional[str] = None  # Worker holding the lease
+    last_error: Optional[str] = None
+    # Call outcome to apply
+    transcript: Optional[str] = None  # Only when call_turns may lack some turns (unwritten at hangup)
+    turn_count: Optional[int] = None  # Turns the bot saw; call_turns is complete once it holds this many
+    call_cost: Optional[float] = None
+    call_status: Optional[str] = None  # None leaves Call.status as it is
+    recording_path: Optional[str] = None  # Local file to upload
+    recording_url: Optional[str] = None  # Set once uploaded
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+    class Settings:
+        indexes = [
+            [("status", 1), ("next_attempt_at", 1)],
+            "call_sid",
+            # One job per recording file, so concurrent orphan sweeps cannot queue it twice
+            IndexModel(
+                [("call_sid", ASCENDING), ("recording_path", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"recording_path": {"$type": "string"}},
+            ),
+        ]
+
+
+class CallTurn(Document):
+    call_sid: str
+    turn: int  # 0-based position in the call
+    role: str  # user | assistant
+    content: str
+    timestamp: Optional[str] = None  # When the turn started (ISO 8601, from the transcript processor)
+    latency_ms: Optional[float] = None  # Voice-to-voice latency of the bot turn answering the user
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        indexes = [
+            # Unique so a retried batch insert cannot duplicate turns
+            IndexModel([("call_sid", ASCENDING), ("turn", ASCENDING)], unique=True),
+        ]
+
+
+class WebhookDeadLetter(Document):
+    call_sid: Optional[str] = None
+    url: str
+    payload: dict  # Exactly what was sent, for replay
+    error: Optional[str] = None  # Last failure
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    replayed_at: Optional[datetime] = None  # Set once a replay is delivered
+
+    class Settings:
+        indexes = [
+            [("replayed_at", ASCENDING), ("created_at", ASCENDING)],
+            "call_sid",
+        ]
+
+
+async def get_call_transcript(call_sid: str) -> Optional[str]:
+    """The call's transcript as "role: content" lines, projected from its CallTurn documents."""
+    cursor = CallTurn.get_pymongo_collection().find(
+        {"call_sid": call_sid}, {"_id": 0, "role": 1, "content": 1}
+    ).sort("turn", ASCENDING)
+    lines = [f"{turn['role']}: {turn['content']}" async for turn in cursor]
+    return "\n".join(lines) if lines else None
+
+
 async def connect_to_db():
     """
     Connect to MongoDB using Motor async client and initialize Beanie ODM.
@@ -194,6 +323,8 @@ async def connect_to_db():
 
         logger.info("🟢🟢Connecting to MongoDB using Motor...")
 
+        from utils.telemetry import MongoCommandListener
+
         # Create Motor async client with optimized connection parameters
         client = AsyncIOMotorClient(
             MONGO_URI,
@@ -205,6 +336,7 @@ async def connect_to_db():
             maxIdleTimeMS=30000,  # Add idle timeout
             retryWrites=True,  # Enable retryable writes
             retryReads=True,  # Enable retryable reads
+            event_listeners=[MongoCommandListener()],  # Command latency for /metrics
         )
 
         # Test the connection with a ping command
@@ -220,6 +352,10 @@ async def connect_to_db():
                 Call,
                 PincodeData,
                 organization,
+                WorkerStatus,
+                PostCallJob,
+                CallTurn,
+                WebhookDeadLetter,
             ],
         )
 
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from loguru import logger
+
+from utils.drain import is_draining
+from utils.workers import node_live_calls
+
+# Admission thresholds (per node). 0 disables the live-call limit.
+MAX_LOOP_LAG_MS = float(os.getenv("MAX_LOOP_LAG_MS", "150"))
+MAX_LIVE_CALLS = int(os.getenv("MAX_LIVE_CALLS", "0"))
+LAG_SAMPLE_INTERVAL_SECS = float(os.getenv("LAG_SAMPLE_INTERVAL_SECS", "0.1"))
+LAG_WINDOW_SECS = float(os.getenv("LAG_WINDOW_SECS", "5"))
+# Seconds a rejected /outbound caller is asked to wait before retrying
+ADMISSION_RETRY_AFTER_SECS = int(os.getenv("ADMISSION_RETRY_AFTER_SECS", "10"))
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag: how late a sleep of a fixed interval wakes up.
+
+    When every live call shares one loop, lag is the earliest sign that audio
+    frames are about to be delayed for all of them.
+    """
+
+    def __init__(self, interval: float = LAG_SAMPLE_INTERVAL_SECS, window_secs: float = LAG_WINDOW_SECS):
+        self.interval = interval
+        self._samples = deque(maxlen=max(1, int(window_secs / interval)))
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        from utils.telemetry import LOOP_LAG_SECONDS
+
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self._samples.append(lag_ms)
+            LOOP_LAG_SECONDS.observe(lag_ms / 1000)
+
+    @property
+    def lag_ms(self) -> float:
+        """p95 loop lag over the sampling window, in milliseconds."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    @property
+    def max_lag_ms(self) -> float:
+        return max(self._samples, default=0.0)
+
+
+lag_monitor = LoopLagMonitor()
+
+
+def capacity_score() -> float:
+    """Remaining capacity of this node between 0.0 (saturated) and 1.0 (idle).
+
+    The score is the tighter of the loop-lag and live-call headroom, so an
+    external load balancer or autoscaler can weight or scale on one number.
+    A draining node always reports 0.0.
+    """
+    if is_draining():
+        return 0.0
+    headroom = [1.0 - lag_monitor.lag_ms / MAX_LOOP_LAG_MS] if MAX_LOOP_LAG_MS > 0 else []
+    if MAX_LIVE_CALLS > 0:
+        headroom.append(1.0 - node_live_calls() / MAX_LIVE_CALLS)
+    return round(max(0.0, min([1.0] + headroom)), 3)
+
+
+def accepting_calls() -> bool:
+    """Whether this node should take another call right now."""
+    return capacity_score() > 0.0
+
+
+def get_capacity() -> dict:
+    """Admission state of this node."""
+    from utils.workers import live_call_count
+
+    return {
+        "accepting": accepting_calls(),
+        "draining": is_draining(),
+        "capacity_score": capacity_score(),
+        "loop_lag_ms": round(lag_monitor.lag_ms, 1),
+        "loop_lag_max_ms": round(lag_monitor.max_lag_ms, 1),
+        "live_calls": node_live_calls(),
+        "worker_live_calls": live_call_count(),
+        "max_loop_lag_ms": MAX_LOOP_LAG_MS,
+        "max_live_calls": MAX_LIVE_CALLS,
+    }
+
+
+def log_rejection(endpoint: str):
+    capacity = get_capacity()
+    logger.warning(
+        f"🚦 Rejecting {endpoint}: loop lag {capacity['loop_lag_ms']}ms, "
+        f"live calls {capacity['live_calls']} (score {capacity['capacity_score']})"
+    )
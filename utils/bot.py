@@ -1,12 +1,16 @@
 import os
 import asyncio
+import time
 from dotenv import load_dotenv
 from loguru import logger
 import aiohttp
 from pipecat.processors.audio.audio_buffer_processor import AudioBufferProcessor
 
-from utils.call_audio import save_audio, finalize_audio_recording
-from utils.post_call import delayed_background_processing
+from utils.call_audio import CallRecorder, finalize_audio_recording, recording_buffer_size, stop_recording
+from utils.recording_store import create_recording_sink
+from utils.transcript_sink import transcript_sink
+from utils.post_call import delayed_background_processing, spawn_background
+from utils.telemetry import CALLS_STARTED, observe_call_setup
 import asyncio
 
 print("🚀 Starting Pipecat bot...")
@@ -63,6 +67,7 @@ async def run_bot(
     call_data: dict,
 ):
     logger.info(f"Starting bot")
+    CALLS_STARTED.labels(bot="multimodel").inc()
 
     # Components are already initialized at startup, no need to call again
     # Use global pre-initialized components
@@ -150,12 +155,18 @@ async def run_bot(
         rtvi = RTVIProcessor(config=RTVIConfig(config=[]))
 
         # Create an audio buffer processor to capture conversation audio
+        # Hand audio to the recorder every RECORDING_BUFFER_SECS instead of
+        # holding the whole call in memory until stop_recording()
         audiobuffer = AudioBufferProcessor(
             sample_rate=None,
             num_channels=2,
-            buffer_size=0,
+            buffer_size=recording_buffer_size(),
             enable_turn_audio=False,
         )
+        recorder = CallRecorder(
+            f"server_{call_data['call_id']}",
+            sink=create_recording_sink(call_data["call_id"]),
+        )
 
         transcript = TranscriptProcessor()
 
@@ -215,6 +226,7 @@ async def run_bot(
         async def on_client_connected(transport, client):
             logger.info(f"Client connected")
             logger.info(f"Transport call_sid: {transport}")
+            observe_call_setup("multimodel", call_data)
 
             # Update database status
             call = await Call.find_one({"call_sid": call_data["call_id"]})
@@ -237,50 +249,41 @@ async def run_bot(
                 if isinstance(msg, TranscriptionMessage):
                     line = f"{msg.role}: {msg.content}"
                     transcript_list.append(line)
-                    # Example: Save to a list or file (async to avoid blocking)
-                    try:
-                        import aiofiles
-
-                        async with aiofiles.open(
-                            "transcripts.txt", "a", encoding="utf-8"
-                        ) as f:
-                            await f.write(line + "\n")
-                    except Exception as e:
-                        logger.warning(f"Failed to write transcript to file: {e}")
+                    # Buffered; written to transcripts/*.jsonl in batches
+                    transcript_sink.add(
+                        call_data["call_id"], msg.role, msg.content, msg.timestamp
+                    )
                 else:
                     logger.info(f"🔍 Non-transcription message: {type(msg)} - {msg}")
 
         @audiobuffer.event_handler("on_audio_data")
         async def on_audio_data(buffer, audio, sample_rate, num_channels):
-            server_name = f"server_{call_data['call_id']}"
-            await save_audio(server_name, audio, sample_rate, num_channels)
+            await recorder.write(audio, sample_rate, num_channels)
 
         @transport.event_handler("on_client_disconnected")
         async def on_client_disconnected(transport, client):
             summary = cost_tracker.get_final_summary()
             transcript_text = "\n".join(transcript_list)
+            await transcript_sink.end_call(call_data["call_id"])
 
             print(f"   Total Cost: ${summary['total_cost']:.2f}")
             logger.info(f"Client disconnected ❌❌❌")
 
-            # Stop audio recording first to ensure file writing is complete
-            try:
-                await audiobuffer.stop_recording()
-                logger.info(
-                    f"🎬 Audio recording stopped for call {call_data['call_id']}"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to stop audio recording: {e}")
-
-            # Add a small delay to ensure file writing is complete
-            await asyncio.sleep(0.5)  # 500ms delay
+            # Stop audio recording; returns once the last chunk is written and the file closed
+            recording = await stop_recording(audiobuffer, recorder)
+            logger.info(f"🎬 Audio recording stopped for call {call_data['call_id']}")
 
             # Finalize audio recording and trigger upload
             try:
                 server_name = f"server_{call_data['call_id']}"
                 call_cost = float(summary.get("total_cost", 0.0))
                 await finalize_audio_recording(
-                    call_data["call_id"], server_name, transcript_text, call_cost
+                    call_data["call_id"],
+                    server_name,
+                    transcript_text,
+                    call_cost,
+                    recording=recording,
+                    turn_count=len(transcript_list),
                 )
                 logger.info(
                     f"🎬 Audio recording finalized for call {call_data['call_id']}"
@@ -290,7 +293,7 @@ async def run_bot(
                 # Fallback to old method if finalization fails
                 try:
                     call_cost = float(summary.get("total_cost", 0.0))
-                    asyncio.create_task(
+                    spawn_background(
                         delayed_background_processing(
                             call_sid=str(call_data["call_id"]),
                             transcript=str(transcript_text),
@@ -317,6 +320,7 @@ async def run_bot(
 
 async def bot(runner_args):
     """Main bot entry point compatible with Pipecat Cloud."""
+    setup_started = time.perf_counter()
 
     # Import heavy components only when needed
     from pipecat.runner.utils import parse_telephony_websocket
@@ -330,6 +334,8 @@ async def bot(runner_args):
     from model.model import Call
 
     transport_type, call_data = await parse_telephony_websocket(runner_args.websocket)
+    # Call setup (accepted WebSocket -> client connected) is measured from here
+    call_data["setup_started"] = setup_started
     logger.info(f"Auto-detected transport: {transport_type}")
 
     # write Db query to get multimode from call sid
@@ -1,5 +1,6 @@
 import os
 import asyncio
+import time
 from dotenv import load_dotenv
 from loguru import logger
 import aiohttp
@@ -33,10 +34,14 @@ import asyncio
 from pipecat.adapters.schemas.tools_schema import ToolsSchema
 
 # Import post-call processing utilities
-from utils.call_audio import save_audio, finalize_audio_recording
-from utils.post_call import delayed_background_processing
+from utils.call_audio import CallRecorder, finalize_audio_recording, recording_buffer_size, stop_recording
+from utils.recording_store import create_recording_sink
+from utils.transcript_sink import transcript_sink
+from utils.call_events import publish
+from utils.post_call import delayed_background_processing, spawn_background
 from model.model import Call, CallStatus
-from bots.standard.metric_collector import MetricsCollector
+from bots.standard.metric_collector import MetricsCollector, TurnLatencyObserver
+from utils.telemetry import CALLS_STARTED, observe_call_setup
 
 
 load_dotenv(override=True)
@@ -48,6 +53,7 @@ async def run_bot_2(
     call_data: dict,
 ):
     logger.info(f"Starting bot")
+    CALLS_STARTED.labels(bot="standard").inc()
 
     session = aiohttp.ClientSession()
 
@@ -81,6 +87,11 @@ async def run_bot_2(
         )
         metric_collector = MetricsCollector()
 
+        from pipecat.audio.vad.vad_analyzer import VADParams
+
+        # bot_2() uses SileroVADAnalyzer with default params
+        turn_latency_observer = TurnLatencyObserver(vad_stop_secs=VADParams().stop_secs)
+
         from utils.call_config import get_llm_service_config
 
         llm = get_llm_service_config(llm_provider)
@@ -113,16 +124,23 @@ async def run_bot_2(
         transcript = TranscriptProcessor()
 
         # Create an audio buffer processor to capture conversation audio
+        # Hand audio to the recorder every RECORDING_BUFFER_SECS instead of
+        # holding the whole call in memory until stop_recording()
         audiobuffer = AudioBufferProcessor(
             sample_rate=None,
             num_channels=2,
-            buffer_size=0,
+            buffer_size=recording_buffer_size(),
             enable_turn_audio=False,
         )
+        recorder = CallRecorder(
+            f"server_{call_data['call_id']}",
+            sink=create_recording_sink(call_data["call_id"]),
+        )
         from bots.standard.metric_collector import CostCollector
         cost_collector = CostCollector()
         # Initialize transcript list for tracking
         transcript_list = []
+        turns_with_latency = [0]  # Voice-to-voice samples already attached to a bot turn
 
         # Track transcript updates
         @transcript.event_handler("on_transcript_update")
@@ -142,16 +160,17 @@ async def run_bot_2(
                     line = f"{msg.role}: {msg.content}"
                     transcript_list.append(line)
 
-                    # Log transcript to file
-                    try:
-                        import aiofiles
+                    # A bot turn answering the user carries that turn's voice-to-voice latency
+                    latency_ms = None
+                    answered = len(turn_latency_observer.voice_to_voice_ms)
+                    if msg.role == "assistant" and answered > turns_with_latency[0]:
+                        turns_with_latency[0] = answered
+                        latency_ms = turn_latency_observer.voice_to_voice_ms[-1]
 
-                        async with aiofiles.open(
-                            "transcripts.txt", "a", encoding="utf-8"
-                        ) as f:
-                            await f.write(line + "\n")
-                    except Exception as e:
-                        logger.warning(f"Failed to write transcript to file: {e}")
+                    # Buffered; written to transcripts/*.jsonl and call_turns in batches
+                    transcript_sink.add(
+                        call_data["call_id"], msg.role, msg.content, msg.timestamp, latency_ms
+                    )
                 else:
                     logger.info(f"🔍 Non-transcription message: {type(msg)} - {msg}")
 
@@ -177,13 +196,13 @@ async def run_bot_2(
                 audio_in_sample_rate=8000,  # Twilio's audio format
                 audio_out_sample_rate=8000,
                 allow_interruptions=True,
-                report_only_initial_ttfb=True,
+                report_only_initial_ttfb=False,  # TTFB of every turn, not just the first
                 enable_metrics=True,
                 enable_usage_metrics=True,
                 idle_timeout_secs=int(idle_timeout_secs),
                 cancel_on_idle_timeout=False,  # Don't auto-cancel
             ),
-            observers=[RTVIObserver(rtvi), metric_collector],
+            observers=[RTVIObserver(rtvi), metric_collector, turn_latency_observer],
         )
 
         # Debug: Log that the metrics collector has been added
@@ -198,6 +217,7 @@ async def run_bot_2(
         async def on_client_connected(transport, client):
             logger.info(f"Client connected")
             logger.info(f"Transport call_sid: {transport}")
+            observe_call_setup("standard", call_data)
 
             # Update database status
             call = await Call.find_one({"call_sid": call_data["call_id"]})
@@ -225,14 +245,19 @@ async def run_bot_2(
 
         @audiobuffer.event_handler("on_audio_data")
         async def on_audio_data(buffer, audio, sample_rate, num_channels):
-            server_name = f"server_{call_data['call_id']}"
-            await save_audio(server_name, audio, sample_rate, num_channels)
+            await recorder.write(audio, sample_rate, num_channels)
 
         @transport.event_handler("on_client_disconnected")
         async def on_client_disconnected(transport, client):
 
             transcript_text = "\n".join(transcript_list)
+            await transcript_sink.end_call(call_data["call_id"])
             bot_metrics = metric_collector.get_metric_summary()
+            turn_latency = turn_latency_observer.get_summary()
+            logger.info(
+                f"⏱️ Voice-to-voice over {turn_latency['turns']} turns: "
+                f"p50={turn_latency['p50_ms']:.0f}ms, p95={turn_latency['p95_ms']:.0f}ms, max={turn_latency['max_ms']:.0f}ms"
+            )
 
             logger.info(f"Client disconnected ❌❌❌")
 
@@ -242,7 +267,7 @@ async def run_bot_2(
                 if call:
                     cost_collector.calculate_llm_cost(bot_metrics.get("tokens", {}).get("prompt_tokens", 0), bot_metrics.get("tokens", {}).get("completion_tokens", 0), llm_provider)
                     logger.info(f"LLM cost: {cost_collector.llm_cost}")
-                    from model.model import MetricsData, CostData
+                    from model.model import MetricsData, CostData, LatencyStats, TurnLatencyData
                     cost_data = CostData(
                         llm_cost=cost_collector.llm_cost,
                         tts_cost=cost_collector.tts_cost,
@@ -259,13 +284,24 @@ async def run_bot_2(
                         total_prompt_tokens=bot_metrics.get("tokens", {}).get("prompt_tokens", 0),
                         total_completion_tokens=bot_metrics.get("tokens", {}).get("completion_tokens", 0),
                         total_tts_characters=bot_metrics.get("tts_characters", 0),
-                        total_sst_duration_ms=bot_metrics.get("stt_total_duration", 0)
+                        total_sst_duration_ms=bot_metrics.get("stt_total_duration", 0),
+                        turn_latency=TurnLatencyData(**turn_latency),
+                        **{
+                            f"{service}_ttfb_stats": LatencyStats(**stats)
+                            for service, stats in bot_metrics["ttfb"].items()
+                            if stats["count"]
+                        },
                     )
                     call.cost = cost_data
                     call.metrics = metrics_data
                     call.status = CallStatus.COMPLETED
-                    call.transcript = transcript_text
+                    # Call.transcript is filled from call_turns by post-call processing
                     await call.save()
+                    publish(
+                        call_data["call_id"],
+                        "metrics",
+                        {"metrics": metrics_data.model_dump(), "cost": cost_data.model_dump()},
+                    )
                     
                     logger.info(f"✅ Updated call {call_data['call_id']} with metrics data")
                     logger.info(f"📊 Metrics saved: total_latency={metrics_data.total_latency_ms}ms, "
@@ -276,17 +312,9 @@ async def run_bot_2(
             except Exception as e:
                 logger.error(f"❌ Failed to update call with metrics: {e}")
 
-            # Stop audio recording first to ensure file writing is complete
-            try:
-                await audiobuffer.stop_recording()
-                logger.info(
-                    f"🎬 Audio recording stopped for call {call_data['call_id']}"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to stop audio recording: {e}")
-
-            # Add a small delay to ensure file writing is complete
-            await asyncio.sleep(0.5)  # 500ms delay
+            # Stop audio recording; returns once the last chunk is written and the file closed
+            recording = await stop_recording(audiobuffer, recorder)
+            logger.info(f"🎬 Audio recording stopped for call {call_data['call_id']}")
 
             # Finalize audio recording and trigger upload
             try:
@@ -296,6 +324,8 @@ async def run_bot_2(
                     server_name,
                     transcript_text,
                     0.0,
+                    recording=recording,
+                    turn_count=len(transcript_list),
                 )
                 logger.info(
                     f"🎬 Audio recording finalized for call {call_data['call_id']}"
@@ -304,7 +334,7 @@ async def run_bot_2(
                 logger.error(f"❌ Failed to finalize audio recording: {e}")
                 # Fallback to old method if finalization fails
                 try:
-                    asyncio.create_task(
+                    spawn_background(
                         delayed_background_processing(
                             call_sid=str(call_data["call_id"]),
                             transcript=str(transcript_text),
@@ -331,6 +361,7 @@ async def run_bot_2(
 
 async def bot_2(runner_args, call_data=None):
     """Main bot entry point compatible with Pipecat Cloud."""
+    setup_started = time.perf_counter()
 
     # Import heavy components only when needed
     from pipecat.serializers.twilio import TwilioFrameSerializer
@@ -350,6 +381,8 @@ async def bot_2(runner_args, call_data=None):
         logger.info(f"Auto-detected transport: {transport_type}")
     else:
         logger.info(f"Using provided call_data: {call_data}")
+    # Call setup (accepted WebSocket -> client connected) is measured from here
+    call_data.setdefault("setup_started", setup_started)
 
     serializer = TwilioFrameSerializer(
         stream_sid=call_data["stream_id"],
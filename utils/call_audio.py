@@ -2,138 +2,382 @@ from loguru import logger
 import glob
 import os
 import asyncio
+import struct
+import time
+from datetime import datetime
 
+from utils.telemetry import RECORDING_BYTES
 
+RECORDINGS_DIR = "recordings"
+# Seconds of audio the recorder keeps in memory before writing to disk
+RECORDING_FLUSH_SECS = float(os.getenv("RECORDING_FLUSH_SECS", "5"))
+# Seconds of audio AudioBufferProcessor accumulates before handing it to the recorder
+RECORDING_BUFFER_SECS = float(os.getenv("RECORDING_BUFFER_SECS", "1"))
 
+WAV_HEADER_SIZE = 44
 
-async def save_audio(
-    server_name: str, audio_data: bytes, sample_rate: int, num_channels: int
-):
-    """Save audio data to a proper WAV file for recording purposes."""
-    try:
-        import aiofiles
-        import os
-        import struct
-        from datetime import datetime
+# Largest recording accepted by the streaming upload endpoint
+MAX_RECORDING_UPLOAD_BYTES = int(os.getenv("MAX_RECORDING_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+# Formats the streaming upload endpoint accepts (the spool file's extension)
+UPLOAD_RECORDING_FORMATS = {"wav", "flac", "ogg", "mp3"}
+# Request body bytes gathered in memory before each write to the spool file
+UPLOAD_SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+def create_wav_header(data_length, sample_rate, num_channels, bits_per_sample=16):
+    """Create a 44-byte PCM WAV header."""
+    byte_rate = sample_rate * num_channels * bits_per_sample // 8
+    block_align = num_channels * bits_per_sample // 8
+
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",  # ChunkID
+        data_length + 36,  # ChunkSize
+        b"WAVE",  # Format
+        b"fmt ",  # Subchunk1ID
+        16,  # Subchunk1Size
+        1,  # AudioFormat (PCM)
+        num_channels,  # NumChannels
+        sample_rate,  # SampleRate
+        byte_rate,  # ByteRate
+        block_align,  # BlockAlign
+        bits_per_sample,  # BitsPerSample
+        b"data",  # Subchunk2ID
+        data_length,  # Subchunk2Size
+    )
+
+
+def recording_buffer_size(sample_rate: int = 8000) -> int:
+    """AudioBufferProcessor buffer_size (bytes per track) for RECORDING_BUFFER_SECS of 16-bit audio."""
+    return int(sample_rate * 2 * RECORDING_BUFFER_SECS)
+
+
+class CallRecorder:
+    """Streams one call's audio to a single WAV file.
+
+    The file is opened once. Audio is kept in memory until RECORDING_FLUSH_SECS
+    worth has accumulated and is then appended in a worker thread; the RIFF
+    header is only written (over a placeholder) at finalize. Memory per call is
+    therefore bounded by the flush window, however long the call runs.
+
+    An optional sink (see utils.recording_store) is told how much of the file
+    is on disk after every flush so it can upload while the call runs; the
+    uploaded URL is then available as `url` after finalize.
+
+    finished() is resolved by finalize() with the exact path and size of the
+    closed file, so post-call work can start without waiting or searching.
+    """
 
-        # Create recordings directory if it doesn't exist
-        recordings_dir = "recordings"
-        os.makedirs(recordings_dir, exist_ok=True)
+    def __init__(self, server_name: str, flush_secs: float = RECORDING_FLUSH_SECS, sink=None):
+        self.server_name = server_name
+        self.flush_secs = flush_secs
+        self.sink = sink
+        self.path = None
+        self.url = None
+        self.sample_rate = None
+        self.num_channels = None
 
-        # Generate filename with timestamp
+        self._file = None
+        self._pending = bytearray()
+        self._flush_bytes = 0
+        self._lock = asyncio.Lock()
+        self._finalized = False
+        self._finished = None
+
+        # Stats
+        self.bytes_written = 0
+        self.flushes = 0
+        self.flush_ms = []
+
+    async def write(self, audio: bytes, sample_rate: int, num_channels: int):
+        """Add a chunk of interleaved 16-bit audio (an AudioBufferProcessor on_audio_data payload)."""
+        if self._finalized or not audio:
+            return
+
+        async with self._lock:
+            if self._file is None:
+                await self._open(sample_rate, num_channels)
+
+            self._pending += audio
+            if len(self._pending) >= self._flush_bytes:
+                await self._flush()
+
+    async def _open(self, sample_rate: int, num_channels: int):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self._flush_bytes = int(sample_rate * num_channels * 2 * self.flush_secs)
+
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{recordings_dir}/{server_name}_{timestamp}.wav"
-
-        # Create proper WAV file with headers
-        def create_wav_header(
-            data_length, sample_rate, num_channels, bits_per_sample=16
-        ):
-            """Create WAV file header"""
-            byte_rate = sample_rate * num_channels * bits_per_sample // 8
-            block_align = num_channels * bits_per_sample // 8
-
-            header = struct.pack(
-                "<4sI4s4sIHHIIHH4sI",
-                b"RIFF",  # ChunkID
-                data_length + 36,  # ChunkSize
-                b"WAVE",  # Format
-                b"fmt ",  # Subchunk1ID
-                16,  # Subchunk1Size
-                1,  # AudioFormat (PCM)
-                num_channels,  # NumChannels
-                sample_rate,  # SampleRate
-                byte_rate,  # ByteRate
-                block_align,  # BlockAlign
-                bits_per_sample,  # BitsPerSample
-                b"data",  # Subchunk2ID
-                data_length,  # Subchunk2Size
+        self.path = f"{RECORDINGS_DIR}/{self.server_name}_{timestamp}.wav"
+
+        def open_file():
+            f = open(self.path, "wb")
+            f.write(b"\0" * WAV_HEADER_SIZE)  # Real header is written at finalize
+            return f
+
+        self._file = await asyncio.to_thread(open_file)
+        logger.info(f"🎙️ Recording {self.server_name} to {self.path} ({sample_rate}Hz, {num_channels}ch)")
+
+    async def _flush(self):
+        if not self._pending:
+            return
+
+        data = bytes(self._pending)
+        self._pending.clear()
+
+        def write_data():
+            self._file.write(data)
+            self._file.flush()  # Visible to the sink reading the file
+
+        start = time.perf_counter()
+        await asyncio.to_thread(write_data)
+        self.flush_ms.append((time.perf_counter() - start) * 1000)
+        self.flushes += 1
+        self.bytes_written += len(data)
+        RECORDING_BYTES.inc(len(data))
+
+        if self.sink:
+            self.sink.on_data(self.path, WAV_HEADER_SIZE + self.bytes_written)
+
+    def finished(self) -> asyncio.Future:
+        """Future resolved by finalize() with the recording (see get_recording())."""
+        if self._finished is None:
+            self._finished = asyncio.get_running_loop().create_future()
+        return self._finished
+
+    def get_recording(self) -> dict:
+        """The finished recording: path (None if no audio was written), size_bytes, duration_secs and url."""
+        stats = self.get_stats()
+        return {
+            "path": self.path,
+            "size_bytes": WAV_HEADER_SIZE + self.bytes_written if self.path else 0,
+            "duration_secs": stats["duration_secs"],
+            "url": self.url,
+        }
+
+    async def finalize(self):
+        """Flush what is left, write the header and close the file.
+
+        Returns the recording path, or None if no audio was ever written.
+        With a sink, the upload is completed here and `url` is set.
+        Safe to call more than once.
+        """
+        # stop_recording() delivers the last chunk from a handler task; let it
+        # take the lock first.
+        await asyncio.sleep(0)
+        async with self._lock:
+            if self._finalized:
+                return self.path
+            self._finalized = True
+
+            if self._file is None:
+                self._resolve_finished()
+                return None
+
+            await self._flush()
+
+            def close_file():
+                self._file.seek(0)
+                self._file.write(create_wav_header(self.bytes_written, self.sample_rate, self.num_channels))
+                self._file.close()
+
+            await asyncio.to_thread(close_file)
+
+            if self.sink:
+                try:
+                    self.url = await self.sink.complete(self.path)
+                    os.remove(self.path)
+                except Exception as e:
+                    # The local file stays; post-call processing uploads it instead
+                    logger.error(f"❌ Streaming upload of {self.path} failed: {e}")
+
+            stats = self.get_stats()
+            logger.info(
+                f"🎬 Recording finalized: {self.path} ({stats['bytes_written']} bytes, "
+                f"{stats['duration_secs']}s, {stats['flushes']} flushes, "
+                f"flush avg {stats['flush_avg_ms']}ms / max {stats['flush_max_ms']}ms)"
             )
-            return header
+            self._resolve_finished()
+            return self.path
 
-        # Check if file exists to determine if we need to write header
-        file_exists = os.path.exists(filename)
+    def _resolve_finished(self):
+        finished = self.finished()
+        if not finished.done():
+            finished.set_result(self.get_recording())
+
+    def get_stats(self) -> dict:
+        """Bytes written and flush latency so far."""
+        bytes_per_sec = (self.sample_rate or 0) * (self.num_channels or 0) * 2
+        return {
+            "path": self.path,
+            "bytes_written": self.bytes_written,
+            "duration_secs": round(self.bytes_written / bytes_per_sec, 1) if bytes_per_sec else 0.0,
+            "flushes": self.flushes,
+            "flush_avg_ms": round(sum(self.flush_ms) / len(self.flush_ms), 2) if self.flush_ms else 0.0,
+            "flush_max_ms": round(max(self.flush_ms), 2) if self.flush_ms else 0.0,
+            "pending_bytes": len(self._pending),
+        }
+
+
+# pipecat keeps no public handle on event handler tasks, so stop_recording()
+# reads AudioBufferProcessor._event_tasks. Verified with these pipecat-ai
+# releases; any other version logs a warning once.
+PIPECAT_TESTED_VERSIONS = ("0.0.85",)
+_pipecat_version_checked = False
+
+
+def pipecat_internals_tested() -> bool:
+    """True if the installed pipecat-ai is one the private-attribute access was verified with."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("pipecat-ai") in PIPECAT_TESTED_VERSIONS
+    except PackageNotFoundError:
+        return False
+
+
+async def _wait_for_audio_handlers(audiobuffer):
+    """Wait for the on_audio_data handler tasks stop_recording() started."""
+    global _pipecat_version_checked
+
+    if not _pipecat_version_checked:
+        _pipecat_version_checked = True
+        if not pipecat_internals_tested():
+            logger.warning(f"⚠️ stop_recording() is only verified with pipecat-ai {', '.join(PIPECAT_TESTED_VERSIONS)}")
+
+    tasks = getattr(audiobuffer, "_event_tasks", None)
+    if tasks is None:
+        logger.error("❌ AudioBufferProcessor has no _event_tasks; the last recording chunk may be cut off")
+        for _ in range(3):
+            await asyncio.sleep(0)  # Best effort: let already scheduled handlers run
+        return
+    handlers = [task for name, task in tasks if name == "on_audio_data"]
+    if handlers:
+        await asyncio.wait(handlers)
 
-        if not file_exists:
-            # Write WAV header for new file
-            header = create_wav_header(len(audio_data), sample_rate, num_channels)
-            async with aiofiles.open(filename, "wb") as f:
-                await f.write(header)
-                await f.write(audio_data)
-        else:
-            # Append to existing file (update file size in header)
-            async with aiofiles.open(filename, "ab") as f:
-                await f.write(audio_data)
-
-            # Update the file size in the WAV header
-            file_size = os.path.getsize(filename)
-            async with aiofiles.open(filename, "r+b") as f:
-                await f.seek(4)
-                await f.write(struct.pack("<I", file_size - 8))  # Update ChunkSize
-                await f.seek(40)
-                await f.write(struct.pack("<I", file_size - 44))  # Update Subchunk2Size
-
-        logger.info(
-            f"Audio saved to {filename} ({len(audio_data)} bytes, {sample_rate}Hz, {num_channels}ch)"
-        )
 
+async def stop_recording(audiobuffer, recorder: CallRecorder) -> dict:
+    """Stop an AudioBufferProcessor feeding `recorder` and finalize the recording.
+
+    stop_recording() hands the last chunk to on_audio_data in an event handler
+    task; that task is awaited so the chunk is written before the file is
+    closed. Returns the recording (CallRecorder.get_recording()) as soon as
+    the last byte is on disk.
+    """
+    try:
+        await audiobuffer.stop_recording()
+        await _wait_for_audio_handlers(audiobuffer)
     except Exception as e:
-        logger.error(f"Failed to save audio: {e}")
+        logger.warning(f"Failed to stop audio recording: {e}")
+
+    try:
+        await recorder.finalize()
+    except Exception as e:
+        logger.error(f"❌ Failed to finalize recording {recorder.path}: {e}")
+        return recorder.get_recording()
+    return await recorder.finished()
 
 
-async def finalize_audio_recording(call_sid: str, server_name: str, transcript: str = "", call_cost: float = 0.0):
+async def finalize_audio_recording(
+    call_sid: str,
+    server_name: str,
+    transcript: str = "",
+    call_cost: float = 0.0,
+    recording_url: str = None,
+    recording: dict = None,
+    turn_count: int = None,
+):
     """
     Finalize audio recording and trigger upload.
-    This should be called when the call ends to ensure the recording is complete.
+    This should be called when the call ends, with the recording returned by
+    stop_recording(), so the post-call job gets the exact file to upload.
     
     Args:
         call_sid: The Twilio call SID
         server_name: The server name for the recording file
         transcript: The call transcript text
         call_cost: The total call cost
+        recording_url: Set when the recording was already uploaded during the call
+        recording: The finished recording (CallRecorder.get_recording())
+        turn_count: Number of transcript turns the bot saw
     """
     try:
         logger.info(f"🎬 Finalizing audio recording for call {call_sid}")
-        
-        # Wait for recording file to be available with retry mechanism
-        recordings_dir = "recordings"
-        pattern = f"{recordings_dir}/{server_name}_*.wav"
-        recording_files = []
-        max_retries = 10
-        retry_delay = 0.1  # 100ms
-        
-        for attempt in range(max_retries):
-            recording_files = glob.glob(pattern)
-            if recording_files:
-                break
-            logger.info(f"⏳ Waiting for recording file... attempt {attempt + 1}/{max_retries}")
-            await asyncio.sleep(retry_delay)
-        
-        if recording_files:
-            # Get the most recent file
-            latest_file = max(recording_files, key=os.path.getctime)
-            logger.info(f"📁 Found recording file: {latest_file}")
-            
-            # Import here to avoid circular imports
-            from utils.post_call import process_call_completion_background
-            
-            # Start background processing for the completed recording
-            asyncio.create_task(process_call_completion_background(
-                call_sid=call_sid,
-                transcript=transcript,
-                call_cost=call_cost,
-                status="completed"
-            ))
-            logger.info(f"🚀 Background processing started for completed recording: {call_sid}")
+
+        recording_url = recording_url or (recording or {}).get("url")
+        if recording_url:
+            # Streamed to the recording store while the call ran; nothing left to upload
+            await _queue_post_call(call_sid, transcript, call_cost, turn_count, recording_url=recording_url)
+            return
+
+        if recording is not None:
+            path = recording["path"]
+        else:
+            # Caller without a recorder: take the latest file for the call, if any
+            files = glob.glob(f"{RECORDINGS_DIR}/{server_name}_*.wav")
+            path = max(files, key=os.path.getctime) if files else None
+
+        if path and os.path.exists(path):
+            size = recording["size_bytes"] if recording else os.path.getsize(path)
+            logger.info(f"📁 Recording file: {path} ({size} bytes)")
+            await _queue_post_call(call_sid, transcript, call_cost, turn_count, recording_path=path)
         else:
-            logger.warning(f"No recording files found for call {call_sid} after {max_retries} attempts")
+            logger.warning(f"No recording file for call {call_sid}")
+            await _queue_post_call(call_sid, transcript, call_cost, turn_count)
             
     except Exception as e:
         logger.error(f"❌ Failed to finalize audio recording: {e}")
 
 
+async def _queue_post_call(
+    call_sid: str,
+    transcript: str,
+    call_cost: float,
+    turn_count: int = None,
+    recording_url: str = None,
+    recording_path: str = None,
+):
+    """Hand the call to the durable post-call queue, or process it in-process if Mongo refuses the job."""
+    from utils.post_call import process_call_completion_background, spawn_background
+    from utils.post_call_queue import enqueue_post_call
+    from utils.transcript_sink import transcript_sink
+
+    # With every turn in call_turns the job only needs the count; the full
+    # text goes on it only as the fallback for turns still unwritten
+    if turn_count is not None and transcript_sink.turns_persisted(call_sid):
+        job_transcript = None
+    else:
+        job_transcript = transcript
+
+    try:
+        await enqueue_post_call(
+            call_sid,
+            transcript=job_transcript,
+            turn_count=turn_count,
+            call_cost=call_cost,
+            status="completed",
+            recording_url=recording_url,
+            recording_path=recording_path,
+        )
+    except Exception as e:
+        logger.error(f"❌ Failed to queue post-call job for {call_sid}, processing in-process: {e}")
+        spawn_background(process_call_completion_background(
+            call_sid=call_sid,
+            transcript=transcript,
+            call_cost=call_cost,
+            status="completed",
+            recording_url=recording_url,
+            recording_path=recording_path,
+        ))
+
+
 async def upload_recording(call_sid: str, filename: str = None, audio_data: bytes = None, format: str = "wav") -> str:
     """
     Upload audio recording to Cloudinary with call_sid as filename.
+
+    The upload runs on the utils.cloudinary_upload thread pool, so the event
+    loop keeps serving live calls while it is in progress.
     
     Args:
         call_sid (str): The Twilio call SID to use as the filename
@@ -145,7 +389,7 @@ async def upload_recording(call_sid: str, filename: str = None, audio_data: byte
         str: The secure URL of the uploaded file
         
     Raises:
-        Exception: If upload fails or Cloudinary configuration is missing
+        Exception: If upload fails (after retries) or Cloudinary configuration is missing
         
     Environment Variables Required:
         CLOUDINARY_CLOUD_NAME: Your Cloudinary cloud name
@@ -153,54 +397,63 @@ async def upload_recording(call_sid: str, filename: str = None, audio_data: byte
         CLOUDINARY_API_SECRET: Your Cloudinary API secret
     """
     try:
-        import cloudinary
-        import cloudinary.uploader
-        import os
-        
-        # Validate required environment variables
-        cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
-        api_key = os.getenv("CLOUDINARY_API_KEY")
-        api_secret = os.getenv("CLOUDINARY_API_SECRET")
-        
-        if not all([cloud_name, api_key, api_secret]):
-            raise ValueError("Missing required Cloudinary environment variables: CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET")
-        
-        # Configure Cloudinary
-        cloudinary.config(
-            cloud_name=cloud_name,
-            api_key=api_key,
-            api_secret=api_secret
-        )
-        
+        from utils.cloudinary_upload import upload_to_cloudinary
+
+        options = {
+            "folder": "recordings",
+            "public_id": call_sid,  # Use call_sid as filename
+            "resource_type": "video",  # Cloudinary treats audio as video resource
+            "overwrite": True,
+        }
+
         # Determine upload source
         if filename and os.path.exists(filename):
-            # Upload from file
-            result = cloudinary.uploader.upload(
-                filename,
-                folder="recordings",
-                public_id=call_sid,  # Use call_sid as filename
-                resource_type="video",  # Cloudinary treats audio as video resource
-                overwrite=True
-            )
+            upload_url = await upload_to_cloudinary(filename, os.path.getsize(filename), **options)
         elif audio_data:
-            # Upload from raw data
-            result = cloudinary.uploader.upload(
-                audio_data,
-                folder="recordings",
-                public_id=call_sid,  # Use call_sid as filename
-                resource_type="video",  # Cloudinary treats audio as video resource
-                format=format,
-                overwrite=True
-            )
+            upload_url = await upload_to_cloudinary(audio_data, len(audio_data), format=format, **options)
         else:
             raise ValueError("Either filename or audio_data must be provided")
-        
-        # Get the secure URL
-        upload_url = result.get("secure_url")
-        
+
         logger.info(f"Successfully uploaded recording to Cloudinary: {upload_url}")
         return upload_url
-        
+
     except Exception as e:
         logger.error(f"Failed to upload recording to Cloudinary: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+class RecordingTooLarge(Exception):
+    pass
+
+
+async def spool_upload_stream(chunks, suffix: str = ".wav", max_bytes: int = MAX_RECORDING_UPLOAD_BYTES) -> str:
+    """
+    Write an async iterator of body chunks to a temporary file and return its path.
+
+    At most UPLOAD_SPOOL_CHUNK_BYTES are held in memory at a time, so memory use
+    does not grow with the recording length. The file is removed if the stream
+    fails or exceeds max_bytes (RecordingTooLarge); otherwise the caller removes it.
+    """
+    import tempfile
+
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix)
+    total = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            buffer = bytearray()
+            async for chunk in chunks:
+                total += len(chunk)
+                if total > max_bytes:
+                    raise RecordingTooLarge(f"Recording exceeds {max_bytes} bytes")
+                buffer += chunk
+                if len(buffer) >= UPLOAD_SPOOL_CHUNK_BYTES:
+                    await asyncio.to_thread(f.write, buffer)
+                    buffer = bytearray()
+            if buffer:
+                await asyncio.to_thread(f.write, buffer)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    logger.info(f"📥 Spooled {total} bytes of uploaded recording to {path}")
+    return path
@@ -125,6 +125,14 @@ def get_stt_service_config(stt_provider: str):
             params=FalSTTService.InputParams(language=language),
         )
 
+    elif provider_enum == STTProvider.FAKE:
+        from utils.fake_services import FakeSTTService, get_latency_profile
+
+        return FakeSTTService(
+            profile=get_latency_profile("stt", os.getenv("FAKE_STT_PROFILE")),
+            sample_rate=8000,
+        )
+
     else:
         # Default fallback to Deepgram
         return DeepgramSTTService(
@@ -224,6 +232,14 @@ def get_tts_service_config(tts_provider: str, session: ClientSession):
             ),
         )
 
+    elif provider_enum == TTSProvider.FAKE:
+        from utils.fake_services import FakeTTSService, get_latency_profile
+
+        return FakeTTSService(
+            profile=get_latency_profile("tts", os.getenv("FAKE_TTS_PROFILE")),
+            sample_rate=8000,  # Match Twilio's audio format
+        )
+
     else:
         # Default fallback
         return SarvamTTSService(
@@ -277,6 +293,11 @@ def get_llm_service_config(llm_provider: str):
             model=model_to_use,
             api_key=os.getenv("OPENAI_API_KEY"),
         )
+    elif provider_lower == "fake":
+        # "fake/<profile>", e.g. "fake/realistic"
+        from utils.fake_services import FakeLLMService, get_latency_profile
+
+        return FakeLLMService(profile=get_latency_profile("llm", model))
     else:
         # Default fallback to OpenAI
         return OpenAILLMService(
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+from loguru import logger
+
+# Live per-call events (status changes, transcript turns, metrics) for the UI.
+# Publishing is in-process and never blocks; each subscriber has a bounded queue.
+CALL_EVENTS_QUEUE_SIZE = int(os.getenv("CALL_EVENTS_QUEUE_SIZE", "256"))
+# Recent events kept per call so a reconnecting client can resume (Last-Event-ID)
+CALL_EVENTS_HISTORY = int(os.getenv("CALL_EVENTS_HISTORY", "200"))
+CALL_EVENTS_HISTORY_TTL_SECS = float(os.getenv("CALL_EVENTS_HISTORY_TTL_SECS", "900"))
+# How often an idle stream re-checks the Call document and sends a keepalive.
+# Catches updates made by another worker (status callbacks, post-call jobs).
+CALL_EVENTS_CHECK_SECS = float(os.getenv("CALL_EVENTS_CHECK_SECS", "10"))
+# A stream closes this long after the call ended, if no recording URL arrived sooner
+CALL_EVENTS_LINGER_SECS = float(os.getenv("CALL_EVENTS_LINGER_SECS", "60"))
+
+TERMINAL_STATUSES = {"completed", "failed", "busy", "no-answer", "canceled"}
+
+_subscribers = {}  # call_sid -> set of queues
+_history = {}  # call_sid -> (deque of (id, type, data), last publish time)
+_next_id = {}  # call_sid -> next event id
+
+
+def publish(call_sid: str, event_type: str, data: dict):
+    """Send an event to everyone subscribed to the call. Safe to call from any coroutine."""
+    if not call_sid:
+        return
+
+    event_id = _next_id.get(call_sid, 0)
+    _next_id[call_sid] = event_id + 1
+    event = (event_id, event_type, data)
+
+    history, _ = _history.get(call_sid, (None, 0))
+    if history is None:
+        history = deque(maxlen=CALL_EVENTS_HISTORY)
+    history.append(event)
+    _history[call_sid] = (history, time.monotonic())
+    _expire_history()
+
+    for queue in _subscribers.get(call_sid, ()):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind re-syncs from a fresh snapshot
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait((event_id, "resync", {}))
+
+
+def _expire_history():
+    cutoff = time.monotonic() - CALL_EVENTS_HISTORY_TTL_SECS
+    for call_sid in [sid for sid, (_, last) in _history.items() if last < cutoff]:
+        if call_sid not in _subscribers:
+            _history.pop(call_sid, None)
+            _next_id.pop(call_sid, None)
+
+
+def subscriber_count() -> int:
+    return sum(len(queues) for queues in _subscribers.values())
+
+
+def format_sse(event_type: str, data: dict, event_id: int = None) -> str:
+    lines = [f"event: {event_type}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _call_state(call_sid: str):
+    """Status, duration, cost and recording URL of the call, without the large fields."""
+    from model.model import Call
+
+    return await Call.get_pymongo_collection().find_one(
+        {"call_sid": call_sid},
+        {"_id": 0, "status": 1, "call_duration": 1, "call_cost": 1, "recording_url": 1},
+    )
+
+
+async def _turns_after(call_sid: str, after: int) -> list:
+    """Stored transcript turns of the call numbered above `after`, shaped like "turn" events."""
+    from model.model import CallTurn
+
+    cursor = CallTurn.get_pymongo_collection().find(
+        {"call_sid": call_sid, "turn": {"$gt": after}},
+        {"_id": 0, "turn": 1, "role": 1, "content": 1, "timestamp": 1, "latency_ms": 1},
+    ).sort("turn", 1)
+    return [turn async for turn in cursor]
+
+
+async def _last_stored_turn(call_sid: str) -> int:
+    from model.model import CallTurn
+
+    latest = await CallTurn.get_pymongo_collection().find_one(
+        {"call_sid": call_sid}, {"_id": 0, "turn": 1}, sort=[("turn", -1)]
+    )
+    return latest["turn"] if latest else -1
+
+
+async def stream_call_events(call_sid: str, request, snapshot: dict, last_event_id: int = None):
+    """Server-sent events for one call.
+
+    Starts with a "snapshot" event (the call details), or with the events
+    missed since last_event_id when resuming. Then sends "status", "turn",
+    "metrics" and "update" events as they happen, and a keepalive every
+    CALL_EVENTS_CHECK_SECS. Turns of a call served by another worker are
+    read from call_turns on that same check. Ends with an "end" event once
+    the call has ended and its recording URL is known, or
+    CALL_EVENTS_LINGER_SECS after it ended.
+    """
+    queue = asyncio.Queue(maxsize=CALL_EVENTS_QUEUE_SIZE)
+    _subscribers.setdefault(call_sid, set()).add(queue)
+    try:
+        # Highest turn the client has; the snapshot's transcript covers the stored ones
+        last_turn = await _last_stored_turn(call_sid)
+
+        history, _ = _history.get(call_sid, ((), 0))
+        if last_event_id is not None and history and history[0][0] <= last_event_id + 1:
+            for event_id, event_type, data in history:
+                if event_id > last_event_id:
+                    yield format_sse(event_type, data, event_id)
+        else:
+            yield format_sse("snapshot", snapshot)
+
+        state = {key: snapshot.get(key) for key in ("status", "call_duration", "call_cost", "recording_url")}
+        ended_at = time.monotonic() if state["status"] in TERMINAL_STATUSES else None
+
+        while True:
+            if ended_at is not None and (
+                state["recording_url"] or time.monotonic() - ended_at > CALL_EVENTS_LINGER_SECS
+            ):
+                yield format_sse("end", state)
+                return
+
+            try:
+                event_id, event_type, data = await asyncio.wait_for(queue.get(), timeout=CALL_EVENTS_CHECK_SECS)
+                if event_type in ("status", "update"):
+                    state.update({key: value for key, value in data.items() if key in state})
+                elif event_type == "turn":
+                    last_turn = max(last_turn, data["turn"])
+                yield format_sse(event_type, data, event_id)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                # Changes made by other workers never reach this process's queue
+                current = await _call_state(call_sid)
+                if current:
+                    changed = {
+                        key: current[key] for key in state if current.get(key) is not None and current[key] != state[key]
+                    }
+                    if changed:
+                        state.update(changed)
+                        yield format_sse("update", changed)
+                for turn in await _turns_after(call_sid, last_turn):
+                    last_turn = turn["turn"]
+                    yield format_sse("turn", turn)
+                yield ": keepalive\n\n"
+
+            if ended_at is None and state["status"] in TERMINAL_STATUSES:
+                ended_at = time.monotonic()
+    except Exception as e:
+        logger.warning(f"Call event stream for {call_sid} failed: {e}")
+    finally:
+        queues = _subscribers.get(call_sid)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                _subscribers.pop(call_sid, None)
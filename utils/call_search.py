@@ -0,0 +1,193 @@
+import html
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Largest page /api/calls/search returns
+SEARCH_MAX_PAGE_SIZE = 100
+# sort=recent cannot use an index for the sort: every text match in the date
+# window is sorted in memory, so the window is capped (and defaulted) to this
+SEARCH_RECENT_MAX_DAYS = int(os.getenv("SEARCH_RECENT_MAX_DAYS", "31"))
+# sort=relevance pages with skip(); the top-k sort is bounded by how deep it goes
+SEARCH_MAX_RELEVANCE_RESULTS = int(os.getenv("SEARCH_MAX_RELEVANCE_RESULTS", "1000"))
+SNIPPET_CONTEXT_CHARS = 60
+SNIPPETS_PER_CALL = 3
+
+# Fields returned per hit; the transcript is read only to build snippets
+_RESULT_FIELDS = [
+    "call_sid",
+    "status",
+    "phone_number",
+    "name",
+    "multimodel",
+    "recording_url",
+    "stt_provider",
+    "tts_provider",
+    "llm_provider",
+    "call_cost",
+    "call_duration",
+    "created_at",
+]
+
+
+def parse_query(query: str) -> list:
+    """Terms and "quoted phrases" of a $text query, without negated (-term) parts."""
+    phrases = re.findall(r'"([^"]+)"', query)
+    rest = re.sub(r'"[^"]*"', " ", query)
+    terms = [term for term in rest.split() if not term.startswith("-")]
+    return [p.strip() for p in phrases if p.strip()] + terms
+
+
+def make_snippets(transcript: str, query: str, context: int = SNIPPET_CONTEXT_CHARS, limit: int = SNIPPETS_PER_CALL) -> list:
+    """Up to `limit` HTML-escaped excerpts around matches, with matches wrapped in <mark>."""
+    needles = parse_query(query)
+    if not transcript or not needles:
+        return []
+
+    pattern = re.compile("|".join(re.escape(needle) for needle in sorted(needles, key=len, reverse=True)), re.IGNORECASE)
+    matches = list(pattern.finditer(transcript))
+
+    snippets = []
+    covered_until = -1
+    for match in matches:
+        if match.start() < covered_until:
+            continue  # already inside the previous excerpt
+        start = max(0, match.start() - context)
+        end = min(len(transcript), match.end() + context)
+        # Extend to the end of any match the window cuts through
+        for other in matches:
+            if other.start() < end < other.end():
+                end = other.end()
+        excerpt = transcript[start:end]
+
+        marked = []
+        position = 0
+        for inner in pattern.finditer(excerpt):
+            marked.append(html.escape(excerpt[position : inner.start()]))
+            marked.append(f"<mark>{html.escape(inner.group())}</mark>")
+            position = inner.end()
+        marked.append(html.escape(excerpt[position:]))
+
+        text = "".join(marked).replace("\n", " ⏎ ")
+        snippets.append(("…" if start > 0 else "") + text + ("…" if end < len(transcript) else ""))
+        covered_until = end
+        if len(snippets) >= limit:
+            break
+    return snippets
+
+
+async def search_calls(
+    query: str,
+    status: Optional[str] = None,
+    stt_provider: Optional[str] = None,
+    tts_provider: Optional[str] = None,
+    llm_provider: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    page: int = 1,
+    page_size: int = 20,
+    sort: str = "relevance",
+    before: Optional[str] = None,
+) -> dict:
+    """Full-text search over Call.transcript (the transcript_text index) with filters.
+
+    `query` uses MongoDB $text syntax: terms match any, "quoted phrases" must
+    all appear, -term excludes. Results are sorted by text score, or newest
+    first with sort="recent". Pages are fetched with one extra document to
+    tell whether there is a next page, so no count over all matches is needed.
+
+    sort="relevance" pages with `page`, up to SEARCH_MAX_RELEVANCE_RESULTS
+    deep. sort="recent" searches at most SEARCH_RECENT_MAX_DAYS (the last ones
+    if no from_date is given) and pages by keyset: pass the previous
+    response's `next_before` as `before`. Raises ValueError for a wider
+    window, a page past the relevance limit or a malformed cursor.
+    """
+    from model.model import Call
+
+    page = max(1, page)
+    page_size = max(1, min(page_size, SEARCH_MAX_PAGE_SIZE))
+
+    if sort == "recent":
+        to_date = to_date or datetime.utcnow()
+        from_date = from_date or to_date - timedelta(days=SEARCH_RECENT_MAX_DAYS)
+        if to_date - from_date > timedelta(days=SEARCH_RECENT_MAX_DAYS):
+            raise ValueError(f"sort=recent searches at most {SEARCH_RECENT_MAX_DAYS} days; narrow from_date/to_date")
+    elif page * page_size > SEARCH_MAX_RELEVANCE_RESULTS:
+        raise ValueError(f"Only the first {SEARCH_MAX_RELEVANCE_RESULTS} results are available; refine the query")
+
+    match = {"$text": {"$search": query}}
+    for field, value in (
+        ("status", status),
+        ("stt_provider", stt_provider),
+        ("tts_provider", tts_provider),
+        ("llm_provider", llm_provider),
+    ):
+        if value:
+            match[field] = value
+    if from_date or to_date:
+        match["created_at"] = {}
+        if from_date:
+            match["created_at"]["$gte"] = from_date
+        if to_date:
+            match["created_at"]["$lt"] = to_date
+
+    projection = {field: 1 for field in _RESULT_FIELDS}
+    projection["_id"] = 0
+    projection["transcript"] = 1
+    projection["score"] = {"$meta": "textScore"}
+
+    if sort == "recent":
+        if before:
+            created_at, call_sid = _parse_cursor(before)
+            match["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "call_sid": {"$lt": call_sid}},
+            ]
+        cursor = Call.get_pymongo_collection().find(match, projection).sort([("created_at", -1), ("call_sid", -1)])
+    else:
+        cursor = (
+            Call.get_pymongo_collection()
+            .find(match, projection)
+            .sort([("score", {"$meta": "textScore"}), ("created_at", -1)])
+            .skip((page - 1) * page_size)
+        )
+    documents = await cursor.limit(page_size + 1).to_list(length=page_size + 1)
+    has_more = len(documents) > page_size
+    documents = documents[:page_size]
+
+    next_before = None
+    if sort == "recent" and has_more and documents[-1].get("created_at"):
+        next_before = f"{documents[-1]['created_at'].isoformat()}|{documents[-1]['call_sid']}"
+
+    results = []
+    for document in documents:
+        transcript = document.pop("transcript", None)
+        created_at = document.get("created_at")
+        results.append(
+            {
+                **document,
+                "score": round(document.get("score", 0.0), 3),
+                "created_at": created_at.isoformat() if created_at else None,
+                "snippets": make_snippets(transcript, query),
+            }
+        )
+
+    return {
+        "query": query,
+        "sort": sort,
+        "page": page if sort == "relevance" else None,
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_before": next_before,
+        "results": results,
+    }
+
+
+def _parse_cursor(before: str):
+    """`next_before` of a sort=recent page -> (created_at, call_sid)."""
+    try:
+        created_at, call_sid = before.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), call_sid
+    except ValueError:
+        raise ValueError("Invalid before cursor")
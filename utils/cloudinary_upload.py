@@ -0,0 +1,159 @@
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from utils.stats import percentile, record_sample
+from utils.telemetry import UPLOAD_BYTES, UPLOAD_SECONDS
+
+# The cloudinary SDK is synchronous (urllib3), so uploads run on a dedicated
+# thread pool instead of the event loop that carries live calls' audio.
+CLOUDINARY_UPLOAD_WORKERS = int(os.getenv("CLOUDINARY_UPLOAD_WORKERS", "4"))
+CLOUDINARY_UPLOAD_RETRIES = int(os.getenv("CLOUDINARY_UPLOAD_RETRIES", "3"))
+CLOUDINARY_UPLOAD_TIMEOUT_SECS = float(os.getenv("CLOUDINARY_UPLOAD_TIMEOUT_SECS", "120"))
+CLOUDINARY_RETRY_BASE_SECS = float(os.getenv("CLOUDINARY_RETRY_BASE_SECS", "1"))
+
+_configured = False
+_executor = None
+_semaphore = None
+_stats = {
+    "uploads": 0,
+    "failures": 0,
+    "retries": 0,
+    "bytes": 0,
+    "in_flight": 0,
+    "latency_ms": [],  # last 500 successful uploads, including retries
+    "throughput_kbps": [],  # last 500 successful attempts
+}
+
+
+def _configure():
+    """Configure the SDK once per process from the CLOUDINARY_* variables."""
+    global _configured
+
+    if _configured:
+        return
+
+    import cloudinary
+
+    cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
+    api_key = os.getenv("CLOUDINARY_API_KEY")
+    api_secret = os.getenv("CLOUDINARY_API_SECRET")
+
+    if not all([cloud_name, api_key, api_secret]):
+        raise ValueError("Missing required Cloudinary environment variables: CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET")
+
+    cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+    _configured = True
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _semaphore
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CLOUDINARY_UPLOAD_WORKERS, thread_name_prefix="cloudinary-upload")
+    if _semaphore is None:
+        # Also bounds how many uploads hold their audio in memory while waiting for a thread
+        _semaphore = asyncio.Semaphore(CLOUDINARY_UPLOAD_WORKERS)
+    return _executor
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Retry network errors, timeouts, rate limits and 5xx; not bad requests or auth failures."""
+    from cloudinary import exceptions
+
+    return not isinstance(
+        error,
+        (
+            ValueError,
+            exceptions.BadRequest,
+            exceptions.AuthorizationRequired,
+            exceptions.NotAllowed,
+            exceptions.NotFound,
+            exceptions.AlreadyExists,
+        ),
+    )
+
+
+def _upload(source, options: dict) -> dict:
+    import cloudinary.uploader
+
+    return cloudinary.uploader.upload(source, timeout=CLOUDINARY_UPLOAD_TIMEOUT_SECS, **options)
+
+
+async def upload_to_cloudinary(source, size: int, **options) -> str:
+    """Upload a file path or bytes on the upload thread pool and return the secure URL.
+
+    At most CLOUDINARY_UPLOAD_WORKERS uploads run at once; retryable failures
+    are retried CLOUDINARY_UPLOAD_RETRIES times with jittered exponential backoff.
+    """
+    _configure()
+    executor = _get_executor()
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    async with _semaphore:
+        _stats["in_flight"] += 1
+        try:
+            attempt = 0
+            while True:
+                attempt_start = time.perf_counter()
+                try:
+                    result = await loop.run_in_executor(executor, _upload, source, options)
+                    break
+                except Exception as e:
+                    attempt += 1
+                    if attempt > CLOUDINARY_UPLOAD_RETRIES or not _is_retryable(e):
+                        _stats["failures"] += 1
+                        UPLOAD_SECONDS.labels(result="error").observe(time.perf_counter() - start)
+                        raise
+                    delay = CLOUDINARY_RETRY_BASE_SECS * 2 ** (attempt - 1)
+                    delay = random.uniform(delay / 2, delay)
+                    _stats["retries"] += 1
+                    logger.warning(f"⚠️ Cloudinary upload failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+        finally:
+            _stats["in_flight"] -= 1
+
+    elapsed = time.perf_counter() - start
+    attempt_secs = time.perf_counter() - attempt_start
+    _stats["uploads"] += 1
+    _stats["bytes"] += size
+    record_sample(_stats["latency_ms"], elapsed * 1000)
+    UPLOAD_SECONDS.labels(result="ok").observe(elapsed)
+    UPLOAD_BYTES.inc(size)
+    if attempt_secs > 0:
+        record_sample(_stats["throughput_kbps"], size / 1024 / attempt_secs)
+
+    logger.info(f"⏫ Uploaded {size} bytes to Cloudinary in {elapsed:.2f}s ({attempt + 1} attempt(s))")
+    return result.get("secure_url")
+
+
+def get_upload_stats() -> dict:
+    """Upload counters, latency and throughput percentiles for this worker."""
+    latency = _stats["latency_ms"]
+    throughput = _stats["throughput_kbps"]
+    return {
+        "workers": CLOUDINARY_UPLOAD_WORKERS,
+        "in_flight": _stats["in_flight"],
+        "uploads": _stats["uploads"],
+        "failures": _stats["failures"],
+        "retries": _stats["retries"],
+        "bytes": _stats["bytes"],
+        "latency_p50_ms": round(percentile(latency, 50), 1),
+        "latency_p95_ms": round(percentile(latency, 95), 1),
+        "throughput_p50_kbps": round(percentile(throughput, 50), 1),
+        "throughput_min_kbps": round(min(throughput, default=0.0), 1),
+    }
+
+
+def shutdown_uploader():
+    """Wait for running uploads and stop the upload threads."""
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import signal
+import time
+
+from loguru import logger
+
+# Draining is per process: POST /admin/drain reaches only the uvicorn worker
+# that accepted it. To drain the whole node with WEB_CONCURRENCY > 1, send
+# SIGUSR1 (install_signal_handler) to every worker pid.
+
+# How long to wait for live calls to hang up, then for post-call work to flush
+DRAIN_TIMEOUT_SECS = float(os.getenv("DRAIN_TIMEOUT_SECS", "900"))
+DRAIN_FLUSH_TIMEOUT_SECS = float(os.getenv("DRAIN_FLUSH_TIMEOUT_SECS", "120"))
+DRAIN_POLL_SECS = 1.0
+
+# serving -> waiting_for_calls -> flushing -> drained
+_state = {
+    "phase": "serving",
+    "started_at": None,
+    "finished_at": None,
+    "exit_when_done": False,
+    "timed_out": False,
+}
+_flush_hooks = []
+_drain_task = None
+
+
+def is_draining() -> bool:
+    """True once a drain has started; the process no longer takes new calls."""
+    return _state["phase"] != "serving"
+
+
+def register_flush_hook(name: str, hook):
+    """Register an async callable that flushes a write-behind buffer on drain/shutdown."""
+    _flush_hooks.append((name, hook))
+
+
+def start_drain(exit_when_done: bool = False) -> dict:
+    """Stop accepting calls and drain in the background. Safe to call repeatedly."""
+    global _drain_task
+
+    _state["exit_when_done"] = _state["exit_when_done"] or exit_when_done
+    if _drain_task is None:
+        _state["phase"] = "waiting_for_calls"
+        _state["started_at"] = time.time()
+        logger.warning(
+            f"🚰 Drain started (deadline {DRAIN_TIMEOUT_SECS:.0f}s, exit when done: {_state['exit_when_done']})"
+        )
+        _drain_task = asyncio.create_task(_drain())
+    return get_drain_status()
+
+
+async def flush_pending_work(timeout: float = DRAIN_FLUSH_TIMEOUT_SECS) -> bool:
+    """Wait for post-call tasks and flush registered buffers. Returns True if nothing was left behind."""
+    from utils.post_call import pending_background_tasks, wait_for_background_tasks
+
+    pending = pending_background_tasks()
+    if pending:
+        logger.info(f"🚰 Waiting for {pending} post-call task(s)")
+    completed = await wait_for_background_tasks(timeout)
+    if not completed:
+        logger.error(f"❌ {pending_background_tasks()} post-call task(s) still running after {timeout:.0f}s")
+
+    for name, hook in _flush_hooks:
+        try:
+            await asyncio.wait_for(hook(), timeout=timeout)
+            logger.info(f"🚰 Flushed {name}")
+        except Exception as e:
+            completed = False
+            logger.error(f"❌ Failed to flush {name}: {e}")
+
+    return completed
+
+
+async def _drain():
+    from utils.workers import live_call_count
+
+    deadline = _state["started_at"] + DRAIN_TIMEOUT_SECS
+    while live_call_count() > 0 and time.time() < deadline:
+        await asyncio.sleep(DRAIN_POLL_SECS)
+
+    if live_call_count() > 0:
+        _state["timed_out"] = True
+        logger.error(f"❌ Drain deadline reached with {live_call_count()} live call(s)")
+
+    _state["phase"] = "flushing"
+    if not await flush_pending_work():
+        _state["timed_out"] = True
+
+    _state["phase"] = "drained"
+    _state["finished_at"] = time.time()
+    logger.warning(f"🚰 Drain finished in {_state['finished_at'] - _state['started_at']:.1f}s")
+
+    if _state["exit_when_done"]:
+        # Hand over to uvicorn's normal shutdown now that nothing is in flight
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def get_drain_status() -> dict:
+    """Drain progress for this worker."""
+    from utils.post_call import pending_background_tasks
+    from utils.workers import WORKER_ID, live_call_count
+
+    started_at = _state["started_at"]
+    end = _state["finished_at"] or time.time()
+    return {
+        "worker_id": WORKER_ID,
+        "phase": _state["phase"],
+        "draining": is_draining(),
+        "elapsed_secs": round(end - started_at, 1) if started_at else 0.0,
+        "deadline_secs": DRAIN_TIMEOUT_SECS,
+        "live_calls": live_call_count(),
+        "pending_post_call_tasks": pending_background_tasks(),
+        "timed_out": _state["timed_out"],
+        "exit_when_done": _state["exit_when_done"],
+    }
+
+
+def install_signal_handler(signum: int = signal.SIGUSR1):
+    """Drain, then exit, when this worker receives `signum` (SIGUSR1 by default)."""
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signum, lambda: start_drain(exit_when_done=True))
+    logger.info(f"🚰 Send {signal.Signals(signum).name} to pid {os.getpid()} to drain this worker")
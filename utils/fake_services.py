@@ -0,0 +1,326 @@
+"""
+Local stand-in STT, LLM and TTS services for offline, deterministic benchmarks.
+
+Select them like any other provider:
+    STTProvider.FAKE / TTSProvider.FAKE   (profile from FAKE_STT_PROFILE / FAKE_TTS_PROFILE)
+    llm_provider="fake/<profile>"         (e.g. "fake/realistic")
+
+Each service replays a canned conversation parsed from transcripts.txt: the STT
+returns the user's lines in order, the LLM answers with the assistant's lines.
+Timing comes from a latency profile (TTFB distribution, jitter, throughput),
+seeded so repeated runs produce the same delays.
+"""
+
+import asyncio
+import math
+import os
+import random
+import re
+import time
+from itertools import count
+from typing import AsyncGenerator, List, Optional
+
+from loguru import logger
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+from openai.types.completion_usage import CompletionUsage
+from pipecat.frames.frames import (
+    Frame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.services.openai.llm import OpenAILLMService
+from pipecat.services.stt_service import SegmentedSTTService
+from pipecat.services.tts_service import TTSService
+from pipecat.utils.time import time_now_iso8601
+
+TRANSCRIPTS_PATH = os.getenv("FAKE_TRANSCRIPTS_PATH", "transcripts.txt")
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+
+# An assistant line matching this starts a new conversation in transcripts.txt
+CONVERSATION_OPENER = re.compile(r"Toothsi की तरफ से|from Toothsi")
+
+
+class LatencyProfile:
+    """Timing model for a fake service.
+
+    Args:
+        ttfb_ms: Mean time to first byte/token/transcript.
+        jitter_ms: Spread of the TTFB distribution.
+        distribution: "normal" (gaussian around the mean) or "lognormal"
+            (long right tail, closer to real network services).
+        throughput: LLM tokens per second, or TTS audio seconds produced per
+            wall-clock second (realtime factor).
+    """
+
+    def __init__(self, ttfb_ms: float, jitter_ms: float = 0.0, distribution: str = "normal", throughput: float = 50.0):
+        self.ttfb_ms = ttfb_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.throughput = throughput
+
+    def sample_ttfb(self, rng: random.Random) -> float:
+        """Draw one TTFB in seconds."""
+        if self.jitter_ms <= 0:
+            return self.ttfb_ms / 1000
+        if self.distribution == "lognormal":
+            sigma = math.sqrt(math.log(1 + (self.jitter_ms / self.ttfb_ms) ** 2))
+            mu = math.log(self.ttfb_ms) - sigma**2 / 2
+            return rng.lognormvariate(mu, sigma) / 1000
+        return max(0.0, rng.gauss(self.ttfb_ms, self.jitter_ms)) / 1000
+
+
+LATENCY_PROFILES = {
+    "stt": {
+        "instant": LatencyProfile(0),
+        "fast": LatencyProfile(80, 20),
+        "realistic": LatencyProfile(250, 80, "lognormal"),
+        "slow": LatencyProfile(700, 300, "lognormal"),
+    },
+    "llm": {
+        "instant": LatencyProfile(0, throughput=10_000),
+        "fast": LatencyProfile(150, 40, throughput=150),
+        "realistic": LatencyProfile(450, 150, "lognormal", throughput=60),
+        "slow": LatencyProfile(1200, 500, "lognormal", throughput=25),
+    },
+    "tts": {
+        "instant": LatencyProfile(0, throughput=1_000),
+        "fast": LatencyProfile(100, 30, throughput=8),
+        "realistic": LatencyProfile(300, 100, "lognormal", throughput=3),
+        "slow": LatencyProfile(800, 300, "lognormal", throughput=1.2),
+    },
+}
+
+
+def get_latency_profile(kind: str, name: Optional[str] = None) -> LatencyProfile:
+    """Look up a latency profile, defaulting to "realistic"."""
+    profiles = LATENCY_PROFILES[kind]
+    name = (name or "realistic").lower()
+    if name not in profiles:
+        logger.warning(f"Unknown fake {kind} profile '{name}', using 'realistic'")
+        name = "realistic"
+    return profiles[name]
+
+
+def _load_jsonl_conversations(path: str) -> List[List[dict]]:
+    """Group TranscriptSink JSONL lines by call_sid.
+
+    path is one file or a directory; a directory is read across every worker's
+    files, since one call's turns all land in the file of the worker serving it.
+    """
+    import glob
+    import json
+
+    paths = sorted(glob.glob(os.path.join(path, "*.jsonl"))) if os.path.isdir(path) else [path]
+    calls = {}
+    for file_path in paths:
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # partially written last line
+                calls.setdefault(record["call_sid"], []).append(record)
+
+    return [
+        [{"role": r["role"], "content": r["content"]} for r in sorted(records, key=lambda r: r["turn"])]
+        for records in calls.values()
+    ]
+
+
+def load_conversations(path: str = TRANSCRIPTS_PATH) -> List[List[dict]]:
+    """Split a transcripts.txt-style file into conversations.
+
+    Lines look like "role: content"; lines without a role prefix continue the
+    previous message. A new conversation starts at an assistant opener that
+    follows another assistant line; an opener right after a user line is the
+    bot greeting again within the same call.
+
+    A .jsonl file or a directory (e.g. transcripts/ written by TranscriptSink)
+    is read as JSONL instead, one conversation per call_sid.
+    """
+    if path.endswith(".jsonl") or os.path.isdir(path):
+        conversations = _load_jsonl_conversations(path)
+        return [c for c in conversations if any(m["role"] == "user" for m in c)]
+
+    conversations = []
+    current = []
+    try:
+        # The file has a few mangled bytes from copy-pasting call logs
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        logger.warning(f"Transcript file {path} not found")
+        return []
+
+    for line in lines:
+        role, sep, content = line.partition(": ")
+        if sep and role in ("user", "assistant"):
+            is_opener = role == "assistant" and CONVERSATION_OPENER.search(content)
+            if is_opener and current and current[-1]["role"] == "assistant":
+                conversations.append(current)
+                current = []
+            current.append({"role": role, "content": content.strip()})
+        elif current and line.strip():
+            current[-1]["content"] += "\n" + line.strip()
+
+    if current:
+        conversations.append(current)
+
+    # Only conversations where the user actually said something are useful
+    return [c for c in conversations if any(m["role"] == "user" for m in c)]
+
+
+_conversations = None
+_conversation_counters = {"stt": count(), "llm": count()}
+
+
+def _next_conversation(kind: str) -> List[dict]:
+    """The k-th STT and the k-th LLM instance get the same conversation."""
+    global _conversations
+
+    if _conversations is None:
+        _conversations = load_conversations()
+    if not _conversations:
+        return [{"role": "user", "content": "Hello."}, {"role": "assistant", "content": "Hello! How can I help you today?"}]
+
+    index = os.getenv("FAKE_CONVERSATION_INDEX")
+    if index is not None:
+        return _conversations[int(index) % len(_conversations)]
+    return _conversations[next(_conversation_counters[kind]) % len(_conversations)]
+
+
+class FakeSTTService(SegmentedSTTService):
+    """Returns the next user line of a canned conversation for every VAD segment."""
+
+    def __init__(self, *, profile: Optional[LatencyProfile] = None, conversation: Optional[List[dict]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._profile = profile or get_latency_profile("stt")
+        conversation = conversation or _next_conversation("stt")
+        self._user_turns = [m["content"] for m in conversation if m["role"] == "user"]
+        self._turn = 0
+        self._rng = random.Random(FAKE_SEED)
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        await self.start_processing_metrics()
+        await self.start_ttfb_metrics()
+
+        await asyncio.sleep(self._profile.sample_ttfb(self._rng))
+
+        text = self._user_turns[self._turn % len(self._user_turns)]
+        self._turn += 1
+
+        await self.stop_ttfb_metrics()
+        await self.stop_processing_metrics()
+        yield TranscriptionFrame(text, self._user_id, time_now_iso8601())
+
+
+class FakeLLMService(OpenAILLMService):
+    """OpenAI-compatible LLM that streams canned assistant replies.
+
+    Only the network call is replaced, so context aggregation, TTFB and token
+    usage metrics go through the real OpenAI service code path.
+    """
+
+    def __init__(self, *, profile: Optional[LatencyProfile] = None, conversation: Optional[List[dict]] = None, **kwargs):
+        super().__init__(model="fake", api_key="fake", **kwargs)
+        self._profile = profile or get_latency_profile("llm")
+        self._replies = self._group_replies(conversation or _next_conversation("llm"))
+        self._calls = 0
+        self._rng = random.Random(FAKE_SEED + 1)
+
+    @staticmethod
+    def _group_replies(conversation: List[dict]) -> List[str]:
+        """replies[k] is what the assistant said after the k-th user turn (0 = greeting)."""
+        replies = [""]
+        for message in conversation:
+            if message["role"] == "user":
+                replies.append("")
+            else:
+                replies[-1] = (replies[-1] + " " + message["content"]).strip()
+        return [reply or "Okay." for reply in replies]
+
+    def _chunk(self, content: Optional[str] = None, usage: Optional[CompletionUsage] = None) -> ChatCompletionChunk:
+        choices = [] if content is None else [Choice(index=0, delta=ChoiceDelta(content=content))]
+        return ChatCompletionChunk(
+            id="fake",
+            object="chat.completion.chunk",
+            created=int(time.time()),
+            model="fake",
+            choices=choices,
+            usage=usage,
+        )
+
+    async def get_chat_completions(self, *args, **kwargs):
+        # Newer pipecat passes invocation params (a dict with "messages"),
+        # older versions pass (context, messages).
+        params = args[-1] if args else kwargs.get("params_from_context", {})
+        messages = params.get("messages", []) if isinstance(params, dict) else list(params)
+
+        reply = self._replies[min(self._calls, len(self._replies) - 1)]
+        self._calls += 1
+
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        return self._stream(reply, max(1, prompt_chars // 4))
+
+    async def _stream(self, reply: str, prompt_tokens: int):
+        await asyncio.sleep(self._profile.sample_ttfb(self._rng))
+
+        tokens = re.findall(r"\S+\s*", reply)
+        delay = 1.0 / self._profile.throughput
+        for token in tokens:
+            yield self._chunk(content=token)
+            await asyncio.sleep(delay)
+
+        completion_tokens = len(tokens)
+        yield self._chunk(
+            usage=CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            )
+        )
+
+
+class FakeTTSService(TTSService):
+    """Synthesizes a speech-level tone as long as the text would take to say."""
+
+    CHARS_PER_SECOND = 15
+    CHUNK_SECS = 0.1
+
+    def __init__(self, *, profile: Optional[LatencyProfile] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._profile = profile or get_latency_profile("tts")
+        self._rng = random.Random(FAKE_SEED + 2)
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    def _tone_chunk(self, offset: int, samples: int) -> bytes:
+        rate = self.sample_rate
+        return b"".join(
+            int(3000 * math.sin(2 * math.pi * 220 * (offset + i) / rate)).to_bytes(2, "little", signed=True)
+            for i in range(samples)
+        )
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        await self.start_ttfb_metrics()
+        await asyncio.sleep(self._profile.sample_ttfb(self._rng))
+        await self.start_tts_usage_metrics(text)
+
+        yield TTSStartedFrame()
+
+        duration = max(self.CHUNK_SECS, len(text) / self.CHARS_PER_SECOND)
+        chunk_samples = int(self.sample_rate * self.CHUNK_SECS)
+        chunks = math.ceil(duration / self.CHUNK_SECS)
+        for n in range(chunks):
+            await self.stop_ttfb_metrics()
+            yield TTSAudioRawFrame(self._tone_chunk(n * chunk_samples, chunk_samples), self.sample_rate, 1)
+            await asyncio.sleep(self.CHUNK_SECS / self._profile.throughput)
+
+        yield TTSStoppedFrame()
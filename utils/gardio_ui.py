@@ -1143,8 +1143,7 @@ def create_prompt_ui():
         // Latest calls management
         let latestCalls = [];
         let currentCall = null;
-        let pollingInterval = null;
-        let callCompletedTime = null;
+        let callEvents = null;  // EventSource for the current call
         
         async function loadLatestCalls() {
             try {
@@ -1179,11 +1178,7 @@ def create_prompt_ui():
         
         function clearCurrentCall() {
             currentCall = null;
-            callCompletedTime = null;
-            if (pollingInterval) {
-                clearInterval(pollingInterval);
-                pollingInterval = null;
-            }
+            closeCallEvents();
             // Refresh latest calls
             loadLatestCalls();
         }
@@ -1238,55 +1233,49 @@ def create_prompt_ui():
             container.innerHTML = html;
         }
         
-        async function pollCallStatus(callSid) {
-            try {
-                const response = await fetch(`/api/call-details/${callSid}`);
-                if (response.ok) {
-                    const callData = await response.json();
-                    updateCurrentCall(callData);
-                    
-                    console.log(`Polling call ${callSid}, status: ${callData.status}`);
-                    
-                    // Check if call just completed
-                    if (['completed', 'failed', 'busy', 'no-answer', 'canceled'].includes(callData.status)) {
-                        if (!callCompletedTime) {
-                            callCompletedTime = Date.now();
-                            console.log('Call completed, continuing to poll for 1 minute for recording generation...');
-                        }
-                        
-                        // Stop polling after 1 minute (60 seconds) from completion
-                        const timeSinceCompletion = Date.now() - callCompletedTime;
-                        const remainingTime = Math.max(0, 60000 - timeSinceCompletion);
-                        console.log(`Time since completion: ${Math.round(timeSinceCompletion/1000)}s, remaining: ${Math.round(remainingTime/1000)}s`);
-                        
-                        if (timeSinceCompletion >= 60000) { // 60 seconds = 60000ms
-                            if (pollingInterval) {
-                                clearInterval(pollingInterval);
-                                pollingInterval = null;
-                                console.log('Stopped polling after 1 minute post-completion');
-                            }
-                        }
-                    }
-                }
-            } catch (error) {
-                console.error('Error polling call status:', error);
+        function closeCallEvents() {
+            if (callEvents) {
+                callEvents.close();
+                callEvents = null;
             }
         }
         
-        function startPolling(callSid) {
-            // Clear any existing polling
-            if (pollingInterval) {
-                clearInterval(pollingInterval);
-            }
+        function subscribeToCall(callSid) {
+            // One stream per page; the server pushes status, transcript turns and metrics
+            closeCallEvents();
+            callEvents = new EventSource(`/api/calls/${callSid}/events`);
             
-            // Reset completion time for new call
-            callCompletedTime = null;
+            const onUpdate = (event) => {
+                const data = JSON.parse(event.data);
+                updateCurrentCall(data);
+                console.log(`Call ${callSid} ${event.type}:`, data.status || '');
+            };
+            callEvents.addEventListener('snapshot', onUpdate);
+            callEvents.addEventListener('status', onUpdate);
+            callEvents.addEventListener('update', onUpdate);
+            callEvents.addEventListener('metrics', onUpdate);
+            
+            callEvents.addEventListener('turn', (event) => {
+                const turn = JSON.parse(event.data);
+                if (currentCall && currentCall.call_sid === callSid) {
+                    // New lines only; the latest calls list is refreshed on status changes
+                    const line = `${turn.role}: ${turn.content}`;
+                    currentCall.transcript = currentCall.transcript ? `${currentCall.transcript}\\n${line}` : line;
+                }
+            });
+            
+            callEvents.addEventListener('resync', () => subscribeToCall(callSid));
             
-            // Poll immediately
-            pollCallStatus(callSid);
+            callEvents.addEventListener('end', (event) => {
+                updateCurrentCall(JSON.parse(event.data));
+                closeCallEvents();
+                console.log(`Call ${callSid} finished, closed event stream`);
+            });
             
-            // Then poll every 3 seconds
-            pollingInterval = setInterval(() => pollCallStatus(callSid), 3000);
+            callEvents.onerror = () => {
+                // EventSource reconnects on its own and resumes from the last event id
+                console.warn(`Event stream for ${callSid} interrupted, reconnecting...`);
+            };
         }
         
         // Call form functionality
@@ -1304,7 +1293,7 @@ def create_prompt_ui():
                     const result = await response.json();
                     showMessage(`Call initiated successfully! Call SID: ${result.call_sid}`, 'success');
                     
-                    // Set current call and start polling
+                    // Set current call and subscribe to its events
                     const callInfo = {
                         call_sid: result.call_sid,
                         phone_number: callData.phone_number,
@@ -1321,7 +1310,7 @@ def create_prompt_ui():
                     
                     setCurrentCall(callInfo);
                     
-                    startPolling(result.call_sid);
+                    subscribeToCall(result.call_sid);
                     
                     // Disable the button temporarily
                     document.getElementById('callBtn').disabled = true;
@@ -1395,6 +1384,12 @@ def create_prompt_ui():
             }
         }
         
+        // "p50 · p99 · turns" line under a TTFB value, for calls that kept every turn's TTFB
+        function ttfbSpread(stats) {
+            if (!stats || !stats.count) return '';
+            return `<div style="font-size: 12px; color: #a0a0a0; margin-top: 4px;">p50 ${stats.p50_ms.toFixed(0)}ms · p99 ${stats.p99_ms.toFixed(0)}ms · ${stats.count} turns</div>`;
+        }
+        
         function showCallDetailsDialog(callData) {
             const dialog = document.getElementById('callDetailsDialog');
             const dialogBody = document.getElementById('dialogBody');
@@ -1456,14 +1451,17 @@ def create_prompt_ui():
                                 <div class="call-detail">
                                     <div class="call-detail-label">TTS TTFB</div>
                                     <div class="call-detail-value">${callData.metrics.tts_ttfb_ms ? callData.metrics.tts_ttfb_ms.toFixed(2) + 'ms' : 'N/A'}</div>
+                                    ${ttfbSpread(callData.metrics.tts_ttfb_stats)}
                                 </div>
                                 <div class="call-detail">
                                     <div class="call-detail-label">STT TTFB</div>
                                     <div class="call-detail-value">${callData.metrics.stt_ttfb_ms ? callData.metrics.stt_ttfb_ms.toFixed(2) + 'ms' : 'N/A'}</div>
+                                    ${ttfbSpread(callData.metrics.stt_ttfb_stats)}
                                 </div>
                                 <div class="call-detail">
                                     <div class="call-detail-label">LLM TTFB</div>
                                     <div class="call-detail-value">${callData.metrics.llm_ttfb_ms ? callData.metrics.llm_ttfb_ms.toFixed(2) + 'ms' : 'N/A'}</div>
+                                    ${ttfbSpread(callData.metrics.llm_ttfb_stats)}
                                 </div>
                                 <div class="call-detail">
                                     <div class="call-detail-label">Total Latency</div>
@@ -1551,13 +1549,10 @@ def create_prompt_ui():
             }
         });
         
-        // Force stop polling function for testing
+        // Force close the event stream, for testing
         function forceStopPolling() {
-            if (pollingInterval) {
-                clearInterval(pollingInterval);
-                pollingInterval = null;
-                console.log('Force stopped polling');
-            }
+            closeCallEvents();
+            console.log('Force closed call event stream');
         }
         
         // Make it available globally for testing
@@ -1589,12 +1584,8 @@ def create_prompt_ui():
         // Make copy function available globally
         window.copyTranscript = copyTranscript;
         
-        // Cleanup polling interval on page unload
-        window.addEventListener('beforeunload', () => {
-            if (pollingInterval) {
-                clearInterval(pollingInterval);
-            }
-        });
+        // Close the event stream on page unload
+        window.addEventListener('beforeunload', closeCallEvents);
         
         // Bot type dropdown event listener
         document.getElementById('botType').addEventListener('change', onBotTypeChange);
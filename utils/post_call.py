@@ -2,24 +2,61 @@ import asyncio
 import os
 import glob
 import json
+import time
 from loguru import logger
 from model.model import Call, CallStatus
 from utils.call_audio import upload_recording
-import aiohttp
+from utils.recording_codec import encode_recording
+from utils.recording_trim import trim_recording
+from utils.telemetry import POST_CALL_STAGE_SECONDS
+
+# Include the full transcript in the completion webhook; receivers that only
+# need status and recording can turn this off and read turns from the API
+WEBHOOK_INCLUDE_TRANSCRIPT = os.getenv("WEBHOOK_INCLUDE_TRANSCRIPT", "true").lower() == "true"
+
+# Post-call tasks still running, so shutdown/drain can wait for them
+_background_tasks = set()
+
+
+def spawn_background(coro) -> asyncio.Task:
+    """Schedule post-call work on the loop and keep a handle on it until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def pending_background_tasks() -> int:
+    """Number of post-call tasks that have not finished yet."""
+    return len(_background_tasks)
+
+
+async def wait_for_background_tasks(timeout: float) -> bool:
+    """Wait up to `timeout` seconds for post-call tasks. Returns True if all finished."""
+    if not _background_tasks:
+        return True
+    _, pending = await asyncio.wait(set(_background_tasks), timeout=timeout)
+    return not pending
 
 
 async def process_call_completion_background(
     call_sid: str, 
     transcript: str, 
     call_cost: float,
-    status: str = "completed"
+    status: str = "completed",
+    recording_url: str = None,
+    recording_path: str = None,
 ):
     """
     Background task to handle post-call processing including:
-    - Uploading audio recording to Cloudinary
+    - Uploading audio recording to Cloudinary (skipped when recording_url is
+      given, i.e. the recording was streamed to the store during the call).
+      recording_path is the finished file; without it the latest file for
+      the call is used.
     - Saving transcript to database
     - Updating call status and cost
     """
+    start = time.perf_counter()
     try:
         # Ensure all parameters are the correct type
         call_sid = str(call_sid)
@@ -47,18 +84,22 @@ async def process_call_completion_background(
             logger.info(f"📝 Updated transcript (length: {len(transcript)} chars)")
         
       
-        # Find and upload recording file
-        server_name = f"server_{call_sid}"
-        recordings_dir = "recordings"
+        if not recording_url and not recording_path:
+            # Find the most recent recording file for this call
+            recording_files = glob.glob(f"recordings/server_{call_sid}_*.wav")
+            if recording_files:
+                recording_path = max(recording_files, key=os.path.getctime)
         
-        # Find the most recent recording file for this call
-        pattern = f"{recordings_dir}/{server_name}_*.wav"
-        recording_files = glob.glob(pattern)
-        
-        if recording_files:
-            # Get the most recent file
-            latest_file = max(recording_files, key=os.path.getctime)
+        if recording_url:
+            call.recording_url = recording_url
+            logger.info(f"✅ Recording already uploaded: {recording_url}")
+        elif recording_path and os.path.exists(recording_path):
+            latest_file = recording_path
             try:
+                # Drop leading/trailing silence (and long gaps per RECORDING_MAX_GAP_SECS)
+                latest_file = await trim_recording(latest_file)
+                # Compress per RECORDING_CODEC (no-op for wav) in the encoder process pool
+                latest_file = await encode_recording(latest_file)
                 logger.info(f"📤 Uploading recording: {latest_file}")
                 # Upload to Cloudinary
                 upload_url = await upload_recording(call_sid, latest_file)
@@ -85,7 +126,9 @@ async def process_call_completion_background(
         
         # Send webhook to update the call status
         await call_completion_webhook(call_sid, status)
+        POST_CALL_STAGE_SECONDS.labels(stage="in_process", result="ok").observe(time.perf_counter() - start)
     except Exception as e:
+        POST_CALL_STAGE_SECONDS.labels(stage="in_process", result="error").observe(time.perf_counter() - start)
         logger.error(f"❌ Error in background processing for call {call_sid}: {e}")
 
 
@@ -98,57 +141,66 @@ async def call_completion_webhook(call_sid: str, status: str):
         call_sid: The Twilio call SID
         status: The call status to send in the webhook
     """
+    from utils.webhooks import WebhookDeliveryFailed
+
     try:
-        # Get webhook URL from environment variables
-        webhook_url = os.getenv("CALL_COMPLETION_WEBHOOK_URL")
-        logger.info(f"Call completion webhook URL 🟢🟢🟢: {webhook_url}")
-        if not webhook_url:
-            logger.warning("CALL_COMPLETION_WEBHOOK_URL not set in environment variables")
-            return
-        
-        # Fetch call data from database
-        call = await Call.find_one({"call_sid": call_sid})
-        if not call:
-            logger.error(f"Call record not found for SID: {call_sid}")
-            return
-        
-        # Prepare webhook payload
-        webhook_payload = {
-            "call_sid": call_sid,
-            "status": status,
-            "phone_number": call.phone_number,
-            "name": call.name,
-            "transcript": call.transcript or "",
-            "recording_url": call.recording_url or "",
-            "call_cost": call.call_cost or 0.0,
-            "call_duration": call.call_duration or 0,  # Call duration in seconds
-            "metrics": call.metrics.model_dump() if call.metrics else None,  # Include metrics data
-            "created_at": call.created_at.isoformat() if call.created_at else None,
-            "updated_at": call.updated_at.isoformat() if call.updated_at else None
-        }
-        
-        logger.info(f"📤 Sending webhook for call {call_sid} to {webhook_url}")
-        
-        # Make POST request to webhook URL
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                webhook_url,
-                json=webhook_payload,
-                headers={"Content-Type": "application/json"},
-                timeout=aiohttp.ClientTimeout(total=30)  # 30 second timeout
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"✅ Webhook sent successfully for call {call_sid}")
-                else:
-                    response_text = await response.text()
-                    logger.error(f"❌ Webhook failed for call {call_sid}. Status: {response.status}, Response: {response_text}")
-                    
-    except aiohttp.ClientError as e:
-        logger.error(f"❌ HTTP error sending webhook for call {call_sid}: {e}")
+        await send_call_completion_webhook(call_sid, status)
+    except WebhookDeliveryFailed as e:
+        logger.error(f"❌ Webhook for call {call_sid} dead-lettered: {e}")
     except Exception as e:
         logger.error(f"❌ Error sending webhook for call {call_sid}: {e}")
 
 
+async def build_call_completion_payload(call_sid: str, status: str):
+    """The completion webhook body for a call, or None if the call does not exist."""
+    fields = ["phone_number", "name", "recording_url", "call_cost", "call_duration", "metrics", "created_at", "updated_at"]
+    if WEBHOOK_INCLUDE_TRANSCRIPT:
+        fields.append("transcript")
+    call = await Call.get_pymongo_collection().find_one(
+        {"call_sid": call_sid}, {"_id": 0, **{field: 1 for field in fields}}
+    )
+    if not call:
+        return None
+
+    payload = {
+        "call_sid": call_sid,
+        "status": status,
+        "phone_number": call.get("phone_number"),
+        "name": call.get("name"),
+        "recording_url": call.get("recording_url") or "",
+        "call_cost": call.get("call_cost") or 0.0,
+        "call_duration": call.get("call_duration") or 0,  # Call duration in seconds
+        "metrics": call.get("metrics"),
+        "created_at": call["created_at"].isoformat() if call.get("created_at") else None,
+        "updated_at": call["updated_at"].isoformat() if call.get("updated_at") else None,
+    }
+    if WEBHOOK_INCLUDE_TRANSCRIPT:
+        payload["transcript"] = call.get("transcript") or ""
+    return payload
+
+
+async def send_call_completion_webhook(call_sid: str, status: str):
+    """
+    Deliver the call completion webhook through the shared webhook dispatcher.
+    Raises WebhookDeliveryFailed once delivery has given up (the payload is then
+    in the webhook dead letters). Does nothing if CALL_COMPLETION_WEBHOOK_URL is not set.
+    """
+    from utils.webhooks import webhook_dispatcher
+
+    if not webhook_dispatcher.url:
+        logger.warning("CALL_COMPLETION_WEBHOOK_URL not set in environment variables")
+        return
+
+    payload = await build_call_completion_payload(call_sid, status)
+    if payload is None:
+        logger.error(f"Call record not found for SID: {call_sid}")
+        return
+
+    logger.info(f"📤 Sending webhook for call {call_sid}")
+    await webhook_dispatcher.deliver(payload)
+    logger.info(f"✅ Webhook sent successfully for call {call_sid}")
+
+
 def start_background_task(call_sid: str, transcript: str, call_cost: float, status: str = "completed"):
     """
     Start background task for post-call processing.
@@ -159,7 +211,7 @@ def start_background_task(call_sid: str, transcript: str, call_cost: float, stat
         loop = asyncio.get_event_loop()
         if loop.is_running():
             # If we're in an async context, create a task
-            asyncio.create_task(process_call_completion_background(call_sid, transcript, call_cost, status))
+            spawn_background(process_call_completion_background(call_sid, transcript, call_cost, status))
         else:
             # If we're not in an async context, run in a new event loop
             asyncio.run(process_call_completion_background(call_sid, transcript, call_cost, status))
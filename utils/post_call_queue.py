@@ -0,0 +1,479 @@
+import asyncio
+import glob
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+from loguru import logger
+
+from utils.stats import percentile, record_sample
+from utils.telemetry import POST_CALL_QUEUE_JOBS, POST_CALL_STAGE_SECONDS, registry
+
+# Durable post-call processing. Each finished call becomes a PostCallJob in
+# Mongo that moves through upload -> db_update -> webhook. Workers claim jobs
+# with an atomic find-and-update and hold a lease; a job whose worker died is
+# picked up again once the lease expires, at the stage it had reached.
+POSTCALL_WORKERS = int(os.getenv("POSTCALL_WORKERS", "4"))
+POSTCALL_MAX_ATTEMPTS = int(os.getenv("POSTCALL_MAX_ATTEMPTS", "8"))
+POSTCALL_BACKOFF_BASE_SECS = float(os.getenv("POSTCALL_BACKOFF_BASE_SECS", "2"))
+POSTCALL_BACKOFF_MAX_SECS = float(os.getenv("POSTCALL_BACKOFF_MAX_SECS", "300"))
+POSTCALL_LEASE_SECS = float(os.getenv("POSTCALL_LEASE_SECS", "600"))
+POSTCALL_POLL_SECS = float(os.getenv("POSTCALL_POLL_SECS", "2"))
+# Recordings untouched for this long with no job are treated as orphaned at startup
+POSTCALL_ORPHAN_MIN_AGE_SECS = float(os.getenv("POSTCALL_ORPHAN_MIN_AGE_SECS", "120"))
+# Where the workers run:
+#   process  - a child process per web worker (utils.post_call_worker), woken on
+#              every enqueue, so uploads, trimming and webhooks stay off the
+#              event loop serving live media WebSockets
+#   inline   - tasks on the web worker's own loop; they hold off claiming jobs
+#              while live calls see loop lag above POSTCALL_MAX_LOOP_LAG_MS
+#              (for at most POSTCALL_MAX_HOLD_SECS at a time)
+#   external - none here; run `python -m utils.post_call_worker` as its own service
+POSTCALL_MODE = os.getenv("POSTCALL_MODE", "process").lower()
+POSTCALL_MAX_LOOP_LAG_MS = float(os.getenv("POSTCALL_MAX_LOOP_LAG_MS", "20"))
+# Longest an inline worker holds off; then it takes a job anyway, so a node
+# with steady lag still drains at least one job per worker per this interval
+POSTCALL_MAX_HOLD_SECS = float(os.getenv("POSTCALL_MAX_HOLD_SECS", "30"))
+
+STAGES = ["upload", "db_update", "webhook"]
+RECORDING_FILE = re.compile(r"server_(?P<call_sid>.+)_\d{8}_\d{6}\.(wav|flac|ogg|mp3)$")
+
+_workers = []
+_wakeup = asyncio.Event()
+_busy = 0
+_stopping = False
+_stats = {
+    "completed": 0,
+    "failed": 0,
+    "retries": 0,
+    "queue_latency_ms": [],  # enqueue -> done, last 500 jobs
+    "stage_ms": {stage: [] for stage in STAGES},  # last 500 runs per stage
+}
+
+
+async def enqueue_post_call(
+    call_sid: str,
+    transcript: str = "",
+    call_cost: float = 0.0,
+    status: str = "completed",
+    recording_url: str = None,
+    recording_path: str = None,
+    turn_count: int = None,
+):
+    """Persist post-call work for a finished call and wake the workers."""
+    from pymongo.errors import DuplicateKeyError
+
+    from model.model import PostCallJob
+
+    job = PostCallJob(
+        call_sid=str(call_sid),
+        transcript=str(transcript) if transcript else None,
+        turn_count=turn_count,
+        call_cost=float(call_cost) if call_cost else None,
+        call_status=status,
+        recording_url=recording_url,
+        recording_path=recording_path,
+        # Nothing to upload if the recording was streamed during the call
+        stage="db_update" if recording_url else "upload",
+    )
+    try:
+        await job.insert()
+    except DuplicateKeyError:
+        # The orphan sweep queued this recording first; give its job the call outcome
+        await PostCallJob.get_pymongo_collection().update_one(
+            {"call_sid": job.call_sid, "recording_path": recording_path},
+            {
+                "$set": {
+                    "transcript": job.transcript,
+                    "turn_count": turn_count,
+                    "call_cost": job.call_cost,
+                    "call_status": status,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+        job = await PostCallJob.find_one({"call_sid": job.call_sid, "recording_path": recording_path})
+    _wakeup.set()
+    if POSTCALL_MODE == "process":
+        from utils.post_call_worker import notify_worker_process
+
+        notify_worker_process()
+    logger.info(f"📥 Queued post-call job for {call_sid} (stage {job.stage})")
+    return job
+
+
+async def _claim():
+    """Atomically take the next due job (or one whose lease expired)."""
+    from pymongo import ReturnDocument
+
+    from model.model import PostCallJob
+    from utils.workers import WORKER_ID
+
+    now = datetime.utcnow()
+    raw = await PostCallJob.get_pymongo_collection().find_one_and_update(
+        {
+            "$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": WORKER_ID,
+                "lease_until": now + timedelta(seconds=POSTCALL_LEASE_SECS),
+                "updated_at": now,
+            }
+        },
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+    return await PostCallJob.get(raw["_id"]) if raw else None
+
+
+async def _stage_upload(job):
+    from utils.call_audio import upload_recording
+    from utils.recording_codec import encode_recording
+    from utils.recording_trim import trim_recording
+
+    path = job.recording_path
+    if not path or not os.path.exists(path):
+        pattern = f"recordings/server_{job.call_sid}_*.wav"
+        files = glob.glob(pattern)
+        path = max(files, key=os.path.getctime) if files else None
+    if not path:
+        logger.warning(f"No recording file found for call {job.call_sid}")
+        return
+
+    # Trimming rewrites the WAV in place, so a retry after a crash just trims it again
+    await trim_recording(path)
+
+    # Record the encoded path first so a retry does not look for the WAV again
+    encoded = await encode_recording(path)
+    if encoded != job.recording_path:
+        job.recording_path = encoded
+        await job.save()
+
+    job.recording_url = await upload_recording(job.call_sid, encoded)
+    logger.info(f"✅ Recording uploaded to Cloudinary: {job.recording_url}")
+    try:
+        os.remove(encoded)
+    except OSError as e:
+        logger.warning(f"Failed to clean up local file: {e}")
+
+
+async def _stage_db_update(job):
+    from model.model import Call, CallTurn, get_call_transcript
+
+    fields = {"updated_at": datetime.utcnow()}
+    if job.call_status:
+        fields["status"] = job.call_status
+    if job.call_cost:
+        fields["call_cost"] = round(job.call_cost, 2)
+    # Prefer the turns persisted to call_turns once they are all there; the job
+    # carries its own copy only if some were still unwritten at hangup
+    transcript = job.transcript
+    stored = await CallTurn.get_pymongo_collection().count_documents({"call_sid": job.call_sid})
+    if stored and (not transcript or stored >= (job.turn_count or 0)):
+        transcript = await get_call_transcript(job.call_sid)
+    if transcript:
+        fields["transcript"] = transcript
+    if job.recording_url:
+        fields["recording_url"] = job.recording_url
+
+    # $set of just these fields; no need to read and rewrite the whole Call
+    result = await Call.get_pymongo_collection().update_one({"call_sid": job.call_sid}, {"$set": fields})
+    if not result.matched_count:
+        logger.error(f"Call record not found for SID: {job.call_sid}")
+        return
+
+    from utils.call_events import publish
+
+    publish(job.call_sid, "update", {key: value for key, value in fields.items() if key != "transcript"})
+
+
+async def _stage_webhook(job):
+    from utils.post_call import send_call_completion_webhook
+    from utils.webhooks import WebhookDeliveryFailed
+
+    if job.call_status:
+        try:
+            await send_call_completion_webhook(job.call_sid, job.call_status)
+        except WebhookDeliveryFailed as e:
+            # Already retried by the dispatcher and kept as a dead letter for replay
+            logger.error(f"❌ Webhook for call {job.call_sid} dead-lettered: {e}")
+
+
+_STAGE_HANDLERS = {
+    "upload": _stage_upload,
+    "db_update": _stage_db_update,
+    "webhook": _stage_webhook,
+}
+
+
+def _backoff_secs(attempts: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(POSTCALL_BACKOFF_MAX_SECS, POSTCALL_BACKOFF_BASE_SECS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+async def _process(job):
+    """Run the job's remaining stages, saving progress after each one."""
+    while job.stage in _STAGE_HANDLERS:
+        stage = job.stage
+        start = time.perf_counter()
+        try:
+            await _STAGE_HANDLERS[stage](job)
+        except Exception as e:
+            POST_CALL_STAGE_SECONDS.labels(stage=stage, result="error").observe(time.perf_counter() - start)
+            job.attempts += 1
+            job.last_error = f"{stage}: {e}"
+            job.updated_at = datetime.utcnow()
+            job.lease_until = None
+            if job.attempts >= POSTCALL_MAX_ATTEMPTS:
+                job.status = "failed"
+                _stats["failed"] += 1
+                logger.error(f"❌ Post-call job for {job.call_sid} failed at {stage} after {job.attempts} attempts: {e}")
+            else:
+                delay = _backoff_secs(job.attempts)
+                job.status = "pending"
+                job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                _stats["retries"] += 1
+                logger.warning(
+                    f"⚠️ Post-call {stage} for {job.call_sid} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {e}"
+                )
+            await job.save()
+            return
+
+        elapsed = time.perf_counter() - start
+        record_sample(_stats["stage_ms"][stage], elapsed * 1000)
+        POST_CALL_STAGE_SECONDS.labels(stage=stage, result="ok").observe(elapsed)
+        job.stage = STAGES[STAGES.index(stage) + 1] if stage != STAGES[-1] else "done"
+        job.attempts = 0
+        job.updated_at = datetime.utcnow()
+        if job.stage == "done":
+            job.status = "done"
+            job.lease_until = None
+            job.completed_at = job.updated_at
+            _stats["completed"] += 1
+            queue_latency = (job.completed_at - job.created_at).total_seconds()
+            record_sample(_stats["queue_latency_ms"], queue_latency * 1000)
+            POST_CALL_STAGE_SECONDS.labels(stage="queued_to_done", result="ok").observe(queue_latency)
+        await job.save()
+
+    logger.info(f"✅ Post-call processing completed for call {job.call_sid}")
+
+
+async def _yield_to_live_calls():
+    """Hold off taking a job while live calls on this loop are already lagging, for up to POSTCALL_MAX_HOLD_SECS."""
+    from utils.admission import lag_monitor
+    from utils.workers import live_call_count
+
+    deadline = time.monotonic() + POSTCALL_MAX_HOLD_SECS
+    while not _stopping and live_call_count() and lag_monitor.lag_ms > POSTCALL_MAX_LOOP_LAG_MS:
+        if time.monotonic() >= deadline:
+            logger.warning(
+                f"⚠️ Loop lag {lag_monitor.lag_ms:.0f}ms for {POSTCALL_MAX_HOLD_SECS:.0f}s, taking a post-call job anyway"
+            )
+            return
+        await asyncio.sleep(POSTCALL_POLL_SECS)
+
+
+async def _worker_loop(n: int):
+    global _busy
+
+    while not _stopping:
+        await _yield_to_live_calls()
+        try:
+            job = await _claim()
+        except Exception as e:
+            logger.warning(f"Post-call worker {n} failed to claim a job: {e}")
+            job = None
+
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=POSTCALL_POLL_SECS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        _busy += 1
+        try:
+            await _process(job)
+        except Exception as e:
+            logger.error(f"❌ Post-call worker {n} crashed on {job.call_sid}: {e}")
+        finally:
+            _busy -= 1
+
+
+async def sweep_orphaned_recordings() -> int:
+    """Queue uploads for recordings left behind by a crash or restart.
+
+    A recording counts as orphaned when it has not been written to for
+    POSTCALL_ORPHAN_MIN_AGE_SECS (live calls flush every few seconds) and no
+    job references it. Concurrent sweeps by several workers queue each file
+    only once: the upsert filter is covered by a unique index, so a racing
+    upsert fails with DuplicateKeyError and the file counts as already queued.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    from model.model import PostCallJob
+
+    cutoff = time.time() - POSTCALL_ORPHAN_MIN_AGE_SECS
+    queued = 0
+    for path in glob.glob("recordings/server_*"):
+        match = RECORDING_FILE.search(os.path.basename(path))
+        if not match or os.path.getmtime(path) > cutoff:
+            continue
+
+        call_sid = match.group("call_sid")
+        try:
+            result = await PostCallJob.get_pymongo_collection().update_one(
+                {"call_sid": call_sid, "recording_path": path},
+                {
+                    "$setOnInsert": PostCallJob(
+                        call_sid=call_sid, recording_path=path, call_status="completed"
+                    ).model_dump(exclude={"id", "revision_id"})
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            continue  # Another worker's sweep inserted it first
+        if result.upserted_id:
+            queued += 1
+            logger.info(f"🧹 Re-queued orphaned recording {path}")
+
+    if queued:
+        _wakeup.set()
+    return queued
+
+
+async def start_post_call_workers():
+    """Start post-call processing for this web worker according to POSTCALL_MODE."""
+    from utils.drain import register_flush_hook
+
+    # The queue is shared, so its depth is reported by the web workers only
+    registry.register_collect_hook(refresh_queue_depth)
+
+    if POSTCALL_MODE == "inline":
+        await run_worker_loops()
+    elif POSTCALL_MODE == "process":
+        from utils.post_call_worker import start_worker_process
+
+        start_worker_process()
+    else:
+        logger.info("📬 Post-call jobs are processed by an external post-call worker")
+        return
+    register_flush_hook("post-call queue", wait_for_queue_idle)
+
+
+async def run_worker_loops():
+    """Sweep orphaned recordings and start the worker pool on this loop."""
+    if _workers:
+        return
+    try:
+        await sweep_orphaned_recordings()
+    except Exception as e:
+        logger.warning(f"Orphaned recording sweep failed: {e}")
+
+    for n in range(POSTCALL_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop(n)))
+    logger.info(f"📬 Started {POSTCALL_WORKERS} post-call workers")
+
+
+async def stop_post_call_workers(timeout: float = 0):
+    """Stop the workers (and the worker process, if any).
+
+    Workers are given up to `timeout` seconds to finish the jobs they hold,
+    then cancelled; jobs still held are reclaimed after their lease expires.
+    """
+    global _stopping
+
+    if POSTCALL_MODE == "process":
+        from utils.post_call_worker import stop_worker_process
+
+        await stop_worker_process()
+
+    _stopping = True
+    _wakeup.set()
+    if _workers and timeout > 0:
+        await asyncio.wait(_workers, timeout=timeout)
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def wait_for_queue_idle():
+    """Drain hook: return once no job is held by this worker or its post-call child.
+
+    Due-but-unclaimed jobs are left to the rest of the cluster, so one slow
+    job elsewhere cannot hold up this worker's shutdown.
+    """
+    from model.model import PostCallJob
+    from utils.post_call_worker import worker_process_id
+    from utils.workers import WORKER_ID
+
+    while True:
+        holders = [WORKER_ID]
+        child = worker_process_id()
+        if child:
+            holders.append(child)
+        held = await PostCallJob.find(
+            {"status": "running", "worker_id": {"$in": holders}}
+        ).count()
+        if _busy == 0 and held == 0:
+            return
+        await asyncio.sleep(0.5)
+
+
+async def _queue_depth() -> dict:
+    from model.model import PostCallJob
+
+    depth = {status: 0 for status in ("pending", "running", "failed")}
+    async for row in PostCallJob.get_pymongo_collection().aggregate(
+        [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    ):
+        if row["_id"] in depth:
+            depth[row["_id"]] = row["count"]
+    return depth
+
+
+async def refresh_queue_depth():
+    """/metrics collect hook: set the queue depth gauge from Mongo."""
+    for status, count in (await _queue_depth()).items():
+        POST_CALL_QUEUE_JOBS.labels(status=status).set(count)
+
+
+async def get_queue_stats() -> dict:
+    """Queue depth from Mongo plus latency counters from this worker."""
+    from model.model import PostCallJob
+    from utils.post_call_worker import worker_process_status
+
+    depth = await _queue_depth()
+    oldest = await PostCallJob.find({"status": "pending"}).sort([("created_at", 1)]).limit(1).to_list()
+    latency = _stats["queue_latency_ms"]
+    return {
+        "depth": depth,
+        "oldest_pending_secs": (
+            round((datetime.utcnow() - oldest[0].created_at).total_seconds(), 1) if oldest else 0.0
+        ),
+        "mode": POSTCALL_MODE,
+        "process": worker_process_status() if POSTCALL_MODE == "process" else None,
+        # Counters of this process; in process mode the jobs run in the worker process
+        "worker": {
+            "workers": len(_workers),
+            "busy": _busy,
+            "completed": _stats["completed"],
+            "failed": _stats["failed"],
+            "retries": _stats["retries"],
+            "queue_latency_p50_ms": round(percentile(latency, 50), 1),
+            "queue_latency_p95_ms": round(percentile(latency, 95), 1),
+            "stage_p95_ms": {
+                stage: round(percentile(samples, 95), 1) for stage, samples in _stats["stage_ms"].items()
+            },
+        },
+    }
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+
+from loguru import logger
+
+# Post-call worker process (POSTCALL_MODE=process or external). It claims jobs
+# from the PostCallJob queue in Mongo like the inline workers do, but on its
+# own event loop and at a lower CPU priority, so a burst of hangups never
+# delays audio frames of the calls still live on the web worker.
+#
+# In process mode every web worker starts one as a child and restarts it if
+# it dies. The child reads a line from stdin per enqueued job (an immediate
+# wakeup instead of waiting for the next poll) and exits when stdin closes.
+#
+# Its /metrics samples are served on a unix socket (utils.telemetry) and
+# reported by whichever web worker takes the scrape.
+#
+# Standalone:  python -m utils.post_call_worker
+POSTCALL_NICE = int(os.getenv("POSTCALL_NICE", "10"))
+# Time the worker process gets to finish the jobs it holds when stopped
+POSTCALL_STOP_TIMEOUT_SECS = float(os.getenv("POSTCALL_STOP_TIMEOUT_SECS", "60"))
+POSTCALL_RESTART_SECS = 5.0
+
+_process = None
+_supervisor = None
+_restarts = 0
+_started_at = None
+
+
+def start_worker_process():
+    """Start (and keep running) the post-call worker process for this web worker."""
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = asyncio.create_task(_supervise())
+
+
+async def _supervise():
+    global _process, _restarts, _started_at
+
+    while True:
+        _process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "utils.post_call_worker", "--attached", stdin=asyncio.subprocess.PIPE
+        )
+        _started_at = time.time()
+        logger.info(f"📬 Started post-call worker process {_process.pid}")
+        code = await _process.wait()
+        _process = None
+        _restarts += 1
+        logger.warning(f"⚠️ Post-call worker process exited with {code}, restarting in {POSTCALL_RESTART_SECS:.0f}s")
+        await asyncio.sleep(POSTCALL_RESTART_SECS)
+
+
+def notify_worker_process():
+    """Wake the worker process to claim a job that was just queued."""
+    if _process is None or _process.returncode is not None:
+        return
+    try:
+        _process.stdin.write(b"\n")
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # It is restarting; the job is picked up once it is back
+
+
+async def stop_worker_process():
+    """Let the worker process finish the jobs it holds, then stop it."""
+    global _supervisor
+
+    if _supervisor:
+        _supervisor.cancel()
+        _supervisor = None
+    process = _process
+    if process is None or process.returncode is not None:
+        return
+
+    process.send_signal(signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout=POSTCALL_STOP_TIMEOUT_SECS + 10)
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Post-call worker process {process.pid} did not stop, killing it")
+        process.kill()
+        await process.wait()
+
+
+def worker_process_id():
+    """WORKER_ID the worker process holds job leases under, or None if it is not running."""
+    if _process is None or _process.returncode is not None:
+        return None
+    return f"{socket.gethostname()}-{_process.pid}"
+
+
+def worker_process_status() -> dict:
+    running = _process is not None and _process.returncode is None
+    return {
+        "pid": _process.pid if running else None,
+        "running": running,
+        "restarts": _restarts,
+        "uptime_secs": round(time.time() - _started_at, 1) if running and _started_at else 0.0,
+    }
+
+
+async def _watch_parent(stop: asyncio.Event):
+    """Wake the workers for every line from the web worker; stop once it is gone."""
+    from utils.post_call_queue import _wakeup
+
+    reader = asyncio.StreamReader()
+    await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    while await reader.readline():
+        _wakeup.set()
+    logger.info("Web worker went away, stopping post-call worker")
+    stop.set()
+
+
+async def serve(attached: bool = False):
+    """Run the post-call workers until SIGTERM/SIGINT (or, attached, until stdin closes)."""
+    from model.model import close_db_connection, connect_to_db
+    from utils.admission import lag_monitor
+    from utils.cloudinary_upload import shutdown_uploader
+    from utils.post_call_queue import POSTCALL_WORKERS, run_worker_loops, stop_post_call_workers
+    from utils.recording_codec import shutdown_encoder
+    from utils.telemetry import registry, retire_metrics_socket, serve_metrics_socket
+    from utils.webhooks import webhook_dispatcher
+
+    if POSTCALL_NICE > 0:
+        # Also inherited by the encoder processes this worker starts
+        os.nice(POSTCALL_NICE)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await connect_to_db()
+    await run_worker_loops()
+    registry.const_labels["process"] = "post_call_worker"
+    await serve_metrics_socket()
+    lag_monitor.start()
+    watcher = asyncio.create_task(_watch_parent(stop)) if attached else None
+    logger.info(f"📬 Post-call worker {os.getpid()} running {POSTCALL_WORKERS} workers")
+
+    await stop.wait()
+    if watcher:
+        watcher.cancel()
+    await stop_post_call_workers(timeout=POSTCALL_STOP_TIMEOUT_SECS)
+    await webhook_dispatcher.stop()
+    shutdown_encoder()
+    shutdown_uploader()
+    await close_db_connection()
+    await lag_monitor.stop()
+    await retire_metrics_socket()
+    logger.info(f"🔴 Post-call worker {os.getpid()} stopped")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+    logger.add(
+        "logs/post_call_worker_{time:YYYY-MM-DD}.log",
+        rotation="00:00",
+        retention="30 days",
+        level="DEBUG",
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} - {message}",
+        compression="zip",
+    )
+    asyncio.run(serve(attached="--attached" in sys.argv))
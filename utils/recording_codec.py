@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from loguru import logger
+
+# Codec recordings are converted to before upload: wav (no conversion), flac, opus, ogg (vorbis) or mp3
+RECORDING_CODEC = os.getenv("RECORDING_CODEC", "wav").lower()
+RECORDING_ENCODE_WORKERS = int(os.getenv("RECORDING_ENCODE_WORKERS", "2"))
+
+# codec -> (file extension, soundfile format, soundfile subtype)
+CODECS = {
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "opus": ("ogg", "OGG", "OPUS"),
+    "ogg": ("ogg", "OGG", "VORBIS"),
+    "mp3": ("mp3", "MP3", "MPEG_LAYER_III"),
+}
+
+_pool = None
+
+
+def encode_file(src: str, codec: str) -> dict:
+    """Convert a WAV file with soundfile/libsndfile. Runs inside a pool worker process.
+
+    Returns the output path, input/output sizes, audio duration and the CPU
+    seconds the conversion took.
+    """
+    import soundfile as sf
+
+    extension, file_format, subtype = CODECS[codec]
+    dst = f"{os.path.splitext(src)[0]}.{extension}"
+
+    start = time.process_time()
+    with sf.SoundFile(src) as wav:
+        duration_secs = wav.frames / wav.samplerate
+        with sf.SoundFile(
+            dst, "w", samplerate=wav.samplerate, channels=wav.channels, format=file_format, subtype=subtype
+        ) as out:
+            for block in wav.blocks(blocksize=wav.samplerate * 10, dtype="int16"):
+                out.write(block)
+
+    return {
+        "path": dst,
+        "codec": codec,
+        "src_bytes": os.path.getsize(src),
+        "dst_bytes": os.path.getsize(dst),
+        "duration_secs": duration_secs,
+        "cpu_secs": time.process_time() - start,
+    }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    if _pool is None:
+        # spawn, not fork: the server process has an event loop and threads
+        _pool = ProcessPoolExecutor(max_workers=RECORDING_ENCODE_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+async def encode_recording(path: str, codec: str = RECORDING_CODEC) -> str:
+    """Encode a finished WAV recording off the event loop and return the file to upload.
+
+    With codec "wav" (the default) the file is returned unchanged. If encoding
+    fails the WAV is returned so the upload still happens.
+    """
+    if codec == "wav" or not path.endswith(".wav"):
+        return path
+    if codec not in CODECS:
+        logger.warning(f"Unknown RECORDING_CODEC '{codec}', uploading WAV")
+        return path
+
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_get_pool(), encode_file, path, codec)
+    except Exception as e:
+        logger.error(f"❌ Failed to encode {path} as {codec}: {e}")
+        return path
+
+    minutes = result["duration_secs"] / 60
+    logger.info(
+        f"🗜️ Encoded {path} as {codec}: {result['src_bytes']} -> {result['dst_bytes']} bytes "
+        f"({1 - result['dst_bytes'] / max(1, result['src_bytes']):.0%} smaller), "
+        f"{result['cpu_secs'] / minutes if minutes else 0.0:.2f} CPU s per call minute"
+    )
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Failed to remove {path} after encoding: {e}")
+    return result["path"]
+
+
+def shutdown_encoder():
+    """Stop the encoder worker processes."""
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,158 @@
+import asyncio
+import os
+from contextlib import AsyncExitStack
+
+from loguru import logger
+
+# Where recordings go: "cloudinary" uploads the whole file after the call (post_call),
+# "s3" streams it to an S3-compatible bucket (AWS, MinIO, ...) while the call runs.
+RECORDING_STORE = os.getenv("RECORDING_STORE", "cloudinary").lower()
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_PREFIX = os.getenv("S3_PREFIX", "recordings/")
+# Public base URL for recording_url; defaults to the endpoint/bucket URL
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+# S3 requires every part but the last to be at least 5 MiB
+RECORDING_PART_BYTES = max(5 * 1024 * 1024, int(os.getenv("RECORDING_PART_BYTES", str(5 * 1024 * 1024))))
+
+
+def _public_url(key: str) -> str:
+    if S3_PUBLIC_URL:
+        base = S3_PUBLIC_URL.rstrip("/")
+    elif S3_ENDPOINT_URL:
+        base = f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET}"
+    else:
+        base = f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com"
+    return f"{base}/{key}"
+
+
+def _read_range(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+class S3MultipartRecordingSink:
+    """Uploads a recording to S3 in parts while CallRecorder is still writing it.
+
+    Part N covers bytes [(N-1) * RECORDING_PART_BYTES, N * RECORDING_PART_BYTES)
+    of the WAV file. Parts 2..N go up as soon as the file has grown past them;
+    part 1 holds the WAV header, which only exists at finalize, so it goes up
+    together with the tail. Hangup then costs roughly two part uploads instead
+    of the whole file. Recordings shorter than one part are a single PUT.
+    """
+
+    def __init__(self, call_sid: str):
+        self.key = f"{S3_PREFIX}{call_sid}.wav"
+        self._stack = AsyncExitStack()
+        self._client = None
+        self._upload_id = None
+        self._parts = {}
+        self._next_part = 2
+        self._available = 0
+        self._task = None
+        self._failed = False
+
+    async def _get_client(self):
+        if self._client is None:
+            import aioboto3
+
+            session = aioboto3.Session()
+            self._client = await self._stack.enter_async_context(
+                session.client("s3", endpoint_url=S3_ENDPOINT_URL, region_name=S3_REGION)
+            )
+        return self._client
+
+    def on_data(self, path: str, file_size: int):
+        """Called by CallRecorder after each flush with the bytes now on disk."""
+        self._available = file_size
+        if self._failed or file_size < self._next_part * RECORDING_PART_BYTES:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._upload_ready_parts(path))
+
+    async def _upload_part(self, path: str, number: int, start: int, end: int):
+        client = await self._get_client()
+        if self._upload_id is None:
+            response = await client.create_multipart_upload(Bucket=S3_BUCKET, Key=self.key, ContentType="audio/wav")
+            self._upload_id = response["UploadId"]
+
+        body = await asyncio.to_thread(_read_range, path, start, end)
+        response = await client.upload_part(
+            Bucket=S3_BUCKET, Key=self.key, PartNumber=number, UploadId=self._upload_id, Body=body
+        )
+        self._parts[number] = response["ETag"]
+
+    async def _upload_ready_parts(self, path: str):
+        try:
+            while self._available >= self._next_part * RECORDING_PART_BYTES:
+                number = self._next_part
+                await self._upload_part(path, number, (number - 1) * RECORDING_PART_BYTES, number * RECORDING_PART_BYTES)
+                self._next_part += 1
+        except Exception as e:
+            # Stop streaming; complete() falls back to uploading the whole file
+            self._failed = True
+            logger.warning(f"Streaming upload of {self.key} failed, will upload at hangup: {e}")
+
+    async def complete(self, path: str) -> str:
+        """Upload what is left (part 1 and the tail) and return the recording URL."""
+        try:
+            if self._task:
+                await self._task
+
+            client = await self._get_client()
+            size = os.path.getsize(path)
+
+            if self._failed or size <= RECORDING_PART_BYTES:
+                await self._abort()
+                body = await asyncio.to_thread(_read_range, path, 0, size)
+                await client.put_object(Bucket=S3_BUCKET, Key=self.key, Body=body, ContentType="audio/wav")
+            else:
+                tail_start = (self._next_part - 1) * RECORDING_PART_BYTES
+                if size > tail_start:
+                    await self._upload_part(path, self._next_part, tail_start, size)
+                await self._upload_part(path, 1, 0, RECORDING_PART_BYTES)
+                await client.complete_multipart_upload(
+                    Bucket=S3_BUCKET,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={
+                        "Parts": [{"PartNumber": n, "ETag": etag} for n, etag in sorted(self._parts.items())]
+                    },
+                )
+
+            url = _public_url(self.key)
+            logger.info(f"✅ Recording uploaded to {url} ({size} bytes, {len(self._parts) or 1} part(s))")
+            return url
+        except Exception:
+            await self._abort()
+            raise
+        finally:
+            await self._stack.aclose()
+
+    async def _abort(self):
+        if self._upload_id is None:
+            return
+        try:
+            await self._client.abort_multipart_upload(Bucket=S3_BUCKET, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            logger.warning(f"Failed to abort multipart upload of {self.key}: {e}")
+        self._upload_id = None
+        self._parts = {}
+
+
+def create_recording_sink(call_sid: str):
+    """Streaming upload sink for RECORDING_STORE, or None to upload after the call."""
+    if RECORDING_STORE != "s3":
+        return None
+    if not S3_BUCKET:
+        logger.warning("RECORDING_STORE=s3 but S3_BUCKET is not set, uploading after the call")
+        return None
+    try:
+        import aioboto3  # noqa: F401
+    except ImportError:
+        logger.warning("RECORDING_STORE=s3 needs aioboto3 (pip install aioboto3), uploading after the call")
+        return None
+    return S3MultipartRecordingSink(call_sid)
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import wave
+
+import numpy as np
+from loguru import logger
+
+from utils.call_audio import create_wav_header
+
+# Post-processing applied to WAV recordings before encoding and upload
+RECORDING_TRIM_SILENCE = os.getenv("RECORDING_TRIM_SILENCE", "true").lower() == "true"
+# A 20ms frame is silent when every channel is below this level
+RECORDING_SILENCE_DBFS = float(os.getenv("RECORDING_SILENCE_DBFS", "-50"))
+# Silence kept before the first and after the last voiced frame
+RECORDING_TRIM_PADDING_SECS = float(os.getenv("RECORDING_TRIM_PADDING_SECS", "0.5"))
+# Silent gaps longer than this are shortened to it (0 keeps gaps as they are)
+RECORDING_MAX_GAP_SECS = float(os.getenv("RECORDING_MAX_GAP_SECS", "0"))
+
+FRAME_MS = 20
+# AudioBufferProcessor(num_channels=2) puts the user on the left channel and the bot on the right
+USER_CHANNEL = 0
+BOT_CHANNEL = 1
+
+
+def read_wav(path: str):
+    """Return (samples as an (n, channels) int16 array, sample_rate)."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM recordings are supported")
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        data = wav.readframes(wav.getnframes())
+    return np.frombuffer(data, dtype="<i2").reshape(-1, channels), sample_rate
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int):
+    """Write samples atomically: to a temporary file, then rename over path."""
+    data = np.ascontiguousarray(samples, dtype="<i2").tobytes()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(create_wav_header(len(data), sample_rate, samples.shape[1]))
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def frame_levels(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """RMS level in dBFS of every full 20ms frame, shape (frames, channels)."""
+    frame = sample_rate * FRAME_MS // 1000
+    frames = len(samples) // frame
+    framed = samples[: frames * frame].reshape(frames, frame, samples.shape[1])
+
+    # A minute of frames at a time, so the float copy stays small for long calls
+    rms = np.empty((frames, samples.shape[1]), dtype=np.float32)
+    block = 3000
+    for start in range(0, frames, block):
+        x = framed[start : start + block].astype(np.float32)
+        rms[start : start + block] = np.sqrt(np.mean(x * x, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-3) / 32768)
+
+
+def silence_keep_mask(
+    voiced: np.ndarray,
+    padding_frames: int,
+    max_gap_frames: int = 0,
+) -> np.ndarray:
+    """Which frames to keep, given which frames are voiced.
+
+    Leading and trailing silence beyond padding_frames is dropped. With
+    max_gap_frames, each silent run between voiced frames longer than that is
+    cut down to its first and last max_gap_frames / 2 frames.
+    """
+    keep = np.zeros(len(voiced), dtype=bool)
+    voiced_idx = np.flatnonzero(voiced)
+    if not len(voiced_idx):
+        return keep
+
+    first, last = voiced_idx[0], voiced_idx[-1]
+    keep[max(0, first - padding_frames) : last + padding_frames + 1] = True
+
+    if max_gap_frames:
+        # Silent runs inside [first, last] as (start, end) pairs
+        inner = ~voiced[first : last + 1]
+        edges = np.diff(np.concatenate(([0], inner.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1) + first
+        ends = np.flatnonzero(edges == -1) + first
+        head = max_gap_frames // 2
+        tail = max_gap_frames - head
+        for start, end in zip(starts, ends):
+            if end - start > max_gap_frames:
+                keep[start + head : end - tail] = False
+
+    return keep
+
+
+def trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    threshold_dbfs: float = RECORDING_SILENCE_DBFS,
+    padding_secs: float = RECORDING_TRIM_PADDING_SECS,
+    max_gap_secs: float = RECORDING_MAX_GAP_SECS,
+) -> np.ndarray:
+    """Drop leading/trailing silence (and optionally shorten long gaps) from a recording.
+
+    A recording with no voiced frame at all is returned unchanged.
+    """
+    frame = sample_rate * FRAME_MS // 1000
+    voiced = (frame_levels(samples, sample_rate) > threshold_dbfs).any(axis=1)
+    if not voiced.any():
+        return samples
+
+    keep = silence_keep_mask(
+        voiced,
+        padding_frames=int(padding_secs * 1000 / FRAME_MS),
+        max_gap_frames=int(max_gap_secs * 1000 / FRAME_MS),
+    )
+    sample_mask = np.repeat(keep, frame)
+    # Samples after the last full frame go with that frame
+    sample_mask = np.concatenate((sample_mask, np.full(len(samples) - len(sample_mask), keep[-1])))
+    return samples[sample_mask]
+
+
+def trim_file(path: str, **options) -> dict:
+    """Trim a WAV recording in place and return before/after durations and sizes."""
+    samples, sample_rate = read_wav(path)
+    trimmed = trim_silence(samples, sample_rate, **options)
+    if len(trimmed) != len(samples):
+        write_wav(path, trimmed, sample_rate)
+
+    return {
+        "original_secs": len(samples) / sample_rate,
+        "trimmed_secs": len(trimmed) / sample_rate,
+        "original_bytes": samples.nbytes,
+        "trimmed_bytes": trimmed.nbytes,
+    }
+
+
+def split_tracks(path: str, trim: bool = True) -> dict:
+    """Write the user and bot channels of a stereo recording as separate mono WAVs.
+
+    Returns {"user": path, "bot": path}. With trim, each track gets its own
+    leading/trailing silence trim (gaps are kept, so turns stay in place).
+    """
+    samples, sample_rate = read_wav(path)
+    if samples.shape[1] != 2:
+        raise ValueError(f"{path}: expected a stereo recording, got {samples.shape[1]} channel(s)")
+
+    base = os.path.splitext(path)[0]
+    tracks = {}
+    for name, channel in (("user", USER_CHANNEL), ("bot", BOT_CHANNEL)):
+        track = samples[:, channel : channel + 1]
+        if trim:
+            track = trim_silence(track, sample_rate, max_gap_secs=0)
+        tracks[name] = f"{base}_{name}.wav"
+        write_wav(tracks[name], track, sample_rate)
+    return tracks
+
+
+async def trim_recording(path: str) -> str:
+    """Trim silence from a finished WAV recording off the event loop, in place.
+
+    Does nothing unless RECORDING_TRIM_SILENCE is set and the file is a WAV.
+    On failure the recording is left as it was. Returns the path.
+    """
+    if not RECORDING_TRIM_SILENCE or not path.endswith(".wav"):
+        return path
+
+    try:
+        stats = await asyncio.to_thread(trim_file, path)
+    except Exception as e:
+        logger.error(f"❌ Failed to trim silence from {path}: {e}")
+        return path
+
+    removed = stats["original_secs"] - stats["trimmed_secs"]
+    logger.info(
+        f"✂️ Trimmed {removed:.1f}s of silence from {path}: "
+        f"{stats['original_secs']:.1f}s -> {stats['trimmed_secs']:.1f}s "
+        f"({stats['original_bytes']} -> {stats['trimmed_bytes']} bytes)"
+    )
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trim silence from a call recording and/or split it into user and bot tracks")
+    parser.add_argument("wav", help="Stereo call recording (left: user, right: bot)")
+    parser.add_argument("--split", action="store_true", help="Write <name>_user.wav and <name>_bot.wav")
+    parser.add_argument("--max-gap", type=float, default=RECORDING_MAX_GAP_SECS, help="Shorten silent gaps to this many seconds (0: keep)")
+    parser.add_argument("--threshold", type=float, default=RECORDING_SILENCE_DBFS, help="Silence level in dBFS")
+    parser.add_argument("--no-trim", action="store_true", help="Leave the recording itself untouched")
+    args = parser.parse_args()
+
+    if args.split:
+        for name, track in split_tracks(args.wav).items():
+            print(f"{name}: {track}")
+    if not args.no_trim:
+        stats = trim_file(args.wav, threshold_dbfs=args.threshold, max_gap_secs=args.max_gap)
+        print(f"{args.wav}: {stats['original_secs']:.1f}s -> {stats['trimmed_secs']:.1f}s")
@@ -0,0 +1,15 @@
+def percentile(values, pct: float) -> float:
+    """Linear-interpolated percentile of a list of numbers (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def record_sample(samples: list, value: float, keep: int = 500):
+    """Append a sample, keeping only the most recent `keep` for the stats endpoints."""
+    samples.append(value)
+    del samples[:-keep]
@@ -0,0 +1,559 @@
+import asyncio
+import bisect
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from loguru import logger
+from pymongo import monitoring
+
+# Prometheus text-format telemetry, served at GET /metrics. No client library:
+# counters, gauges and histograms are plain Python objects updated in place.
+# An update is a dict lookup, a bisect over the buckets and two additions under
+# an uncontended lock (pymongo reports from its own threads), so instrumented
+# paths pay well under a microsecond. Nothing here runs per audio frame.
+#
+# Every process has its own registry. With WEB_CONCURRENCY > 1 the uvicorn
+# workers share one port and a scrape reaches any one of them, so every process
+# of the node (web workers and their post-call worker processes) serves its
+# samples on a unix socket in METRICS_DIR, and the worker that takes the scrape
+# reads them all and reports the node as one set of series, labelled only
+# process="web" or "post_call_worker". Per-pid labels would start new series
+# on every worker restart. Samples are summed across processes, except gauges
+# declared aggregate="max". A process that exits leaves its last counter and
+# histogram values in METRICS_DIR/departed.json, so node totals never go
+# backwards when one worker restarts (the same idea as prometheus_client's
+# multiprocess mode keeping dead workers' files).
+# Processes sharing METRICS_DIR are reported together: give each deployment on
+# a host its own, and clear it when the whole node is redeployed.
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "voicebot_metrics"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TTFB_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+UPLOAD_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # Unlabelled metrics are used directly (COUNTER.inc()); they are their own only child
+        return self.labels()
+
+    def collect(self) -> list:
+        """Samples as (suffix, labels dict, value)."""
+        samples = []
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            samples.extend((suffix, {**labels, **extra}, value) for suffix, extra, value in child.samples())
+        return samples
+
+
+class _CounterChild:
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [("_total", {}, self.value)]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def samples(self):
+        return [("", {}, self.value)]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; with `function` it is read at scrape time instead."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None, aggregate: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        # "sum" across the node's processes, or "max" for a value every process reads from a shared source
+        self.aggregate = aggregate
+
+    def _new_child(self):
+        return _GaugeChild(self._lock)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def collect(self) -> list:
+        if self.function is not None:
+            try:
+                return [("", {}, float(self.function()))]
+            except Exception as e:
+                logger.warning(f"Gauge {self.name} failed: {e}")
+                return []
+        return super().collect()
+
+
+class _HistogramChild:
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self._buckets + (float("inf"),), self._counts):
+            cumulative += count
+            samples.append(("_bucket", {"le": _format_bound(bound)}, cumulative))
+        samples.append(("_sum", {}, self._sum))
+        samples.append(("_count", {}, cumulative))
+        return samples
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class _Timer:
+    """Context manager observing the elapsed seconds into a histogram child."""
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collect_hooks = []
+        # Added to every sample, e.g. process="post_call_worker"
+        self.const_labels = {"process": "web"}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def register_collect_hook(self, hook):
+        """Register an async callable run before every scrape, to refresh gauges that need I/O."""
+        self._collect_hooks.append(hook)
+
+    async def collect(self, hooks: bool = True) -> list:
+        """Families as [name, kind, documentation, [[suffix, labels, value], ...]]."""
+        for hook in self._collect_hooks if hooks else ():
+            try:
+                await hook()
+            except Exception as e:
+                logger.warning(f"Metrics collect hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+        families = []
+        for metric in self._metrics.values():
+            samples = [
+                [suffix, {**self.const_labels, **labels}, value] for suffix, labels, value in metric.collect()
+            ]
+            families.append([metric.name, metric.kind, metric.documentation, samples])
+        return families
+
+
+def render(families: list) -> str:
+    """Prometheus text exposition (format 0.0.4) of collected families."""
+    lines = []
+    for name, kind, documentation, samples in families:
+        lines.append(f"# HELP {name} {_escape(documentation)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def merge(families: list, others: list) -> list:
+    """Add the samples of `others` to the families of the same name (new names are appended)."""
+    by_name = {family[0]: family for family in families}
+    for family in others:
+        if family[0] in by_name:
+            by_name[family[0]][3].extend(family[3])
+        else:
+            # A copy: `others` may be kept (last samples read from a process)
+            family = [*family[:3], list(family[3])]
+            families.append(family)
+            by_name[family[0]] = family
+    return families
+
+
+def aggregate(families: list) -> list:
+    """Combine samples with the same suffix and labels: summed, or the largest for aggregate="max" gauges."""
+    combined = []
+    for name, kind, documentation, samples in families:
+        use_max = getattr(registry._metrics.get(name), "aggregate", "sum") == "max"
+        values = {}
+        for suffix, labels, value in samples:
+            key = (suffix, tuple(labels.items()))
+            if key not in values:
+                values[key] = value
+            else:
+                values[key] = max(values[key], value) if use_max else values[key] + value
+        combined.append(
+            [name, kind, documentation, [[suffix, dict(labels), value] for (suffix, labels), value in values.items()]]
+        )
+    return combined
+
+
+registry = Registry()
+
+_metrics_server = None
+
+
+def _socket_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.sock")
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def _departed_path() -> str:
+    return os.path.join(METRICS_DIR, "departed.json")
+
+
+@asynccontextmanager
+async def _node_lock():
+    """Serialize scrapes and departures across the node's processes (a flock on METRICS_DIR/.lock)."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    fd = os.open(os.path.join(METRICS_DIR, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # also releases the lock
+
+
+def _monotonic(families: list) -> list:
+    """Only the counter and histogram families: the values a departed process leaves behind."""
+    return [family for family in families if family[1] in ("counter", "histogram")]
+
+
+def _read_json(path: str) -> list:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable {path}: {e}")
+        return []
+
+
+def _write_json(path: str, families: list):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(families, f)
+    os.replace(tmp, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _add_departed(families: list):
+    """Fold a departed process's counters and histograms into departed.json. Call under _node_lock."""
+    _write_json(_departed_path(), aggregate(merge(_read_json(_departed_path()), _monotonic(families))))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+async def _collect_reported() -> list:
+    """This process's samples for a scrape; its counters and histograms are also kept in <pid>.json.
+
+    Whatever a scrape reported for a process is then still there if the
+    process dies before the next one, so the node's totals never dip.
+    """
+    families = await registry.collect()
+    _write_json(_snapshot_path(os.getpid()), _monotonic(families))
+    return families
+
+
+async def serve_metrics_socket():
+    """Serve this process's samples as JSON on its unix socket in METRICS_DIR."""
+    global _metrics_server
+
+    async def handle(reader, writer):
+        try:
+            writer.write(json.dumps(await _collect_reported()).encode())
+            await writer.drain()
+        finally:
+            writer.close()
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _socket_path(os.getpid())
+    _remove(path)  # left by an earlier process with this pid
+    _metrics_server = await asyncio.start_unix_server(handle, path=path)
+    return _metrics_server
+
+
+async def retire_metrics_socket():
+    """Stop serving samples and leave this process's counters and histograms in departed.json."""
+    global _metrics_server
+
+    async with _node_lock():
+        if _metrics_server is not None:
+            _metrics_server.close()
+            _metrics_server = None
+        if not os.path.exists(_socket_path(os.getpid())):
+            return  # already folded in by a scrape that found this process gone
+        _add_departed(await registry.collect(hooks=False))
+        _remove(_socket_path(os.getpid()))
+        _remove(_snapshot_path(os.getpid()))
+
+
+async def read_metrics_socket(pid: int, timeout: float = 1.0) -> list:
+    """Samples of the process `pid` (see serve_metrics_socket), or None if it does not answer."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(_socket_path(pid)), timeout)
+        try:
+            return json.loads(await asyncio.wait_for(reader.read(), timeout))
+        finally:
+            writer.close()
+    except (OSError, asyncio.TimeoutError, ValueError) as e:
+        logger.warning(f"Could not read metrics of process {pid}: {e}")
+        return None
+
+
+async def _read_sibling(pid: int) -> list:
+    """Samples of another process of the node. Call under _node_lock."""
+    samples = await read_metrics_socket(pid)
+    if samples is not None:
+        return samples
+    if _alive(pid):
+        # Busy, stuck or not reaped yet: repeat its counters as last reported
+        return _read_json(_snapshot_path(pid))
+
+    logger.info(f"Metrics of process {pid}: gone, keeping its last reported counters")
+    _add_departed(_read_json(_snapshot_path(pid)))
+    _remove(_socket_path(pid))
+    _remove(_snapshot_path(pid))
+    return []
+
+
+async def exposition() -> str:
+    """The /metrics body: every process of the node (this one, its siblings, their post-call workers)."""
+    families = await _collect_reported()
+    async with _node_lock():
+        pids = []
+        for name in os.listdir(METRICS_DIR):
+            if name.endswith(".sock") and name[:-5].isdigit() and int(name[:-5]) != os.getpid():
+                pids.append(int(name[:-5]))
+        for samples in await asyncio.gather(*(_read_sibling(pid) for pid in pids)):
+            merge(families, samples)
+        merge(families, _read_json(_departed_path()))
+    return render(aggregate(families))
+
+
+# Instruments. Label values are bounded: bot type, service, provider class,
+# Mongo command name, stage and result.
+
+def _live_calls():
+    from utils.workers import live_call_count
+
+    return live_call_count()
+
+
+def _background_tasks():
+    from utils.post_call import pending_background_tasks
+
+    return pending_background_tasks()
+
+
+def _rss_bytes():
+    from utils.workers import _rss_mb
+
+    return _rss_mb() * 1024 * 1024
+
+
+def _cpu_seconds():
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+ACTIVE_CALLS = Gauge("voicebot_active_calls", "Media WebSockets currently open", function=_live_calls)
+CALLS_STARTED = Counter("voicebot_calls_started", "Calls whose bot pipeline was started", ["bot"])
+CALL_SETUP_SECONDS = Histogram(
+    "voicebot_call_setup_seconds",
+    "WebSocket accepted to client connected (pipeline running)",
+    ["bot"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0),
+)
+TTFB_SECONDS = Histogram(
+    "voicebot_ttfb_seconds", "Time to first byte per service call", ["service", "provider"], buckets=TTFB_BUCKETS
+)
+LOOP_LAG_SECONDS = Histogram(
+    "voicebot_event_loop_lag_seconds",
+    "How late the loop lag monitor's sleeps wake up",
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "voicebot_mongo_command_seconds", "MongoDB command latency", ["command"], buckets=MONGO_BUCKETS
+)
+MONGO_COMMAND_FAILURES = Counter("voicebot_mongo_command_failures", "MongoDB commands that failed", ["command"])
+# The queue is shared: every web worker reads the same depth from Mongo
+POST_CALL_QUEUE_JOBS = Gauge(
+    "voicebot_post_call_queue_jobs", "Post-call jobs in the queue by status", ["status"], aggregate="max"
+)
+POST_CALL_STAGE_SECONDS = Histogram(
+    "voicebot_post_call_stage_seconds", "Duration of post-call stages", ["stage", "result"], buckets=UPLOAD_BUCKETS
+)
+POST_CALL_BACKGROUND_TASKS = Gauge(
+    "voicebot_post_call_background_tasks", "In-process post-call tasks still running", function=_background_tasks
+)
+UPLOAD_SECONDS = Histogram(
+    "voicebot_recording_upload_seconds", "Recording upload to Cloudinary, including retries", ["result"], buckets=UPLOAD_BUCKETS
+)
+UPLOAD_BYTES = Counter("voicebot_recording_upload_bytes", "Recording bytes uploaded to Cloudinary")
+RECORDING_BYTES = Counter("voicebot_recording_bytes", "Call audio bytes written to recordings")
+WEBHOOK_SECONDS = Histogram(
+    "voicebot_webhook_delivery_seconds", "Completion webhook queued to acknowledged", ["result"], buckets=UPLOAD_BUCKETS
+)
+PROCESS_RSS_BYTES = Gauge("voicebot_process_resident_memory_bytes", "Resident memory of the processes", function=_rss_bytes)
+PROCESS_CPU_SECONDS = Gauge(
+    "voicebot_process_cpu_seconds", "User + system CPU time of the running processes", function=_cpu_seconds
+)
+
+
+def _provider(processor: str) -> str:
+    """OpenAILLMService#0 -> OpenAILLMService"""
+    return processor.split("#", 1)[0]
+
+
+def observe_call_setup(bot: str, call_data: dict):
+    """Record the setup time of a call whose client just connected (see bot() / bot_2())."""
+    started = call_data.get("setup_started")
+    if started is not None:
+        CALL_SETUP_SECONDS.labels(bot=bot).observe(time.perf_counter() - started)
+
+
+def observe_ttfb(service: str, processor: str, seconds: float):
+    TTFB_SECONDS.labels(service=service, provider=_provider(processor)).observe(seconds)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every MongoDB command (passed to the Motor client in event_listeners)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.labels(command=event.command_name).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.labels(command=event.command_name).observe(event.duration_micros / 1_000_000)
+        MONGO_COMMAND_FAILURES.labels(command=event.command_name).inc()
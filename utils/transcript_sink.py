@@ -0,0 +1,245 @@
+import asyncio
+import glob
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from loguru import logger
+
+from utils.call_events import publish
+from utils.workers import WORKER_ID
+
+# Transcript lines of every call, as JSONL: one object per turn with call_sid, turn, role, content, timestamp
+TRANSCRIPTS_DIR = os.getenv("TRANSCRIPTS_DIR", "transcripts")
+TRANSCRIPT_FLUSH_SECS = float(os.getenv("TRANSCRIPT_FLUSH_SECS", "2"))
+# Lines buffered across calls that trigger an early flush
+TRANSCRIPT_BATCH_LINES = int(os.getenv("TRANSCRIPT_BATCH_LINES", "500"))
+# Lines kept if writes keep failing; the oldest are dropped beyond this
+TRANSCRIPT_MAX_PENDING_LINES = int(os.getenv("TRANSCRIPT_MAX_PENDING_LINES", "50000"))
+TRANSCRIPT_ROTATE_BYTES = int(os.getenv("TRANSCRIPT_ROTATE_BYTES", str(50 * 1024 * 1024)))
+TRANSCRIPT_RETENTION_DAYS = int(os.getenv("TRANSCRIPT_RETENTION_DAYS", "30"))
+# Also insert every turn into the call_turns collection (CallTurn) with each flush
+TRANSCRIPT_PERSIST_TURNS = os.getenv("TRANSCRIPT_PERSIST_TURNS", "true").lower() == "true"
+
+
+class TranscriptSink:
+    """Write-behind JSONL transcript log shared by all calls on this worker.
+
+    add() only appends to an in-memory buffer, so the transcript processor's
+    event handler never waits on disk. A background task writes the buffer in
+    batches (one thread hop and one append per batch) every flush_secs, or
+    sooner once batch_lines are waiting. Files are named
+    transcripts_<date>_<worker>_<n>.jsonl, one set per uvicorn worker so
+    concurrent appends never interleave, and roll over daily and at
+    rotate_bytes; files older than retention_days are deleted on rollover.
+
+    With persist_turns the same batches are inserted into Mongo as CallTurn
+    documents, so a call's turns survive a crash mid-call and can be read
+    while it is live. File and database writes are retried independently.
+    """
+
+    def __init__(
+        self,
+        directory: str = TRANSCRIPTS_DIR,
+        flush_secs: float = TRANSCRIPT_FLUSH_SECS,
+        batch_lines: int = TRANSCRIPT_BATCH_LINES,
+        rotate_bytes: int = TRANSCRIPT_ROTATE_BYTES,
+        retention_days: int = TRANSCRIPT_RETENTION_DAYS,
+        persist_turns: bool = TRANSCRIPT_PERSIST_TURNS,
+    ):
+        self.directory = directory
+        self.flush_secs = flush_secs
+        self.batch_lines = batch_lines
+        self.rotate_bytes = rotate_bytes
+        self.retention_days = retention_days
+        self.persist_turns = persist_turns
+        self._pending = []
+        self._pending_turns = []  # Not yet inserted into CallTurn
+        self._turns = {}  # call_sid -> next turn number
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        # Owned by the writer thread (one batch at a time, under _write_lock)
+        self._file = None
+        self._file_date = None
+        self._file_index = 0
+        self._stats = {
+            "lines": 0,
+            "batches": 0,
+            "dropped": 0,
+            "write_errors": 0,
+            "last_batch_ms": 0.0,
+            "turns_inserted": 0,
+            "turn_insert_errors": 0,
+            "last_insert_ms": 0.0,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task, write what is left and close the file."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        async with self._write_lock:
+            if self._file:
+                await asyncio.to_thread(self._file.close)
+                self._file = None
+
+    def add(self, call_sid: str, role: str, content: str, timestamp: str = None, latency_ms: float = None):
+        """Buffer one transcript turn. Never blocks."""
+        turn = self._turns.get(call_sid, 0)
+        self._turns[call_sid] = turn + 1
+        record = {
+            "call_sid": call_sid,
+            "turn": turn,
+            "role": role,
+            "content": content,
+            "timestamp": timestamp or datetime.utcnow().isoformat(),
+            "latency_ms": latency_ms,
+        }
+        self._pending.append(record)
+        publish(call_sid, "turn", {key: value for key, value in record.items() if key != "call_sid"})
+        if self.persist_turns:
+            self._pending_turns.append(record)
+
+        for pending in (self._pending, self._pending_turns):
+            overflow = len(pending) - TRANSCRIPT_MAX_PENDING_LINES
+            if overflow > 0:
+                del pending[:overflow]
+                self._stats["dropped"] += overflow
+
+        if self._task is None:
+            try:
+                self.start()
+            except RuntimeError:
+                pass  # no running loop; the next flush() writes it
+        if len(self._pending) >= self.batch_lines:
+            self._wakeup.set()
+
+    async def end_call(self, call_sid: str):
+        """Forget a finished call's turn counter and write its last turns now.
+
+        Awaited at disconnect so post-call processing finds every turn in Mongo.
+        """
+        self._turns.pop(call_sid, None)
+        await self.flush()
+
+    def turns_persisted(self, call_sid: str) -> bool:
+        """True if every turn buffered for the call is already in call_turns."""
+        return self.persist_turns and not any(record["call_sid"] == call_sid for record in self._pending_turns)
+
+    async def flush(self):
+        """Write everything buffered so far."""
+        await self._flush_file()
+        if self.persist_turns:
+            await self._flush_turns()
+
+    async def _flush_file(self):
+        async with self._write_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                # Put the batch back in front of anything added meanwhile and retry next flush
+                self._pending[:0] = batch
+                self._stats["write_errors"] += 1
+                logger.warning(f"Failed to write {len(batch)} transcript line(s): {e}")
+                return
+            self._stats["lines"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_batch_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def _flush_turns(self):
+        from pymongo.errors import BulkWriteError
+
+        from model.model import CallTurn
+
+        if not self._pending_turns:
+            return
+        batch, self._pending_turns = self._pending_turns, []
+        start = time.perf_counter()
+        try:
+            await CallTurn.get_pymongo_collection().insert_many(
+                [{**record, "created_at": datetime.utcnow()} for record in batch], ordered=False
+            )
+        except BulkWriteError as e:
+            # Duplicates are turns a previous, partly failed batch already inserted
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                self._requeue_turns(batch, e)
+                return
+        except Exception as e:
+            self._requeue_turns(batch, e)
+            return
+        self._stats["turns_inserted"] += len(batch)
+        self._stats["last_insert_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _requeue_turns(self, batch: list, error: Exception):
+        self._pending_turns[:0] = batch
+        self._stats["turn_insert_errors"] += 1
+        logger.warning(f"Failed to insert {len(batch)} call turn(s): {error}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_secs)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _write(self, batch: list):
+        self._rotate_if_needed()
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+        self._file.flush()
+
+    def _rotate_if_needed(self):
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        if self._file and self._file_date == today and self._file.tell() < self.rotate_bytes:
+            return
+
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._file_date != today:
+            self._file_date = today
+            self._file_index = 0
+            self._delete_expired()
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Continue the latest file of the day (a reused pid), unless it is full
+        while True:
+            path = os.path.join(self.directory, f"transcripts_{today}_{WORKER_ID}_{self._file_index}.jsonl")
+            if not os.path.exists(path) or os.path.getsize(path) < self.rotate_bytes:
+                break
+            self._file_index += 1
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _delete_expired(self):
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for path in glob.glob(os.path.join(self.directory, "transcripts_*.jsonl")):
+            file_date = os.path.basename(path)[len("transcripts_") :][:10]
+            if file_date < cutoff:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Failed to delete old transcript file {path}: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "pending_turns": len(self._pending_turns),
+            "live_calls": len(self._turns),
+            "file": self._file.name if self._file else None,
+        }
+
+
+transcript_sink = TranscriptSink()
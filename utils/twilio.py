@@ -34,6 +34,13 @@ def generate_twiml(host: str, body_data: dict = None, multimodel: bool = True) -
     return str(response)
 
 
+def generate_busy_twiml() -> str:
+    """Generate TwiML that rejects the call with a busy signal."""
+    response = VoiceResponse()
+    response.reject(reason="busy")
+    return str(response)
+
+
 def get_websocket_url(host: str, multimodel: bool = True) -> str:
     """Get the appropriate WebSocket URL based on environment and multimodel setting."""
     if multimodel:
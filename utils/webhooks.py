@@ -0,0 +1,288 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+
+import aiohttp
+from loguru import logger
+
+from utils.stats import percentile, record_sample
+from utils.telemetry import WEBHOOK_SECONDS
+
+CALL_COMPLETION_WEBHOOK_URL = os.getenv("CALL_COMPLETION_WEBHOOK_URL")
+# POSTs in flight at once (also the connection pool size)
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "8"))
+WEBHOOK_TIMEOUT_SECS = float(os.getenv("WEBHOOK_TIMEOUT_SECS", "30"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_BACKOFF_BASE_SECS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECS", "1"))
+WEBHOOK_BACKOFF_MAX_SECS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECS", "30"))
+# 1 sends each completion on its own (the original payload). Above 1, completions
+# arriving within WEBHOOK_BATCH_WAIT_SECS are sent together as {"events": [...]}.
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "1"))
+WEBHOOK_BATCH_WAIT_SECS = float(os.getenv("WEBHOOK_BATCH_WAIT_SECS", "1"))
+# gzip bodies of at least this many bytes (Content-Encoding: gzip); 0 disables
+WEBHOOK_GZIP_MIN_BYTES = int(os.getenv("WEBHOOK_GZIP_MIN_BYTES", "0"))
+
+
+class WebhookDeliveryFailed(Exception):
+    """Delivery gave up after retries; the payload is in the dead-letter collection."""
+
+
+def _is_retryable_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+class WebhookDispatcher:
+    """Delivers webhook payloads over one shared connection pool.
+
+    deliver() queues a payload and waits for the outcome. A background task
+    groups queued payloads into batches of up to batch_size; at most
+    `concurrency` batches are posted at once. Network errors, timeouts, 429
+    and 5xx are retried with jittered exponential backoff; once attempts run
+    out (or on any other 4xx) every payload of the batch is stored as a
+    WebhookDeadLetter and deliver() raises WebhookDeliveryFailed.
+    """
+
+    def __init__(
+        self,
+        url: str = CALL_COMPLETION_WEBHOOK_URL,
+        concurrency: int = WEBHOOK_CONCURRENCY,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+        batch_wait_secs: float = WEBHOOK_BATCH_WAIT_SECS,
+        gzip_min_bytes: int = WEBHOOK_GZIP_MIN_BYTES,
+        max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+    ):
+        self.url = url
+        self.concurrency = concurrency
+        self.batch_size = max(1, batch_size)
+        self.batch_wait_secs = batch_wait_secs
+        self.gzip_min_bytes = gzip_min_bytes
+        self.max_attempts = max(1, max_attempts)
+        self._queue = None
+        self._semaphore = None
+        self._session = None
+        self._task = None
+        self._in_flight = set()
+        self._collecting = False  # A batch is being filled, taken off the queue but not sent yet
+        self._stats = {
+            "delivered": 0,
+            "failed": 0,
+            "retries": 0,
+            "batches": 0,
+            "bytes_sent": 0,
+            "bytes_uncompressed": 0,
+            "latency_ms": [],  # deliver() -> acknowledged, last 500 payloads
+            "request_ms": [],  # successful POSTs, last 500
+        }
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Send what is queued, wait for in-flight batches and close the session."""
+        await self.flush()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def flush(self):
+        """Wait until queued and in-flight payloads are delivered or dead-lettered."""
+        while self._queue is not None and (not self._queue.empty() or self._collecting or self._in_flight):
+            if self._in_flight:
+                await asyncio.wait(set(self._in_flight))
+            else:
+                await asyncio.sleep(0.05)
+
+    async def deliver(self, payload: dict, dead_letter: bool = True):
+        """Queue a payload and wait until it is acknowledged.
+
+        Raises WebhookDeliveryFailed when delivery gives up (after storing the
+        payload as a dead letter, unless dead_letter is False).
+        """
+        if not self.url:
+            logger.warning("CALL_COMPLETION_WEBHOOK_URL not set in environment variables")
+            return
+
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future, time.perf_counter(), dead_letter))
+        await future
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT_SECS),
+            )
+        return self._session
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            self._collecting = True
+            deadline = loop.time() + self.batch_wait_secs
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=max(0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._send_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            self._collecting = False
+
+    def _encode(self, payloads: list):
+        body = json.dumps(payloads[0] if self.batch_size == 1 else {"events": payloads}, default=str).encode()
+        headers = {"Content-Type": "application/json"}
+        uncompressed = len(body)
+        if self.gzip_min_bytes and uncompressed >= self.gzip_min_bytes:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers, uncompressed
+
+    async def _send_batch(self, batch: list):
+        """Deliver a batch; every caller's future is resolved whatever happens."""
+        error, attempts = "delivery interrupted", 0
+        try:
+            result = await self._post_batch(batch)
+            if result is None:
+                return
+            error, attempts = result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.error(f"❌ Unexpected error delivering {len(batch)} webhook event(s): {error}")
+        finally:
+            # Also reached when cancelled, so no deliver() caller waits forever
+            if any(not future.done() for _, future, _, _ in batch):
+                await self._fail_batch(batch, error, attempts)
+
+    async def _post_batch(self, batch: list):
+        """POST with retries. None once acknowledged, else (last error, attempts made)."""
+        payloads = [payload for payload, _, _, _ in batch]
+        body, headers, uncompressed = self._encode(payloads)
+        if self.batch_size > 1:
+            headers["X-Webhook-Batch-Size"] = str(len(payloads))
+
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    async with self._get_session().post(self.url, data=body, headers=headers) as response:
+                        if 200 <= response.status < 300:
+                            self._record_success(batch, len(body), uncompressed, start)
+                            return None
+                        error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                        retryable = _is_retryable_status(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+                retryable = True
+
+            if not retryable or attempt == self.max_attempts:
+                break
+            ceiling = min(WEBHOOK_BACKOFF_MAX_SECS, WEBHOOK_BACKOFF_BASE_SECS * 2 ** (attempt - 1))
+            delay = random.uniform(0, ceiling)
+            self._stats["retries"] += 1
+            logger.warning(f"⚠️ Webhook POST of {len(payloads)} event(s) failed (attempt {attempt}), retrying in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+        return error, attempt
+
+    async def _fail_batch(self, batch: list, error: str, attempts: int):
+        """Dead-letter the batch's undelivered payloads and fail their futures."""
+        pending = [entry for entry in batch if not entry[1].done()]
+        self._stats["failed"] += len(pending)
+        now = time.perf_counter()
+        for _, _, queued_at, _ in pending:
+            WEBHOOK_SECONDS.labels(result="failed").observe(now - queued_at)
+        logger.error(f"❌ Webhook delivery of {len(pending)} event(s) failed after {attempts} attempt(s): {error}")
+        try:
+            await self._dead_letter([payload for payload, _, _, dead_letter in pending if dead_letter], error, attempts)
+        finally:
+            for _, future, _, _ in pending:
+                if not future.done():
+                    future.set_exception(WebhookDeliveryFailed(error))
+
+    def _record_success(self, batch: list, sent: int, uncompressed: int, start: float):
+        now = time.perf_counter()
+        self._stats["delivered"] += len(batch)
+        self._stats["batches"] += 1
+        self._stats["bytes_sent"] += sent
+        self._stats["bytes_uncompressed"] += uncompressed
+        record_sample(self._stats["request_ms"], (now - start) * 1000)
+        for _, future, queued_at, _ in batch:
+            record_sample(self._stats["latency_ms"], (now - queued_at) * 1000)
+            WEBHOOK_SECONDS.labels(result="delivered").observe(now - queued_at)
+            if not future.done():
+                future.set_result(None)
+
+    async def _dead_letter(self, payloads: list, error: str, attempts: int):
+        from model.model import WebhookDeadLetter
+
+        for payload in payloads:
+            try:
+                await WebhookDeadLetter(
+                    call_sid=payload.get("call_sid"), url=self.url, payload=payload, error=error, attempts=attempts
+                ).insert()
+            except Exception as e:
+                # Last resort: keep the payload in the logs
+                logger.error(f"❌ Failed to store webhook dead letter ({e}): {json.dumps(payload, default=str)}")
+
+    def get_stats(self) -> dict:
+        delivered, failed = self._stats["delivered"], self._stats["failed"]
+        latency, request = self._stats["latency_ms"], self._stats["request_ms"]
+        return {
+            "url_configured": bool(self.url),
+            "delivered": delivered,
+            "failed": failed,
+            "failure_rate": round(failed / (delivered + failed), 4) if delivered + failed else 0.0,
+            "retries": self._stats["retries"],
+            "batches": self._stats["batches"],
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_flight_batches": len(self._in_flight),
+            "latency_p50_ms": round(percentile(latency, 50), 1),
+            "latency_p95_ms": round(percentile(latency, 95), 1),
+            "request_p95_ms": round(percentile(request, 95), 1),
+            "bytes_sent": self._stats["bytes_sent"],
+            "compression_ratio": (
+                round(self._stats["bytes_sent"] / self._stats["bytes_uncompressed"], 3)
+                if self._stats["bytes_uncompressed"]
+                else 1.0
+            ),
+        }
+
+
+async def replay_dead_letters(limit: int = 100) -> dict:
+    """Redeliver stored dead letters, oldest first; delivered ones are marked replayed."""
+    from datetime import datetime
+
+    from model.model import WebhookDeadLetter
+
+    letters = await WebhookDeadLetter.find({"replayed_at": None}).sort([("created_at", 1)]).limit(limit).to_list()
+
+    async def replay(letter):
+        try:
+            await webhook_dispatcher.deliver(letter.payload, dead_letter=False)
+        except WebhookDeliveryFailed as e:
+            letter.attempts += 1
+            letter.error = str(e)
+            await letter.save()
+            return False
+        letter.replayed_at = datetime.utcnow()
+        await letter.save()
+        return True
+
+    results = await asyncio.gather(*(replay(letter) for letter in letters))
+    return {"replayed": sum(results), "failed": len(results) - sum(results)}
+
+
+webhook_dispatcher = WebhookDispatcher()
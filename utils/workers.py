@@ -0,0 +1,154 @@
+import asyncio
+import os
+import resource
+import socket
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from itertools import count
+
+from loguru import logger
+
+# Identity of this worker process. With WEB_CONCURRENCY > 1 uvicorn forks N
+# workers sharing one listening socket; each Twilio media WebSocket stays on
+# the worker that accepted it for its whole lifetime, so live-call state only
+# has to be local. Anything another worker may need (Call documents, worker
+# load) lives in Mongo.
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+HEARTBEAT_SECS = float(os.getenv("WORKER_HEARTBEAT_SECS", "5"))
+
+_started_at = datetime.utcnow()
+_live_calls = {}
+_call_ids = count(1)
+_heartbeat_task = None
+_last_cpu_sample = None
+# CPU % over the last heartbeat interval; only the heartbeat samples it
+_last_cpu_percent = 0.0
+# Live calls reported by the other workers on this host at the last heartbeat
+_peer_live_calls = 0
+
+
+@asynccontextmanager
+async def track_call(endpoint: str):
+    """Count a live media WebSocket on this worker for as long as it is open."""
+    token = next(_call_ids)
+    _live_calls[token] = {"endpoint": endpoint, "started_at": time.monotonic()}
+    try:
+        yield
+    finally:
+        _live_calls.pop(token, None)
+
+
+def live_call_count() -> int:
+    """Number of media WebSockets currently served by this worker."""
+    return len(_live_calls)
+
+
+def node_live_calls() -> int:
+    """Live calls on this host: exact for this worker, last heartbeat for its peers."""
+    return live_call_count() + _peer_live_calls
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _sample_cpu_percent() -> float:
+    """CPU used by this process since the previous sample, as % of one core.
+
+    Each call starts a new window, so only the heartbeat may call it.
+    """
+    global _last_cpu_sample, _last_cpu_percent
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = usage.ru_utime + usage.ru_stime
+    now = time.monotonic()
+
+    percent = 0.0
+    if _last_cpu_sample:
+        last_cpu, last_now = _last_cpu_sample
+        if now > last_now:
+            percent = (cpu - last_cpu) / (now - last_now) * 100
+    _last_cpu_sample = (cpu, now)
+    _last_cpu_percent = round(percent, 1)
+    return _last_cpu_percent
+
+
+def get_worker_load() -> dict:
+    """Load snapshot for this worker process."""
+    from utils.drain import is_draining
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "worker_id": WORKER_ID,
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "live_calls": live_call_count(),
+        "draining": is_draining(),
+        "cpu_percent": _last_cpu_percent,
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 2),
+        "rss_mb": round(_rss_mb(), 1),
+        "started_at": _started_at,
+    }
+
+
+async def _heartbeat_loop():
+    global _peer_live_calls
+    from model.model import WorkerStatus
+
+    while True:
+        try:
+            _sample_cpu_percent()
+            load = get_worker_load()
+            await WorkerStatus.find_one(WorkerStatus.worker_id == WORKER_ID).upsert(
+                {"$set": {**load, "updated_at": datetime.utcnow()}},
+                on_insert=WorkerStatus(**load),
+            )
+
+            peers = [
+                worker
+                for worker in await get_cluster_load()
+                if worker["host"] == load["host"] and worker["worker_id"] != WORKER_ID
+            ]
+            _peer_live_calls = sum(worker["live_calls"] for worker in peers)
+        except Exception as e:
+            logger.warning(f"Failed to report worker load: {e}")
+        await asyncio.sleep(HEARTBEAT_SECS)
+
+
+def start_heartbeat():
+    """Start periodically publishing this worker's load to Mongo."""
+    global _heartbeat_task
+
+    if _heartbeat_task is None:
+        _heartbeat_task = asyncio.create_task(_heartbeat_loop())
+        logger.info(f"👷 Worker {WORKER_ID} reporting load every {HEARTBEAT_SECS}s")
+
+
+async def stop_heartbeat():
+    """Stop the heartbeat and remove this worker from the shared status list."""
+    global _heartbeat_task
+    from model.model import WorkerStatus
+
+    if _heartbeat_task:
+        _heartbeat_task.cancel()
+        _heartbeat_task = None
+    try:
+        await WorkerStatus.find_one(WorkerStatus.worker_id == WORKER_ID).delete()
+    except Exception as e:
+        logger.warning(f"Failed to remove worker status: {e}")
+
+
+async def get_cluster_load() -> list:
+    """Load reported by every worker that sent a heartbeat recently."""
+    from model.model import WorkerStatus
+
+    cutoff = datetime.utcnow() - timedelta(seconds=HEARTBEAT_SECS * 3)
+    workers = await WorkerStatus.find(WorkerStatus.updated_at >= cutoff).to_list()
+    return [worker.model_dump(exclude={"id", "revision_id"}) for worker in workers]